@@ -0,0 +1,138 @@
+"""
+action_profiler.py
+
+This file contains the per-action profiling hooks. The button commands of SettingsUI,
+ExperimentUI, CaseUI and LatencyUI are wrapped with action_command where they are bound,
+so that, when profiling is switched on, each click runs under cProfile and tracemalloc.
+Calls of the same methods from other code, e.g. while a UI is built, are not profiled. Every profiled action writes a cProfile
+stats file (open it with pstats or snakeviz) and a text file with the top allocations
+made during the action, tagged with the action name and a timestamp.
+
+Profiling is switched on by the TOUCHTACT_PROFILE environment variable (1, or the output
+folder), or by the "Profile Button Actions" setting. When it is off, a wrapped command
+only checks the two switches before running.
+
+Usage:
+    TOUCHTACT_PROFILE=1 python main.py
+    python -m pstats .gui/profiles/CaseUI.generate_case_json-20240101-120000-000000.prof
+"""
+
+import os
+import time
+import cProfile
+import functools
+import tracemalloc
+from datetime import datetime
+from default_configs import DEFAULT_GUI_FOLDER
+
+PROFILE_ENV = 'TOUCHTACT_PROFILE'
+PROFILE_TOP_ENV = 'TOUCHTACT_PROFILE_TOP'
+DEFAULT_PROFILE_FOLDER = os.path.join(DEFAULT_GUI_FOLDER, 'profiles')
+DEFAULT_TOP_N = 25
+# Stack depth kept by tracemalloc for each allocation
+TRACEBACK_FRAMES = 5
+
+class ActionProfiler:
+    """
+    Wraps UI actions with cProfile and tracemalloc capture.
+
+    Args:
+        folder (str): The folder the profiles are written to.
+        enabled (bool): Whether every action is profiled, regardless of the settings of the UI.
+        top_n (int): The number of allocation sites listed for each action.
+    """
+    def __init__(self, folder=DEFAULT_PROFILE_FOLDER, enabled=False, top_n=DEFAULT_TOP_N):
+        self.folder = folder
+        self.enabled = enabled
+        self.top_n = top_n
+        # cProfile cannot nest, so actions started by another action are not profiled separately
+        self.active = False
+
+    def profiled(self, method, name):
+        """
+        Returns a command running a bound UI method, profiled when profiling is on for its UI.
+        """
+        ui = getattr(method, '__self__', None)
+
+        @functools.wraps(method)
+        def command(*args, **kwargs):
+            if self.active or not (self.enabled or getattr(ui, 'settings', {}).get('profile_actions')):
+                return method(*args, **kwargs)
+            return self.run(name, method, *args, **kwargs)
+        return command
+
+    def run(self, name, method, *args, **kwargs):
+        """
+        Runs an action under cProfile and tracemalloc, then writes its profile files.
+        """
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(TRACEBACK_FRAMES)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        profile = cProfile.Profile()
+        self.active = True
+        start = time.perf_counter()
+        try:
+            return profile.runcall(method, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.active = False
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            self.write(name, profile, before, after, peak, elapsed)
+
+    def write(self, name, profile, before, after, peak, elapsed):
+        """
+        Writes <name>-<timestamp>.prof and <name>-<timestamp>-memory.txt to the profile folder.
+
+        Returns:
+            tuple: The paths of the stats file and the memory file.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        base_path = os.path.join(self.folder, f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}")
+        profile.dump_stats(f"{base_path}.prof")
+
+        # Leave out the allocations of the profilers themselves
+        filters = [tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, cProfile.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+        differences = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')
+        with open(f"{base_path}-memory.txt", 'w') as f:
+            f.write(f"Action: {name}\n")
+            f.write(f"Elapsed: {elapsed:.3f} s\n")
+            f.write(f"Peak traced memory: {peak / 1024:.1f} KiB\n")
+            f.write(f"Net allocated: {sum(difference.size_diff for difference in differences) / 1024:.1f} KiB\n\n")
+            f.write(f"Top {self.top_n} allocation sites by size difference:\n")
+            for difference in differences[:self.top_n]:
+                f.write(f"{difference}\n")
+        return f"{base_path}.prof", f"{base_path}-memory.txt"
+
+# Profiler shared by the commands of all the UIs, configured by install
+profiler = ActionProfiler()
+
+def action_command(method):
+    """
+    Wraps a bound UI method for use as a button command, e.g. command=action_command(self.save_case).
+
+    Args:
+        method (function): The bound method the button runs.
+
+    Returns:
+        function: The command, which checks the profiling switches on every click.
+    """
+    return profiler.profiled(method, f"{type(method.__self__).__name__}.{method.__name__}")
+
+def install():
+    """
+    Configures the shared profiler from the environment. Profiling is on for every action
+    when TOUCHTACT_PROFILE is set, otherwise only for UIs whose settings have profile_actions.
+
+    Returns:
+        ActionProfiler: The shared profiler.
+    """
+    value = os.environ.get(PROFILE_ENV, '')
+    profiler.enabled = value not in ('', '0')
+    profiler.folder = value if profiler.enabled and value != '1' else DEFAULT_PROFILE_FOLDER
+    profiler.top_n = int(os.environ.get(PROFILE_TOP_ENV, DEFAULT_TOP_N))
+    return profiler
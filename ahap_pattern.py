@@ -0,0 +1,390 @@
+"""
+ahap_pattern.py
+
+This file contains the columnar AHAP pattern model. A pattern is loaded once into NumPy
+columns (entry time, event duration, event type, intensity and sharpness, curve parameter
+and the flat control point times and values of all curves), so shifting, time scaling,
+intensity scaling, trimming, concatenating and merging are array operations instead of
+loops over nested dicts. Control point times stay relative to their curve, as in AHAP,
+and are moved or cut together with it.
+
+Everything that is not a column (metadata, other event parameters, unknown keys) is kept
+from the original entries, so a pattern that is loaded and saved again is unchanged. The
+intensity of a pattern can also be rendered to a sampled envelope for previews and
+comparisons.
+
+Usage:
+    pattern = AhapPattern.load("Files/Haptic/Original/Dtmf-0.ahap")
+    pattern.shift(0.5).trim(0.0).save("Files/Haptic/Latency/Dtmf-0.ahap")
+    times, intensity = pattern.render(samplerate=1000)
+"""
+
+import json
+import numpy as np
+
+ENTRY_KEYS = ('Event', 'ParameterCurve', 'Parameter')
+KIND_EVENT, KIND_CURVE, KIND_OTHER = 0, 1, 2
+# Length given to transients when rendering, in seconds
+TRANSIENT_DURATION = 0.02
+DEFAULT_RENDER_RATE = 1000
+
+def _ranges(starts, counts):
+    """
+    Returns the concatenation of range(start, start + count) for all pairs, without a Python loop.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    ends = np.cumsum(counts)
+    return np.repeat(np.asarray(starts, dtype=np.int64) - (ends - counts), counts) + np.arange(total)
+
+def _parameter(event, parameter_id):
+    for parameter in event.get('EventParameters', []):
+        if parameter.get('ParameterID') == parameter_id:
+            return parameter.get('ParameterValue', np.nan)
+    return np.nan
+
+class AhapPattern:
+    """
+    An AHAP pattern stored as NumPy columns, one row per Pattern entry.
+
+    Transforms never modify a pattern in place, they return a new one.
+
+    Args:
+        header (dict): The AHAP data with the Pattern left as None, so the key order is kept.
+        templates (numpy.ndarray): The original entry dicts, as an object array. They are never modified.
+        kind (numpy.ndarray): KIND_EVENT, KIND_CURVE or KIND_OTHER for each entry.
+        time (numpy.ndarray): The entry times in seconds.
+        duration (numpy.ndarray): The event durations in seconds, NaN where there is none.
+        event_type (numpy.ndarray): The event types, '' for curves and other entries.
+        intensity (numpy.ndarray): The HapticIntensity of the events, NaN where there is none.
+        sharpness (numpy.ndarray): The HapticSharpness of the events, NaN where there is none.
+        parameter_id (numpy.ndarray): The ParameterID of the curves, '' for the other entries.
+        point_offsets (numpy.ndarray): The entries' first control point in the point columns, plus the total count at the end.
+        point_time (numpy.ndarray): The control point times relative to their curve, in seconds.
+        point_value (numpy.ndarray): The control point values.
+    """
+    def __init__(self, header, templates, kind, time, duration, event_type, intensity, sharpness, parameter_id, point_offsets, point_time, point_value):
+        self.header = header
+        self.templates = templates
+        self.kind = kind
+        self.time = time
+        self.duration = duration
+        self.event_type = event_type
+        self.intensity = intensity
+        self.sharpness = sharpness
+        self.parameter_id = parameter_id
+        self.point_offsets = point_offsets
+        self.point_time = point_time
+        self.point_value = point_value
+
+    @classmethod
+    def from_dict(cls, ahap_data):
+        """
+        Builds the columns from AHAP data, as loaded from JSON.
+        """
+        entries = ahap_data.get('Pattern', [])
+        kind, time, duration, event_type, intensity, sharpness, parameter_id, point_counts = ([] for _ in range(8))
+        point_time, point_value = [], []
+        for entry in entries:
+            key = next((key for key in ENTRY_KEYS if key in entry), None)
+            body = entry.get(key, {}) if key else {}
+            time.append(body.get('Time', 0.0))
+            points = body.get('ParameterCurveControlPoints', []) if key == 'ParameterCurve' else []
+            point_counts.append(len(points))
+            point_time.extend(point.get('Time', 0.0) for point in points)
+            point_value.extend(point.get('ParameterValue', np.nan) for point in points)
+            if key == 'Event':
+                kind.append(KIND_EVENT)
+                duration.append(body.get('EventDuration', np.nan))
+                event_type.append(body.get('EventType', ''))
+                intensity.append(_parameter(body, 'HapticIntensity'))
+                sharpness.append(_parameter(body, 'HapticSharpness'))
+            else:
+                kind.append(KIND_CURVE if key == 'ParameterCurve' else KIND_OTHER)
+                duration.append(np.nan)
+                event_type.append('')
+                intensity.append(np.nan)
+                sharpness.append(np.nan)
+            parameter_id.append(body.get('ParameterID', '') if key == 'ParameterCurve' else '')
+
+        templates = np.empty(len(entries), dtype=object)
+        templates[:] = entries
+        return cls(
+            {key: None if key == 'Pattern' else value for key, value in ahap_data.items()},
+            templates,
+            np.array(kind, dtype=np.int8),
+            np.array(time, dtype=np.float64),
+            np.array(duration, dtype=np.float64),
+            np.array(event_type, dtype=str),
+            np.array(intensity, dtype=np.float64),
+            np.array(sharpness, dtype=np.float64),
+            np.array(parameter_id, dtype=str),
+            np.concatenate([[0], np.cumsum(point_counts, dtype=np.int64)]).astype(np.int64),
+            np.array(point_time, dtype=np.float64),
+            np.array(point_value, dtype=np.float64),
+        )
+
+    @classmethod
+    def load(cls, file_path):
+        with open(file_path, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+    def to_dict(self, decimals=None):
+        """
+        Serializes the pattern back to AHAP data. Fields that are not columns come from the original entries.
+
+        Args:
+            decimals (int, optional): Rounds the entry times to this many decimals.
+
+        Returns:
+            dict: The AHAP data.
+        """
+        def number(value, original=None):
+            value = float(value)
+            # Unchanged values keep their original JSON form, e.g. 1 instead of 1.0
+            return original if isinstance(original, (int, float)) and not isinstance(original, bool) and original == value else value
+
+        def entry_time(value, original=None):
+            return number(round(float(value), decimals) if decimals is not None else value, original)
+
+        pattern = []
+        offsets = self.point_offsets
+        for index, template in enumerate(self.templates):
+            key = next((key for key in ENTRY_KEYS if key in template), None)
+            if key is None:
+                pattern.append(template)
+                continue
+            body = dict(template[key])
+            body['Time'] = entry_time(self.time[index], body.get('Time'))
+            if key == 'Event':
+                if np.isnan(self.duration[index]):
+                    body.pop('EventDuration', None)
+                else:
+                    body['EventDuration'] = number(self.duration[index], body.get('EventDuration'))
+                values = {'HapticIntensity': self.intensity[index], 'HapticSharpness': self.sharpness[index]}
+                if 'EventParameters' in body:
+                    body['EventParameters'] = [
+                        dict(parameter, ParameterValue=number(values[parameter.get('ParameterID')], parameter.get('ParameterValue')))
+                        if parameter.get('ParameterID') in values and not np.isnan(values[parameter.get('ParameterID')]) else parameter
+                        for parameter in body['EventParameters']
+                    ]
+            elif key == 'ParameterCurve':
+                start, end = offsets[index], offsets[index + 1]
+                originals = template[key].get('ParameterCurveControlPoints', [])
+                # Points keep their original form when the curve still has the same number of points
+                originals = originals if len(originals) == end - start else [{}] * (end - start)
+                body['ParameterCurveControlPoints'] = [
+                    dict(original, Time=number(point_time, original.get('Time')), ParameterValue=number(point_value, original.get('ParameterValue')))
+                    for original, point_time, point_value in zip(originals, self.point_time[start:end], self.point_value[start:end])
+                ]
+            pattern.append({key: body})
+        ahap_data = dict(self.header)
+        ahap_data['Pattern'] = pattern
+        return ahap_data
+
+    def save(self, file_path, decimals=None):
+        with open(file_path, 'w') as f:
+            json.dump(self.to_dict(decimals), f, indent=4)
+
+    def __len__(self):
+        return len(self.time)
+
+    @property
+    def end_time(self):
+        """
+        The end of the last event or curve in seconds, counted like asset_catalog.probe_haptic.
+        """
+        ends = [np.zeros(1), self.time + np.nan_to_num(self.duration)]
+        counts = np.diff(self.point_offsets)
+        has_points = counts > 0
+        if has_points.any():
+            ends.append(self.time[has_points] + self.point_time[self.point_offsets[1:][has_points] - 1])
+        return float(np.concatenate(ends).max())
+
+    @property
+    def event_times(self):
+        return self.time[self.kind == KIND_EVENT]
+
+    def _replace(self, **columns):
+        values = {name: getattr(self, name) for name in ('header', 'templates', 'kind', 'time', 'duration', 'event_type', 'intensity', 'sharpness', 'parameter_id', 'point_offsets', 'point_time', 'point_value')}
+        values.update(columns)
+        return AhapPattern(**values)
+
+    def _take(self, order):
+        """
+        Returns the pattern with the entries in the given order (or subset), moving their control points with them.
+        """
+        counts = np.diff(self.point_offsets)[order]
+        points = _ranges(self.point_offsets[:-1][order], counts)
+        return self._replace(
+            templates=self.templates[order], kind=self.kind[order], time=self.time[order], duration=self.duration[order],
+            event_type=self.event_type[order], intensity=self.intensity[order], sharpness=self.sharpness[order],
+            parameter_id=self.parameter_id[order], point_offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            point_time=self.point_time[points], point_value=self.point_value[points],
+        )
+
+    def sorted(self):
+        """
+        Returns the pattern with the entries ordered by time, keeping the order of entries at the same time.
+        """
+        return self._take(np.argsort(self.time, kind='stable'))
+
+    def shift(self, offset):
+        """
+        Moves every entry by offset seconds. Times may become negative, use trim(0.0) to cut them off.
+        """
+        return self._replace(time=self.time + offset)
+
+    def scale_time(self, factor, origin=0.0):
+        """
+        Stretches the pattern in time around origin, including the event durations and the control point times.
+        """
+        if factor < 0:
+            raise ValueError("The time scale factor cannot be negative")
+        return self._replace(time=origin + (self.time - origin) * factor, duration=self.duration * factor, point_time=self.point_time * factor)
+
+    def scale_intensity(self, factor):
+        """
+        Multiplies the HapticIntensity of every event, clipped to 0 to 1.
+        """
+        return self._replace(intensity=np.clip(self.intensity * factor, 0.0, 1.0))
+
+    def trim(self, start=0.0, end=np.inf, rebase=False):
+        """
+        Keeps the part of the pattern between start and end seconds. Continuous events crossing the
+        edges are shortened, and curves crossing them get a control point interpolated at the edge.
+
+        Args:
+            start (float): The start of the kept part in seconds.
+            end (float): The end of the kept part in seconds.
+            rebase (bool): Whether the kept part is moved to start at zero.
+
+        Returns:
+            AhapPattern: The trimmed pattern.
+        """
+        time, duration = self.time, self.duration
+        counts = np.diff(self.point_offsets)
+        entry_of_point = np.repeat(np.arange(len(self)), counts)
+        absolute = time[entry_of_point] + self.point_time
+        before, after = absolute < start, absolute > end
+        inside = ~before & ~after
+        count_before = np.bincount(entry_of_point[before], minlength=len(self))
+        count_after = np.bincount(entry_of_point[after], minlength=len(self))
+
+        # Edge points of the curves crossing start or end, interpolated between the points on either side
+        first_in = self.point_offsets[:-1] + count_before
+        last_in = self.point_offsets[1:] - count_after - 1
+        at_start = (count_before > 0) & (count_before < counts)
+        at_start[at_start] = absolute[first_in[at_start]] > start
+        at_end = (count_after > 0) & (count_after < counts)
+        at_end[at_end] = absolute[last_in[at_end]] < end
+
+        def interpolate(edge, mask, left, right):
+            t0, t1 = absolute[left[mask]], absolute[right[mask]]
+            v0, v1 = self.point_value[left[mask]], self.point_value[right[mask]]
+            return np.full(mask.sum(), edge, dtype=np.float64), v0 + (v1 - v0) * (edge - t0) / (t1 - t0)
+        start_times, start_values = interpolate(start, at_start, first_in - 1, first_in)
+        end_times, end_values = interpolate(end, at_end, last_in, last_in + 1)
+
+        point_entry = np.concatenate([entry_of_point[inside], np.flatnonzero(at_start), np.flatnonzero(at_end)])
+        point_absolute = np.concatenate([absolute[inside], start_times, end_times])
+        # Kept points stay relative to the old curve time, so the points of curves that are not moved stay exact
+        point_relative = np.concatenate([self.point_time[inside], start_times - time[at_start], end_times - time[at_end]])
+        point_value = np.concatenate([self.point_value[inside], start_values, end_values])
+        order = np.lexsort((point_absolute, point_entry))
+        point_entry, point_absolute, point_relative, point_value = point_entry[order], point_absolute[order], point_relative[order], point_value[order]
+        new_counts = np.bincount(point_entry, minlength=len(self))
+        point_offsets = np.concatenate([[0], np.cumsum(new_counts)]).astype(np.int64)
+
+        # Entries starting before the window are moved to its start, the others keep their time
+        new_time = np.clip(time, start, end)
+        has_points = new_counts > 0
+        event_end = time + np.nan_to_num(duration)
+        # Durations are only recomputed for the events actually cut, so the others stay exact
+        new_duration = np.where((time < start) | (event_end > end), np.minimum(event_end, end) - new_time, duration)
+
+        continuous = ~np.isnan(duration)
+        within = (time >= start) & (time <= end)
+        keep = np.where(continuous, within | ((event_end > start) & (time < end)), within)
+        keep[self.kind == KIND_CURVE] = np.where(counts > 0, has_points, keep)[self.kind == KIND_CURVE]
+
+        trimmed = self._replace(
+            time=new_time - (start if rebase else 0.0), duration=new_duration,
+            point_offsets=point_offsets, point_time=point_relative + (time - new_time)[point_entry], point_value=point_value,
+        )
+        return trimmed._take(np.flatnonzero(keep))
+
+    @classmethod
+    def merge(cls, patterns):
+        """
+        Combines patterns into one, with the entries ordered by time. The header comes from the first pattern.
+        """
+        if not patterns:
+            return cls.from_dict({"Version": 1.0, "Pattern": []})
+        point_offsets = [patterns[0].point_offsets]
+        for pattern in patterns[1:]:
+            point_offsets.append(pattern.point_offsets[1:] + point_offsets[-1][-1])
+        merged = AhapPattern(
+            patterns[0].header,
+            np.concatenate([pattern.templates for pattern in patterns]),
+            *(np.concatenate([getattr(pattern, name) for pattern in patterns]) for name in ('kind', 'time', 'duration', 'event_type', 'intensity', 'sharpness', 'parameter_id')),
+            np.concatenate(point_offsets),
+            np.concatenate([pattern.point_time for pattern in patterns]),
+            np.concatenate([pattern.point_value for pattern in patterns]),
+        )
+        return merged.sorted()
+
+    @classmethod
+    def concatenate(cls, patterns, gap=0.0):
+        """
+        Plays patterns one after another, each starting gap seconds after the end of the previous one.
+
+        Returns:
+            tuple: The combined pattern and the start time of each pattern in seconds.
+        """
+        durations = np.array([pattern.end_time for pattern in patterns])
+        starts = np.concatenate([[0.0], np.cumsum(durations + gap)[:-1]]) if len(patterns) else np.zeros(0)
+        return cls.merge([pattern.shift(start) for pattern, start in zip(patterns, starts)]), starts
+
+    def render(self, samplerate=DEFAULT_RENDER_RATE, duration=None):
+        """
+        Renders the intensity of the pattern to a sampled envelope. Each event holds its HapticIntensity
+        (1 when it has none) for its duration, or TRANSIENT_DURATION for transients, overlapping
+        events take the largest value, and HapticIntensityControl curves multiply the result.
+
+        Args:
+            samplerate (int): The envelope samples per second.
+            duration (float, optional): The rendered length in seconds, the end of the pattern by default.
+
+        Returns:
+            tuple: The sample times and the envelope.
+        """
+        duration = max(self.end_time, TRANSIENT_DURATION) if duration is None else duration
+        count = int(np.ceil(duration * samplerate)) + 1
+        times = np.arange(count) / samplerate
+        envelope = np.zeros(count)
+
+        events = self.kind == KIND_EVENT
+        lengths = np.where(np.isnan(self.duration[events]), TRANSIENT_DURATION, self.duration[events])
+        first = np.clip(np.ceil(self.time[events] * samplerate), 0, count).astype(np.int64)
+        last = np.clip(np.floor((self.time[events] + lengths) * samplerate) + 1, 0, count).astype(np.int64)
+        lengths = np.maximum(last - first, 0)
+        np.maximum.at(envelope, _ranges(first, lengths), np.repeat(np.nan_to_num(self.intensity[events], nan=1.0), lengths))
+
+        curves = (self.kind == KIND_CURVE) & (self.parameter_id == 'HapticIntensityControl') & (np.diff(self.point_offsets) > 0)
+        if curves.any():
+            counts = np.diff(self.point_offsets)[curves]
+            points = _ranges(self.point_offsets[:-1][curves], counts)
+            absolute = np.repeat(self.time[curves], counts) + self.point_time[points]
+            order = np.argsort(absolute, kind='stable')
+            control = np.interp(times, absolute[order], self.point_value[points][order])
+            # Outside every curve the intensity is not scaled
+            span_first = np.searchsorted(times, absolute[np.cumsum(counts) - counts], side='left')
+            span_last = np.searchsorted(times, absolute[np.cumsum(counts) - 1], side='right')
+            coverage = np.zeros(count + 1, dtype=np.int64)
+            np.add.at(coverage, span_first, 1)
+            np.add.at(coverage, span_last, -1)
+            envelope *= np.where(np.cumsum(coverage[:-1]) > 0, control, 1.0)
+        return times, envelope
@@ -0,0 +1,249 @@
+"""
+asset_catalog.py
+
+This file contains the AssetCatalog class, a shared index of the media files used by
+the GUI. Folders are scanned recursively with os.scandir and cached by directory
+modification time, so repeated listings only touch directories that changed. Audio
+and haptic metadata (duration, sample rate, channels, AHAP event counts) is probed in
+a thread pool and cached per file by its current size and mtime, and shown in the
+dropdown values. The UIs read filtered views from the catalog.
+"""
+
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import soundfile as sf
+
+# File extensions shown in the audio and haptic dropdowns
+AUDIO_EXTENSIONS = ('.wav', '.mp3')
+HAPTIC_EXTENSIONS = ('.ahap',)
+
+def probe_audio(file_path):
+    """
+    Reads the header of an audio file.
+
+    Args:
+        file_path (str): The path to the audio file.
+
+    Returns:
+        dict: The duration (seconds), sample rate, channel count and frame count.
+    """
+    info = sf.info(file_path)
+    return {
+        "duration": info.duration,
+        "samplerate": info.samplerate,
+        "channels": info.channels,
+        "frames": info.frames
+    }
+
+def probe_haptic(file_path):
+    """
+    Counts the events of an AHAP file.
+
+    Args:
+        file_path (str): The path to the AHAP file.
+
+    Returns:
+        dict: The number of transient, continuous and parameter curve entries and the pattern duration (seconds).
+    """
+    with open(file_path, 'r') as f:
+        ahap_data = json.load(f)
+    transient_count = continuous_count = curve_count = 0
+    duration = 0.0
+    for pattern in ahap_data.get('Pattern', []):
+        if 'Event' in pattern:
+            event = pattern['Event']
+            if event.get('EventType') == 'HapticTransient':
+                transient_count += 1
+            else:
+                continuous_count += 1
+            duration = max(duration, event.get('Time', 0.0) + event.get('EventDuration', 0.0))
+        elif 'ParameterCurve' in pattern:
+            curve = pattern['ParameterCurve']
+            curve_count += 1
+            points = curve.get('ParameterCurveControlPoints', [])
+            if points:
+                duration = max(duration, curve.get('Time', 0.0) + points[-1].get('Time', 0.0))
+    return {
+        "event_count": transient_count + continuous_count,
+        "transient_count": transient_count,
+        "continuous_count": continuous_count,
+        "curve_count": curve_count,
+        "duration": duration
+    }
+
+def describe(metadata):
+    """
+    Summarizes probed metadata for a dropdown value, or returns an empty string when the file could not be probed.
+    """
+    if 'samplerate' in metadata:
+        return f"{metadata['duration']:.3f} s, {metadata['samplerate']} Hz, {metadata['channels']} ch"
+    if 'event_count' in metadata:
+        return f"{metadata['duration']:.3f} s, {metadata['event_count']} events"
+    return ""
+
+# Metadata probe to use for each file extension
+PROBES = {ext: probe_audio for ext in AUDIO_EXTENSIONS}
+PROBES.update({ext: probe_haptic for ext in HAPTIC_EXTENSIONS})
+
+class AssetCatalog:
+    """
+    A cached index of media files and their metadata.
+
+    Args:
+        max_workers (int, optional): The number of threads used to probe metadata.
+    """
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        # Directory path -> (mtime_ns, file paths, subdirectory paths)
+        self._directory_cache = {}
+        # File path -> (mtime_ns, size, metadata)
+        self._metadata_cache = {}
+        self._lock = threading.Lock()
+
+    def _scan_directory(self, folder):
+        """
+        Lists a single directory, reusing the cached listing while its mtime is unchanged.
+
+        Returns:
+            tuple: The file paths and subdirectory paths of the directory.
+        """
+        mtime = os.stat(folder).st_mtime_ns
+        with self._lock:
+            cached = self._directory_cache.get(folder)
+        if cached is not None and cached[0] == mtime:
+            return cached[1], cached[2]
+
+        files, subdirectories = [], []
+        with os.scandir(folder) as iterator:
+            for entry in iterator:
+                # Skip hidden files such as .DS_Store and cache folders
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir():
+                    subdirectories.append(entry.path)
+                elif entry.is_file():
+                    # Sizes and mtimes are not kept, as overwriting a file leaves the directory mtime unchanged
+                    files.append(entry.path)
+        files.sort()
+        subdirectories.sort()
+
+        with self._lock:
+            self._directory_cache[folder] = (mtime, files, subdirectories)
+        return files, subdirectories
+
+    def list_files(self, folder, extensions=None, recursive=True):
+        """
+        Lists the files of a folder.
+
+        Args:
+            folder (str): The folder to list.
+            extensions (tuple, optional): Only include files with these extensions.
+            recursive (bool): Whether to include files in subfolders.
+
+        Returns:
+            list[dict]: Entries with the name relative to the folder and the path.
+        """
+        if not os.path.isdir(folder):
+            return []
+
+        entries = []
+        pending = [folder]
+        while pending:
+            files, subdirectories = self._scan_directory(pending.pop(0))
+            for file_path in files:
+                if extensions and not file_path.lower().endswith(tuple(extensions)):
+                    continue
+                entries.append({"name": os.path.relpath(file_path, folder), "path": file_path})
+            if recursive:
+                pending.extend(subdirectories)
+        return entries
+
+    def metadata(self, file_path):
+        """
+        Returns the cached metadata of a single file, probing it if needed.
+        """
+        return self.probe([file_path])[file_path]
+
+    def probe(self, file_paths):
+        """
+        Returns the metadata of several files. Every file is stat-ed again, and files that are
+        not cached or have changed since they were last probed are probed concurrently in a thread pool.
+
+        Args:
+            file_paths (list[str]): The files to probe.
+
+        Returns:
+            dict: File path -> metadata. Files that cannot be read map to {"error": message}.
+        """
+        results, stale = {}, []
+        for file_path in file_paths:
+            try:
+                stat = os.stat(file_path)
+            except OSError as e:
+                results[file_path] = {"error": str(e)}
+                continue
+            with self._lock:
+                cached = self._metadata_cache.get(file_path)
+            if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                results[file_path] = cached[2]
+            else:
+                stale.append((file_path, stat))
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                probed = executor.map(lambda item: self._probe_file(item[0]), stale)
+                for (file_path, stat), metadata in zip(stale, probed):
+                    with self._lock:
+                        self._metadata_cache[file_path] = (stat.st_mtime_ns, stat.st_size, metadata)
+                    results[file_path] = metadata
+        return results
+
+    def _probe_file(self, file_path):
+        probe = PROBES.get(os.path.splitext(file_path)[1].lower())
+        if probe is None:
+            return {}
+        try:
+            return probe(file_path)
+        except Exception as e:
+            return {"error": str(e)}
+
+    def dropdown_values(self, folders, extensions, empty_value='None'):
+        """
+        Builds the dropdown values used by the case editor. Each file is a (label, value) pair: the
+        value "name - path" is what cases store, and the label adds the probed metadata, e.g.
+        "tap.wav (0.120 s, 44100 Hz, 1 ch) - Files/Audio/tap.wav", so it is only shown in the list.
+
+        Args:
+            folders (list[str]): The folders to include, in order.
+            extensions (tuple): Only include files with these extensions.
+            empty_value (str): The first value, meaning no file is selected.
+
+        Returns:
+            list: The empty value followed by the (label, value) pairs.
+        """
+        entries = [entry for folder in folders for entry in self.list_files(folder, extensions)]
+        metadata = self.probe([entry['path'] for entry in entries])
+        values = [empty_value]
+        for entry in entries:
+            summary = describe(metadata[entry['path']])
+            label = f"{entry['name']} ({summary})" if summary else entry['name']
+            values.append((f"{label} - {entry['path']}", f"{entry['name']} - {entry['path']}"))
+        return values
+
+    def invalidate(self, folder=None):
+        """
+        Drops the cached listings of a folder and its subfolders, or of every folder.
+        """
+        with self._lock:
+            if folder is None:
+                self._directory_cache.clear()
+            else:
+                prefix = os.path.join(folder, '')
+                for cached_folder in list(self._directory_cache):
+                    if cached_folder == folder or cached_folder.startswith(prefix):
+                        del self._directory_cache[cached_folder]
+
+# Catalog shared by all the UIs
+catalog = AssetCatalog()
@@ -0,0 +1,231 @@
+"""
+audio_to_ahap.py
+
+This file contains the audio to AHAP converter, which derives a haptic pattern from a
+WAV file so every audio stimulus can get a matching haptic file. The file is cut into
+short overlapping frames, and the RMS envelope, the spectral flux and the spectral
+centroid of all frames are computed in single vectorized NumPy passes. Peaks of the
+spectral flux become HapticTransient events, and every stretch of sound above the
+silence gate becomes a HapticContinuous event whose HapticIntensityControl curves follow
+the envelope. The sharpness of the events follows the spectral centroid. A whole audio
+folder is converted in a process pool.
+
+Usage:
+    python audio_to_ahap.py
+    python audio_to_ahap.py Files/Audio/Original/1.wav --overwrite
+"""
+
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import soundfile as sf
+from default_configs import default_settings
+from waveform import SILENCE_RATIO
+from stimulus_synth import sharpness_of, MAX_CURVE_POINTS
+
+# Analysis frame length and hop in seconds
+FRAME_TIME = 0.010
+HOP_TIME = 0.005
+# An onset needs a spectral flux this many median absolute deviations above the median
+ONSET_THRESHOLD = 4.0
+# Flux peaks below this fraction of the largest peak are never onsets, which matters when
+# the median absolute deviation is zero (mostly digital silence)
+ONSET_FLOOR = 0.1
+# Shortest time between two transients in seconds
+MIN_ONSET_INTERVAL = 0.03
+# Quiet gaps shorter than this do not split a continuous event, in seconds
+MIN_GAP = 0.03
+# Spacing of the intensity curve control points in seconds
+CURVE_RESOLUTION = 0.02
+# Core Haptics limits a continuous event to 30 seconds
+MAX_EVENT_DURATION = 30.0
+
+def analyze(signal, samplerate, frame_time=FRAME_TIME, hop_time=HOP_TIME):
+    """
+    Computes the frame features of a signal.
+
+    Args:
+        signal (numpy.ndarray): The (frames,) or (frames, channels) signal.
+        samplerate (int): The sample rate in Hz.
+
+    Returns:
+        dict: The frame center "times" (seconds), the RMS "envelope", the spectral "flux" and the spectral "centroid" (Hz).
+    """
+    mono = signal.mean(axis=1) if signal.ndim == 2 else signal
+    frame = max(2, int(round(frame_time * samplerate)))
+    hop = max(1, int(round(hop_time * samplerate)))
+    # Pad so the last samples fall in a frame, then view every frame without copying
+    mono = np.concatenate([mono, np.zeros(frame, dtype=mono.dtype)])
+    frames = np.lib.stride_tricks.sliding_window_view(mono, frame)[::hop]
+
+    envelope = np.sqrt(np.mean(frames ** 2, axis=1))
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(frame), axis=1))
+    frequencies = np.fft.rfftfreq(frame, 1 / samplerate)
+    energy = spectrum.sum(axis=1)
+    centroid = np.divide(spectrum @ frequencies, energy, out=np.zeros_like(energy), where=energy > 0)
+    # Half wave rectified flux of the log magnitude, so quiet onsets count as much as loud ones
+    log_spectrum = np.log1p(100 * spectrum)
+    flux = np.concatenate([[log_spectrum[0].sum()], np.maximum(np.diff(log_spectrum, axis=0), 0).sum(axis=1)])
+    return {"times": (np.arange(len(frames)) * hop + frame / 2) / samplerate, "envelope": envelope, "flux": flux, "centroid": centroid}
+
+def detect_onsets(flux, times, threshold=ONSET_THRESHOLD, min_interval=MIN_ONSET_INTERVAL):
+    """
+    Returns the frame indices of the spectral flux peaks above an adaptive threshold.
+    """
+    if flux.size == 0:
+        return np.array([], dtype=np.int64)
+    median = np.median(flux)
+    deviation = np.median(np.abs(flux - median))
+    limit = max(median + threshold * deviation, ONSET_FLOOR * flux.max())
+    padded = np.concatenate([[-np.inf], flux, [-np.inf]])
+    peaks = np.flatnonzero((flux >= padded[:-2]) & (flux > padded[2:]) & (flux > limit))
+    # Keep the strongest peak of every cluster closer than min_interval
+    spacing = max(1, int(round(min_interval / (times[1] - times[0])))) if times.size > 1 else 1
+    blocked = np.zeros(flux.size, dtype=bool)
+    kept = []
+    for index in peaks[np.argsort(-flux[peaks], kind='stable')]:
+        if not blocked[index]:
+            kept.append(index)
+            blocked[max(0, index - spacing + 1):index + spacing] = True
+    return np.sort(np.array(kept, dtype=np.int64))
+
+def sound_regions(loud, times, hop_time=HOP_TIME, min_gap=MIN_GAP):
+    """
+    Returns the (start, end) frame index pairs of the runs of loud frames, merging runs separated by short gaps.
+    """
+    edges = np.diff(np.concatenate([[0], loud.astype(np.int8), [0]]))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    if starts.size == 0:
+        return []
+    # A gap is merged when the next run starts less than min_gap after the previous one ends
+    keep = np.concatenate([[True], (starts[1:] - ends[:-1]) * hop_time >= min_gap])
+    return list(zip(starts[keep].tolist(), np.concatenate([ends[:-1][keep[1:]], ends[-1:]]).tolist()))
+
+def intensity_curves(times, envelope, start_time, duration, resolution=CURVE_RESOLUTION):
+    """
+    Samples the envelope every resolution seconds over an event and splits the points into
+    HapticIntensityControl curves of at most MAX_CURVE_POINTS points, each curve starting where the previous ended.
+    """
+    count = max(2, int(np.ceil(duration / resolution)) + 1)
+    point_times = np.linspace(start_time, start_time + duration, count)
+    values = np.clip(np.interp(point_times, times, envelope), 0.0, 1.0)
+    curves = []
+    for first in range(0, count - 1, MAX_CURVE_POINTS - 1):
+        last = min(first + MAX_CURVE_POINTS, count)
+        curve_time = point_times[first]
+        curves.append({"ParameterCurve": {
+            "ParameterID": "HapticIntensityControl",
+            "Time": round(float(curve_time), 6),
+            "ParameterCurveControlPoints": [
+                {"Time": round(float(t - curve_time), 6), "ParameterValue": round(float(value), 6)}
+                for t, value in zip(point_times[first:last], values[first:last])
+            ]
+        }})
+    return curves
+
+def audio_to_ahap(signal, samplerate, project="", threshold=ONSET_THRESHOLD):
+    """
+    Derives an AHAP pattern from an audio signal.
+
+    Args:
+        signal (numpy.ndarray): The (frames,) or (frames, channels) signal.
+        samplerate (int): The sample rate in Hz.
+        project (str): The project name written to the metadata.
+        threshold (float): The onset threshold in median absolute deviations.
+
+    Returns:
+        dict: The AHAP data.
+    """
+    features = analyze(signal, samplerate)
+    times, envelope, centroid = features["times"], features["envelope"], features["centroid"]
+    peak = envelope.max() if envelope.size else 0.0
+    pattern = []
+    if peak > 0:
+        envelope = envelope / peak
+        loud = envelope > SILENCE_RATIO
+
+        for index in detect_onsets(features["flux"], times, threshold):
+            # The transient takes the loudest envelope value just after the onset
+            window = envelope[index:index + max(1, int(round(MIN_ONSET_INTERVAL / HOP_TIME)))]
+            pattern.append({"Event": {"EventType": "HapticTransient", "Time": round(float(times[index]), 6), "EventParameters": [
+                {"ParameterID": "HapticIntensity", "ParameterValue": round(float(window.max()), 6)},
+                {"ParameterID": "HapticSharpness", "ParameterValue": round(float(sharpness_of(max(centroid[index], 1.0))), 6)}
+            ]}})
+
+        for start, end in sound_regions(loud, times):
+            region_start, region_end = max(float(times[start]) - FRAME_TIME / 2, 0.0), float(times[end - 1]) + FRAME_TIME / 2
+            region_sharpness = float(sharpness_of(max(np.average(centroid[start:end], weights=envelope[start:end] + 1e-12), 1.0)))
+            for event_start in np.arange(region_start, region_end, MAX_EVENT_DURATION):
+                duration = min(MAX_EVENT_DURATION, region_end - event_start)
+                pattern.append({"Event": {"EventType": "HapticContinuous", "Time": round(float(event_start), 6), "EventDuration": round(float(duration), 6), "EventParameters": [
+                    {"ParameterID": "HapticIntensity", "ParameterValue": 1.0},
+                    {"ParameterID": "HapticSharpness", "ParameterValue": round(region_sharpness, 6)}
+                ]}})
+                pattern.extend(intensity_curves(times, envelope, float(event_start), duration))
+
+    pattern.sort(key=lambda entry: next(iter(entry.values()))["Time"])
+    return {"Version": 1.0, "Metadata": {"Project": project, "Description": "Derived from the audio by audio_to_ahap.py"}, "Pattern": pattern}
+
+def convert_file(audio_path, haptic_path, threshold=ONSET_THRESHOLD):
+    """
+    Converts one audio file to an AHAP file. Runs in the worker processes.
+
+    Returns:
+        dict: The written path and the number of transient and continuous events.
+    """
+    signal, samplerate = sf.read(audio_path, dtype='float32')
+    ahap_data = audio_to_ahap(signal, samplerate, os.path.splitext(os.path.basename(audio_path))[0], threshold)
+    os.makedirs(os.path.dirname(haptic_path) or '.', exist_ok=True)
+    with open(haptic_path, 'w') as f:
+        json.dump(ahap_data, f, indent=4)
+    event_types = [entry["Event"]["EventType"] for entry in ahap_data["Pattern"] if "Event" in entry]
+    return {"path": haptic_path, "transients": event_types.count("HapticTransient"), "continuous": event_types.count("HapticContinuous")}
+
+def convert_folder(audio_paths, haptic_folder, overwrite=False, workers=None, threshold=ONSET_THRESHOLD):
+    """
+    Converts audio files to AHAP files of the same name in a process pool.
+
+    Args:
+        audio_paths (list[str]): The audio files.
+        haptic_folder (str): The folder the AHAP files are written to.
+        overwrite (bool): Whether existing AHAP files, e.g. authored by hand, are replaced.
+        workers (int, optional): The number of worker processes, the CPU count by default.
+        threshold (float): The onset threshold in median absolute deviations.
+
+    Returns:
+        tuple: The conversion results and the skipped AHAP paths.
+    """
+    jobs, skipped = [], []
+    for audio_path in audio_paths:
+        haptic_path = os.path.join(haptic_folder, f"{os.path.splitext(os.path.basename(audio_path))[0]}.ahap")
+        if os.path.exists(haptic_path) and not overwrite:
+            skipped.append(haptic_path)
+        else:
+            jobs.append((audio_path, haptic_path))
+    if not jobs:
+        return [], skipped
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(convert_file, audio_path, haptic_path, threshold) for audio_path, haptic_path in jobs]
+        return [future.result() for future in futures], skipped
+
+def main():
+    parser = argparse.ArgumentParser(description="Derive AHAP haptic patterns from WAV files.")
+    parser.add_argument("files", nargs="*", help="WAV files to convert (default: every WAV file in the audio folder)")
+    parser.add_argument("--audio-folder", default=default_settings['FolderVariables']['OriginalAudioFolder'], help="Folder converted when no files are given")
+    parser.add_argument("--haptic-folder", default=default_settings['FolderVariables']['OriginalHapticFolder'], help="Folder the AHAP files are written to")
+    parser.add_argument("--overwrite", action="store_true", help="Replace existing AHAP files")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--threshold", type=float, default=ONSET_THRESHOLD, help=f"Onset threshold in median absolute deviations (default: {ONSET_THRESHOLD})")
+    args = parser.parse_args()
+
+    audio_paths = args.files or sorted(os.path.join(args.audio_folder, f) for f in os.listdir(args.audio_folder) if f.lower().endswith('.wav'))
+    results, skipped = convert_folder(audio_paths, args.haptic_folder, args.overwrite, args.workers, args.threshold)
+    for result in results:
+        print(f"{result['path']}: {result['transients']} transients, {result['continuous']} continuous events")
+    for haptic_path in skipped:
+        print(f"Skipped existing {haptic_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""
+benchmark.py
+
+This file contains the benchmark suite for the generation and media hot paths: audio and
+haptic latency conversion on small and large synthetic inputs, the AHAP pattern transforms, location array generation
+for several button footprints, case and experiment JSON generation and validation, and
+config loading. Every benchmark runs headlessly in a temporary workspace, so the
+repository files are never touched. Tk widget benchmarks (EditableList with n rows,
+CaseUI construction) are skipped when no display is available.
+
+Results are written as JSON together with the environment they were measured on, and can
+be compared against a stored baseline: a benchmark whose median time grows by more than
+the threshold is reported as a regression and the command exits with status 1.
+
+Usage:
+    python benchmark.py --save-baseline
+    python benchmark.py --output .gui/benchmark/latest.json --threshold 0.25
+    python benchmark.py --quick --only latency
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from types import SimpleNamespace
+from importlib import metadata
+from unittest import mock
+import numpy as np
+import soundfile as sf
+import jsonschema
+import tkinter as tk
+import case_ui
+import experiment_ui
+from case_ui import CaseUI
+from latency_ui import LatencyUI
+from ahap_pattern import AhapPattern
+from experiment_ui import ExperimentUI
+from custom_widget import EditableList
+from default_configs import default_settings, default_case_config, load_setting, load_case_config, load_experiment_config, initialize_config_files, DEFAULT_GUI_FOLDER
+
+DEFAULT_BENCHMARK_FOLDER = os.path.join(DEFAULT_GUI_FOLDER, 'benchmark')
+DEFAULT_BASELINE_PATH = os.path.join(DEFAULT_BENCHMARK_FOLDER, 'baseline.json')
+# Relative growth of the median time reported as a regression
+DEFAULT_THRESHOLD = 0.25
+
+# Synthetic inputs as (name, seconds, channels, sample rate) and (name, number of pattern entries)
+AUDIO_INPUTS = [("small", 1, 1, 44100), ("large", 120, 2, 48000)]
+HAPTIC_INPUTS = [("small", 50), ("large", 50000)]
+# Button footprints as (width, height) in percent of the screen
+LOCATION_FOOTPRINTS = [(5, 5), (15, 10), (20, 15)]
+EDITABLE_LIST_ROWS = [10, 100, 500]
+
+def measure(name, func, repeat=5, number=1, setup=None):
+    """
+    Times a function, running it number times in each of repeat rounds.
+
+    Args:
+        name (str): The benchmark name.
+        func (function): The function to time.
+        repeat (int): The number of rounds.
+        number (int): The number of calls per round.
+        setup (function, optional): Called before every round, outside the timing.
+
+    Returns:
+        dict: The min, median and mean seconds per call.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    return {
+        "name": name,
+        "repeat": repeat,
+        "number": number,
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "mean_s": statistics.fmean(times)
+    }
+
+def skipped(name, reason):
+    return {"name": name, "skipped": reason}
+
+def environment_info():
+    """
+    Returns the interpreter, library and machine details the results were measured with.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "soundfile": sf.__version__,
+        "jsonschema": metadata.version("jsonschema"),
+        "tk": tk.TkVersion
+    }
+
+def synthetic_ahap(entries, seed=0):
+    """
+    Returns an AHAP pattern alternating transient events, continuous events and parameter curves.
+    """
+    rng = np.random.default_rng(seed)
+    times = np.sort(rng.uniform(0, entries * 0.01, entries)).round(6).tolist()
+    pattern = []
+    for i, t in enumerate(times):
+        if i % 3 == 0:
+            pattern.append({"Event": {"Time": t, "EventType": "HapticTransient", "EventParameters": [
+                {"ParameterID": "HapticIntensity", "ParameterValue": 0.8},
+                {"ParameterID": "HapticSharpness", "ParameterValue": 0.4}]}})
+        elif i % 3 == 1:
+            pattern.append({"Event": {"Time": t, "EventType": "HapticContinuous", "EventDuration": 0.05, "EventParameters": [
+                {"ParameterID": "HapticIntensity", "ParameterValue": 0.6}]}})
+        else:
+            pattern.append({"ParameterCurve": {"ParameterID": "HapticIntensityControl", "Time": t, "ParameterCurveControlPoints": [
+                {"Time": round(k * 0.005, 6), "ParameterValue": 0.5} for k in range(16)]}})
+    return {"Version": 1.0, "Metadata": {"Project": "Benchmark"}, "Pattern": pattern}
+
+def prepare_workspace(folder, quick=False):
+    """
+    Writes the synthetic inputs and the schemas into a workspace folder.
+
+    Args:
+        folder (str): The workspace folder, used as the working directory while benchmarking.
+        quick (bool): Whether the large inputs are made ten times smaller.
+
+    Returns:
+        dict: The settings pointing at the workspace folders.
+    """
+    settings = copy.deepcopy(default_settings)
+    for path in settings['FolderVariables'].values():
+        os.makedirs(os.path.join(folder, path), exist_ok=True)
+    shutil.copytree('Schema', os.path.join(folder, 'Schema'))
+
+    rng = np.random.default_rng(0)
+    for name, seconds, channels, samplerate in AUDIO_INPUTS:
+        if quick and name == "large":
+            seconds = seconds / 10
+        frames = int(seconds * samplerate)
+        data = (0.1 * rng.standard_normal((frames, channels))).astype(np.float32)
+        sf.write(os.path.join(folder, settings['FolderVariables']['OriginalAudioFolder'], f"{name}.wav"), data, samplerate, subtype='PCM_16')
+
+    for name, entries in HAPTIC_INPUTS:
+        if quick and name == "large":
+            entries = entries // 10
+        with open(os.path.join(folder, settings['FolderVariables']['OriginalHapticFolder'], f"{name}.ahap"), 'w') as f:
+            json.dump(synthetic_ahap(entries), f, indent=4)
+    return settings
+
+def benchmark_latency(settings, repeat):
+    results = []
+    # The conversion methods only read the settings, the latency and the alignment mode of the LatencyUI
+    for align_onset in (False, True):
+        converter = SimpleNamespace(settings=settings, latency=0.5, align_onset=align_onset)
+        suffix = ",aligned" if align_onset else ""
+        for name, *_ in AUDIO_INPUTS:
+            results.append(measure(f"audio_latency[{name}{suffix}]", lambda: LatencyUI.audio_latency(converter, f"{name}.wav"), repeat))
+        for name, _ in HAPTIC_INPUTS:
+            results.append(measure(f"haptic_latency[{name}{suffix}]", lambda: LatencyUI.haptic_latency(converter, f"{name}.ahap"), repeat))
+    return results
+
+def benchmark_ahap_pattern(repeat):
+    """
+    Times the columnar AHAP transforms on already loaded patterns.
+    """
+    results = []
+    for name, entries in HAPTIC_INPUTS:
+        pattern = AhapPattern.from_dict(synthetic_ahap(entries))
+        results.append(measure(f"ahap_shift_trim[{name}]", lambda: pattern.shift(-0.05).trim(0.0), repeat, number=10))
+        results.append(measure(f"ahap_scale[{name}]", lambda: pattern.scale_time(1.5).scale_intensity(0.5), repeat, number=10))
+        results.append(measure(f"ahap_concatenate[{name}]", lambda: AhapPattern.concatenate([pattern] * 4, 0.05), repeat, number=10))
+        results.append(measure(f"ahap_render[{name}]", lambda: pattern.render(), repeat, number=10))
+    return results
+
+def benchmark_location_array(repeat):
+    results = []
+    for width, height in LOCATION_FOOTPRINTS:
+        random.seed(0)
+        # generate_location_array only uses its arguments, so it is called without a CaseUI
+        results.append(measure(f"generate_location_array[{width}x{height}]", lambda: CaseUI.generate_location_array(None, width, height), repeat, number=20))
+    return results
+
+def benchmark_generation(settings, repeat):
+    """
+    Times case and experiment JSON generation through the UI methods, with the message boxes silenced.
+    """
+    results = []
+    case = copy.deepcopy(default_case_config)
+    case.update({
+        "case_id": "Benchmark",
+        "interaction": "tap & restart",
+        "location_array_enabled": True,
+        "custom_text_enabled": True,
+        "highlight_array_enabled": True
+    })
+    case['timer']['enabled'] = True
+    case['scoreboard']['enabled'] = True
+    case['location_array'] = [{"x": str(10 * i), "y": str(5 * i)} for i in range(9)]
+    for file_type in case['linked_files']:
+        kind = file_type.split('_')[1]
+        folder = settings['FolderVariables']['OriginalAudioFolder' if kind == 'audio' else 'OriginalHapticFolder']
+        file_name = "small.wav" if kind == 'audio' else "small.ahap"
+        case['linked_files'][file_type] = [f"{file_name} - {folder.replace(os.sep, '/')}/{file_name}"] * 9
+    case_view = SimpleNamespace(settings=settings, case=case)
+    experiment_view = SimpleNamespace(settings=settings, experiment={"ExperimentID": "Benchmark", "CaseFiles": ["Files/Case/Benchmark.json"] * 20, "survey_url": ""})
+
+    with mock.patch.object(case_ui, 'messagebox') as case_messagebox, mock.patch.object(experiment_ui, 'messagebox') as experiment_messagebox:
+        results.append(measure("generate_case_json", lambda: CaseUI.generate_case_json(case_view), repeat, number=10))
+        results.append(measure("generate_experiment_json", lambda: ExperimentUI.generate_experiment_json(experiment_view), repeat, number=10))
+    for messagebox in (case_messagebox, experiment_messagebox):
+        if messagebox.showerror.called:
+            raise RuntimeError(f"Generation failed: {messagebox.showerror.call_args}")
+
+    for name, data_path, schema_path in (("case", "Files/Case/Benchmark.json", "Schema/case.json"), ("experiment", "Files/Experiment/Benchmark.json", "Schema/experiment.json")):
+        with open(data_path) as f:
+            data = json.load(f)
+        with open(schema_path) as f:
+            schema = json.load(f)
+        results.append(measure(f"validate_{name}_json", lambda: jsonschema.validate(data, schema), repeat, number=10))
+    return results
+
+def benchmark_config_loading(repeat):
+    initialize_config_files()
+    return [
+        measure("load_setting", load_setting, repeat, number=20),
+        measure("load_case_config", load_case_config, repeat, number=20),
+        measure("load_experiment_config", load_experiment_config, repeat, number=20)
+    ]
+
+def benchmark_widgets(settings, repeat):
+    """
+    Times widget construction. Skipped when Tk cannot open a display.
+    """
+    names = [f"EditableList[{rows}]" for rows in EDITABLE_LIST_ROWS] + ["CaseUI"]
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        return [skipped(name, f"no display: {str(e)}") for name in names]
+    root.withdraw()
+    results = []
+    try:
+        for rows in EDITABLE_LIST_ROWS:
+            entries = [[str(i)] for i in range(rows)]
+            def build():
+                editable_list = EditableList(root, entries, lambda entries: None)
+                root.update_idletasks()
+                editable_list.destroy()
+            results.append(measure(f"EditableList[{rows}]", build, repeat))
+        def build_case_ui():
+            case_view = CaseUI(root, settings)
+            root.update_idletasks()
+            case_view.destroy()
+        results.append(measure("CaseUI", build_case_ui, repeat))
+    finally:
+        root.destroy()
+    return results
+
+def benchmark_names():
+    """
+    Returns the names of the benchmarks of each group, so groups that --only cannot match are not run.
+    """
+    return {
+        "latency": [f"{kind}_latency[{name}{suffix}]" for suffix in ("", ",aligned")
+                    for kind, inputs in (("audio", AUDIO_INPUTS), ("haptic", HAPTIC_INPUTS)) for name, *_ in inputs],
+        "ahap_pattern": [f"ahap_{kind}[{name}]" for name, _ in HAPTIC_INPUTS for kind in ("shift_trim", "scale", "concatenate", "render")],
+        "location_array": [f"generate_location_array[{width}x{height}]" for width, height in LOCATION_FOOTPRINTS],
+        "generation": ["generate_case_json", "generate_experiment_json", "validate_case_json", "validate_experiment_json"],
+        "config_loading": ["load_setting", "load_case_config", "load_experiment_config"],
+        "widgets": [f"EditableList[{rows}]" for rows in EDITABLE_LIST_ROWS] + ["CaseUI"],
+    }
+
+def run_benchmarks(quick=False, only=None):
+    """
+    Runs the benchmark suite in a temporary workspace.
+
+    Args:
+        quick (bool): Whether to use fewer rounds and smaller large inputs.
+        only (str, optional): Only run the benchmarks whose name contains this text.
+
+    Returns:
+        dict: The environment info and the benchmark results.
+    """
+    repeat = 3 if quick else 7
+    source_folder = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="touchtact-benchmark-") as folder:
+        settings = prepare_workspace(folder, quick)
+        os.chdir(folder)
+        groups = [
+            ("latency", lambda: benchmark_latency(settings, repeat)),
+            ("ahap_pattern", lambda: benchmark_ahap_pattern(repeat)),
+            ("location_array", lambda: benchmark_location_array(repeat)),
+            ("generation", lambda: benchmark_generation(settings, repeat)),
+            ("config_loading", lambda: benchmark_config_loading(repeat)),
+            ("widgets", lambda: benchmark_widgets(settings, repeat)),
+        ]
+        names = benchmark_names()
+        try:
+            results = []
+            for group, run in groups:
+                # Groups without a matching benchmark are skipped before running anything
+                if only and not any(only in name for name in names[group]):
+                    continue
+                results += run()
+        finally:
+            os.chdir(source_folder)
+    if only:
+        results = [result for result in results if only in result['name']]
+    return {"environment": environment_info(), "quick": quick, "results": results}
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares the median times of a report against a baseline report.
+
+    Returns:
+        list[dict]: The benchmarks measured in both reports, with their ratio and whether they regressed.
+    """
+    baseline_results = {result['name']: result for result in baseline['results'] if 'skipped' not in result}
+    comparisons = []
+    for result in report['results']:
+        reference = baseline_results.get(result['name'])
+        if 'skipped' in result or reference is None or not reference['median_s']:
+            continue
+        ratio = result['median_s'] / reference['median_s']
+        comparisons.append({"name": result['name'], "baseline_s": reference['median_s'], "median_s": result['median_s'], "ratio": ratio, "regressed": ratio > 1 + threshold})
+    return comparisons
+
+def print_report(report, comparisons=None):
+    environment = report['environment']
+    print(f"Python {environment['python']} on {environment['platform']}, numpy {environment['numpy']}, commit {environment['commit']}")
+    ratios = {comparison['name']: comparison for comparison in comparisons or []}
+    print(f"{'Benchmark':<40}{'Min ms':>12}{'Median ms':>12}{'Baseline':>12}")
+    for result in report['results']:
+        if 'skipped' in result:
+            print(f"{result['name']:<40}  skipped ({result['skipped']})")
+            continue
+        comparison = ratios.get(result['name'])
+        ratio = f"{comparison['ratio']:.2f}x" if comparison else "-"
+        flag = "  REGRESSION" if comparison and comparison['regressed'] else ""
+        print(f"{result['name']:<40}{result['min_s'] * 1000:>12.3f}{result['median_s'] * 1000:>12.3f}{ratio:>12}{flag}")
+
+def write_report(report, file_path):
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    with open(file_path, 'w') as f:
+        json.dump(report, f, indent=4)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the generation and media hot paths.")
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help=f"Baseline results to compare against (default: {DEFAULT_BASELINE_PATH})")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help=f"Relative slowdown reported as a regression (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument("--quick", action="store_true", help="Fewer rounds and smaller large inputs")
+    parser.add_argument("--only", default=None, help="Only run the benchmarks whose name contains this text")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.quick, args.only)
+    if args.output:
+        write_report(report, args.output)
+    if args.save_baseline:
+        write_report(report, args.baseline)
+        print_report(report)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    comparisons = None
+    if os.path.isfile(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get('quick') != report['quick']:
+            print("Warning: the baseline was measured with a different --quick setting")
+        comparisons = compare(report, baseline, args.threshold)
+    print_report(report, comparisons)
+    regressions = [comparison for comparison in comparisons or [] if comparison['regressed']]
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
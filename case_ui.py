@@ -10,37 +10,71 @@ for each experimental case.
 """
 
 import os
+import copy
 import json, jsonschema
 import random
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from custom_widget import ScrollableFrame, EditableList, LabelEntryRow
-from default_configs import load_case_config, update_last_used_file_record, LAST_ACCESSED_CASE_PATH, DEFAULT_CASE_FOLDER
+from custom_widget import ScrollableFrame, EditableList, LabelEntryRow, WaveformPreview, LayoutPreview
+from asset_catalog import catalog, AUDIO_EXTENSIONS, HAPTIC_EXTENSIONS
+from waveform import load_waveform
+from default_configs import get_root_url, load_case_config, update_last_used_file_record, default_case_config, LAST_ACCESSED_CASE_PATH, DEFAULT_CASE_FOLDER
+from action_profiler import action_command
+
+def keep_ranking_tables(case_data, file_path):
+    """
+    Copies the timer and score ranking_table of the case JSON already at file_path into the new
+    case data, for the sections the new data still has.
+
+    Args:
+        case_data (dict): The case data about to be written.
+        file_path (str): The path of the generated case JSON.
+    """
+    try:
+        with open(file_path, 'r') as f:
+            existing = json.load(f)
+    except (OSError, ValueError):
+        return
+    for section in ('timer', 'score'):
+        ranking_table = existing.get(section, {}).get('ranking_table')
+        if section in case_data and ranking_table:
+            case_data[section]['ranking_table'] = ranking_table
 
 class CaseUI(tk.Frame):
     def __init__(self, parent, settings):
         super().__init__(parent)
         self.settings = settings
         self.case = load_case_config()
+        # LabelEntryRows paired with the functions reading their values from a case
+        self.case_rows = []
 
         self.create_widgets()
 
     def create_widgets(self):
         for widget in self.winfo_children():
             widget.destroy()
+        self.case_rows = []
+        self.layout_preview = None
+
+        # List the media folders once and share the values between the dropdowns
+        haptic_files = self.load_haptic_files()
+        audio_files = self.load_audio_files()
 
         button_frame = ttk.Frame(self)
         button_frame.pack(fill='x', side="bottom", pady=10)
 
-        save_button = ttk.Button(button_frame, text="Save", command=self.save_case)
+        save_button = ttk.Button(button_frame, text="Save", command=action_command(self.save_case))
         save_button.pack(side="left", padx=10)
 
-        load_button = ttk.Button(button_frame, text="Load", command=self.load_case)
+        load_button = ttk.Button(button_frame, text="Load", command=action_command(self.load_case))
         load_button.pack(side="left", padx=10)
 
-        generate_button = ttk.Button(button_frame, text="Generate", command=self.generate_case_json)
+        generate_button = ttk.Button(button_frame, text="Generate", command=action_command(self.generate_case_json))
         generate_button.pack(side="left", padx=10)
 
+        reset_button = ttk.Button(button_frame, text="Reset", command=action_command(self.reset_case))
+        reset_button.pack(side="left", padx=10)
+
         main_frame = ScrollableFrame(self)
         main_frame.pack(fill="both", expand=True)
         main_frame = main_frame.content_frame
@@ -51,15 +85,21 @@ class CaseUI(tk.Frame):
         case_id_frame.pack_propagate(False)  # Prevent resizing of the frame
 
         ### Create a label and textfield for Case ID
-        LabelEntryRow(case_id_frame, "Case ID:", self.case['case_id'], entry_callback=lambda x : self.case.update({'case_id': x}))
+        self.add_case_row(LabelEntryRow(case_id_frame, "Case ID:", self.case['case_id'], entry_callback=lambda x : self.case.update({'case_id': x})), lambda case: case['case_id'])
 
         ## Create a frame for the General Settings
-        general_settings_frame = ttk.LabelFrame(main_frame, text="General Settings", height=670)
+        general_settings_frame = ttk.LabelFrame(main_frame, text="General Settings", height=790)
         general_settings_frame.pack(fill="x", expand=True, side="top", padx=10, pady=10)
         general_settings_frame.pack_propagate(False)  # Prevent resizing of the frame
 
         ### Create a dropdown for the Interaction Type (tap & continue, tap & restart, swipe & restart)
-        interaction_type = LabelEntryRow(general_settings_frame, "Interaction Type:", self.case['interaction'], ["tap & continue", "tap & restart", "swipe_through & restart"], entry_callback=lambda x : self.case.update({'interaction': x}))
+        interaction_type = LabelEntryRow(general_settings_frame, "Interaction Type:", self.case['interaction'], ["tap & continue", "tap & restart", "swipe_through & restart"], entry_callback=lambda x : [self.case.update({'interaction': x}), self.refresh_layout_preview()])
+        self.add_case_row(interaction_type, lambda case: case['interaction'])
+
+        ### Create a waveform preview for the audio file focused in the audio dropdowns
+        self.waveform_preview = WaveformPreview(general_settings_frame, height=110)
+        self.waveform_preview.pack(fill="x", side="bottom", padx=10, pady=5)
+        self.waveform_preview.clear("Select an audio file to preview its waveform")
 
         ### Create a frame for the Array Settings
         array_settings_frame = ttk.Frame(general_settings_frame, height=420, width=600)
@@ -75,7 +115,7 @@ class CaseUI(tk.Frame):
         self.order_list = EditableList(
             order_array_frame,
             [[idx] for idx in self.case['order_array']],
-            lambda x: self.case.update({'order_array': [idx[0] for idx in x]}),
+            lambda x: [self.case.update({'order_array': [idx[0] for idx in x]}), self.refresh_layout_preview()],
             delete_enabled=False,
             add_enabled=False,
             move_up_callback=self.synchronize_move_up,
@@ -97,7 +137,7 @@ class CaseUI(tk.Frame):
         self.custom_text_list = EditableList(
             self.custom_text_array_frame,
             [[idx] for idx in self.case['custom_text_array']],
-            lambda x: self.case.update({'custom_text_array': [idx[0] for idx in x]}),
+            lambda x: [self.case.update({'custom_text_array': [idx[0] for idx in x]}), self.refresh_layout_preview()],
             delete_enabled=False,
             add_enabled=False,
             order_change_enabled=False
@@ -129,7 +169,7 @@ class CaseUI(tk.Frame):
         location_array_enabled_checkbutton.pack(fill="x", expand=True, side="top", padx=10, pady=10, after=custom_text_enabled_checkbutton)
 
         ### Create a Randomize Location button
-        randomize_location_button = ttk.Button(general_settings_frame, text="Randomize Location", command=self.randomize_location)
+        randomize_location_button = ttk.Button(general_settings_frame, text="Randomize Location", command=action_command(self.randomize_location))
         randomize_location_button.pack(fill="x", expand=True, side="top", padx=10, pady=10, after=location_array_enabled_checkbutton)
 
         ### Create a location_array Frame
@@ -142,7 +182,7 @@ class CaseUI(tk.Frame):
         self.location_list = EditableList(
             self.location_array_frame,
             [[loc['x'], loc['y']] for loc in self.case['location_array']],
-            lambda x: self.case.update({'location_array': [{'x': loc[0], 'y': loc[1]} for loc in x]}),
+            lambda x: [self.case.update({'location_array': [{'x': loc[0], 'y': loc[1]} for loc in x]}), self.refresh_layout_preview()],
             entry_factory=lambda: [tk.StringVar(value="50"), tk.StringVar(value="50")],
             delete_enabled=False,
             add_enabled=False,
@@ -175,7 +215,7 @@ class CaseUI(tk.Frame):
             lambda x: self.case['linked_files'].update({'correct_haptic': [idx[0] for idx in x]}),
             delete_enabled=False,
             add_enabled=False,
-            dropdown_values=self.load_haptic_files(),
+            dropdown_values=haptic_files,
             order_change_enabled=False
         )
         self.correct_haptic.pack(fill="both", expand=True)
@@ -192,7 +232,7 @@ class CaseUI(tk.Frame):
             lambda x: self.case['linked_files'].update({'wrong_haptic': [idx[0] for idx in x]}),
             delete_enabled=False,
             add_enabled=False,
-            dropdown_values=self.load_haptic_files(),
+            dropdown_values=haptic_files,
             order_change_enabled=False
         )
         self.wrong_haptic.pack(fill="both", expand=True)
@@ -214,8 +254,9 @@ class CaseUI(tk.Frame):
             lambda x: self.case['linked_files'].update({'correct_audio': [idx[0] for idx in x]}),
             delete_enabled=False,
             add_enabled=False,
-            dropdown_values=self.load_audio_files(),
-            order_change_enabled=False
+            dropdown_values=audio_files,
+            order_change_enabled=False,
+            focus_callback=self.preview_audio
         )
         self.correct_audio.pack(fill="both", expand=True)
 
@@ -231,11 +272,22 @@ class CaseUI(tk.Frame):
             lambda x: self.case['linked_files'].update({'wrong_audio': [idx[0] for idx in x]}),
             delete_enabled=False,
             add_enabled=False,
-            dropdown_values=self.load_audio_files(),
-            order_change_enabled=False
+            dropdown_values=audio_files,
+            order_change_enabled=False,
+            focus_callback=self.preview_audio
         )
         self.wrong_audio.pack(fill="both", expand=True)
 
+        ## Create a frame for the Layout Preview
+        layout_preview_frame = ttk.LabelFrame(main_frame, text="Layout Preview (drag the buttons to move them)", height=460)
+        layout_preview_frame.pack(fill="x", expand=True, side="top", padx=10, pady=10)
+        layout_preview_frame.pack_propagate(False)  # Prevent resizing of the frame
+
+        ### Create a canvas drawing the layout image and the location array
+        self.layout_preview = LayoutPreview(layout_preview_frame, self.move_location)
+        self.layout_preview.pack(fill="both", expand=True, padx=10, pady=10)
+        self.refresh_layout_preview()
+
         ## Create a frame for the Highlight Settings
         highlight_frame = ttk.LabelFrame(main_frame, text="Highlight Settings", height=450)
         highlight_frame.pack(fill="x", expand=True, side="top", padx=10, pady=10)
@@ -281,13 +333,13 @@ class CaseUI(tk.Frame):
         self.timer_settings_frame.pack(fill="x", padx=10, pady=5)
 
         #### Create inputs for timer settings
-        LabelEntryRow(self.timer_settings_frame, "Direction:", self.case['timer']['direction'], ["up", "down"], entry_callback=lambda x: self.case['timer'].update({'direction': x}))
+        self.add_case_row(LabelEntryRow(self.timer_settings_frame, "Direction:", self.case['timer']['direction'], ["up", "down"], entry_callback=lambda x: self.case['timer'].update({'direction': x})), lambda case: case['timer']['direction'])
 
-        LabelEntryRow(self.timer_settings_frame, "Max Time (ms):", self.case['timer']['max_time'], entry_callback=lambda x: self.case['timer'].update({'max_time': x}))
+        self.add_case_row(LabelEntryRow(self.timer_settings_frame, "Max Time (ms):", self.case['timer']['max_time'], entry_callback=lambda x: self.case['timer'].update({'max_time': x})), lambda case: case['timer']['max_time'])
 
-        LabelEntryRow(self.timer_settings_frame, "Format:", self.case['timer']['format'], ["S", "s", "m", "s.SSS", "mm:ss", "mm:ss.SSS"], entry_callback=lambda x: self.case['timer'].update({ 'format': x }))
+        self.add_case_row(LabelEntryRow(self.timer_settings_frame, "Format:", self.case['timer']['format'], ["S", "s", "m", "s.SSS", "mm:ss", "mm:ss.SSS"], entry_callback=lambda x: self.case['timer'].update({ 'format': x })), lambda case: case['timer']['format'])
 
-        LabelEntryRow(self.timer_settings_frame, "Fake Ranking:", self.case['timer']['fake_ranking'], entry_callback=lambda x: self.case['timer'].update({'fake_ranking': x}), toggle_val=self.case['timer']['fake_ranking_enabled'], toggle_callback=lambda x: self.case['timer'].update({'fake_ranking_enabled': x}))
+        self.add_case_row(LabelEntryRow(self.timer_settings_frame, "Fake Ranking:", self.case['timer']['fake_ranking'], entry_callback=lambda x: self.case['timer'].update({'fake_ranking': x}), toggle_val=self.case['timer']['fake_ranking_enabled'], toggle_callback=lambda x: self.case['timer'].update({'fake_ranking_enabled': x})), lambda case: case['timer']['fake_ranking'], lambda case: case['timer']['fake_ranking_enabled'])
 
         self.toggle_timer_settings() 
 
@@ -306,15 +358,15 @@ class CaseUI(tk.Frame):
         self.scoreboard_settings_frame.pack(fill="x", padx=10, pady=5)
 
         #### Create inputs for scoreboard settings
-        LabelEntryRow(self.scoreboard_settings_frame, "Reward Score:", self.case['scoreboard']['reward_score'], entry_callback=lambda x: self.case['scoreboard'].update({'reward_score': x}))
+        self.add_case_row(LabelEntryRow(self.scoreboard_settings_frame, "Reward Score:", self.case['scoreboard']['reward_score'], entry_callback=lambda x: self.case['scoreboard'].update({'reward_score': x})), lambda case: case['scoreboard']['reward_score'])
 
-        LabelEntryRow(self.scoreboard_settings_frame, "Penalty Percentage:", self.case['scoreboard']['penalty_percentage'], [str(i) for i in range(0,101)], entry_callback=lambda x: self.case['scoreboard'].update({'penalty_percentage': x}))
+        self.add_case_row(LabelEntryRow(self.scoreboard_settings_frame, "Penalty Percentage:", self.case['scoreboard']['penalty_percentage'], [str(i) for i in range(0,101)], entry_callback=lambda x: self.case['scoreboard'].update({'penalty_percentage': x})), lambda case: case['scoreboard']['penalty_percentage'])
 
-        LabelEntryRow(self.scoreboard_settings_frame, "Decimal Places:", self.case['scoreboard']['decimal_places'], ["0","1","2","3"], entry_callback=lambda x: self.case['scoreboard'].update({'decimal_places': x}))
+        self.add_case_row(LabelEntryRow(self.scoreboard_settings_frame, "Decimal Places:", self.case['scoreboard']['decimal_places'], ["0","1","2","3"], entry_callback=lambda x: self.case['scoreboard'].update({'decimal_places': x})), lambda case: case['scoreboard']['decimal_places'])
 
-        LabelEntryRow(self.scoreboard_settings_frame, "Display Negative:", "True" if self.case['scoreboard']['display_negative'] else "False", ["True", "False"], entry_callback=lambda x: self.case['scoreboard'].update({'display_negative': x == "True"}))
+        self.add_case_row(LabelEntryRow(self.scoreboard_settings_frame, "Display Negative:", "True" if self.case['scoreboard']['display_negative'] else "False", ["True", "False"], entry_callback=lambda x: self.case['scoreboard'].update({'display_negative': x == "True"})), lambda case: "True" if case['scoreboard']['display_negative'] else "False")
 
-        LabelEntryRow(self.scoreboard_settings_frame, "Fake Ranking:", self.case['scoreboard']['fake_ranking'], entry_callback=lambda x: self.case['scoreboard'].update({'fake_ranking': x}), toggle_val=self.case['scoreboard']['fake_ranking_enabled'], toggle_callback=lambda x: self.case['scoreboard'].update({'fake_ranking_enabled': x}))
+        self.add_case_row(LabelEntryRow(self.scoreboard_settings_frame, "Fake Ranking:", self.case['scoreboard']['fake_ranking'], entry_callback=lambda x: self.case['scoreboard'].update({'fake_ranking': x}), toggle_val=self.case['scoreboard']['fake_ranking_enabled'], toggle_callback=lambda x: self.case['scoreboard'].update({'fake_ranking_enabled': x})), lambda case: case['scoreboard']['fake_ranking'], lambda case: case['scoreboard']['fake_ranking_enabled'])
 
         self.toggle_scoreboard_settings()
 
@@ -324,17 +376,93 @@ class CaseUI(tk.Frame):
         tutorial_frame.pack_propagate(False)  # Prevent resizing of the frame
 
         ### Create input fields for tutorial text
-        LabelEntryRow(tutorial_frame, "Interaction Type:", self.case['tutorial_text']['interaction_type'], ["", "tap on the button from 1 to 9", "swipe through the buttons from 1 to 9", "Please Enter Custom Instruction After Deleting This Text"], entry_callback=lambda x: self.case['tutorial_text'].update({'interaction_type': x}))
+        self.add_case_row(LabelEntryRow(tutorial_frame, "Interaction Type:", self.case['tutorial_text']['interaction_type'], ["", "tap on the button from 1 to 9", "swipe through the buttons from 1 to 9", "Please Enter Custom Instruction After Deleting This Text"], entry_callback=lambda x: self.case['tutorial_text'].update({'interaction_type': x})), lambda case: case['tutorial_text']['interaction_type'])
 
-        LabelEntryRow(tutorial_frame, "Penalty:", self.case['tutorial_text']['penalty'], ["", "incorrect interaction will result in a penalty", "Please Enter Custom Instruction After Deleting This Text"], entry_callback=lambda x: self.case['tutorial_text'].update({'penalty': x}))
+        self.add_case_row(LabelEntryRow(tutorial_frame, "Penalty:", self.case['tutorial_text']['penalty'], ["", "incorrect interaction will result in a penalty", "Please Enter Custom Instruction After Deleting This Text"], entry_callback=lambda x: self.case['tutorial_text'].update({'penalty': x})), lambda case: case['tutorial_text']['penalty'])
 
-        LabelEntryRow(tutorial_frame, "Game Mode:", self.case['tutorial_text']['game_mode'], ["","you will be able to continue from the button you left off if you make a mistake", "you will need to restart from the button 1 if you make a mistake", "Please Enter Custom Instruction After Deleting This Text"], entry_callback=lambda x: self.case['tutorial_text'].update({'game_mode': x}))
+        self.add_case_row(LabelEntryRow(tutorial_frame, "Game Mode:", self.case['tutorial_text']['game_mode'], ["","you will be able to continue from the button you left off if you make a mistake", "you will need to restart from the button 1 if you make a mistake", "Please Enter Custom Instruction After Deleting This Text"], entry_callback=lambda x: self.case['tutorial_text'].update({'game_mode': x})), lambda case: case['tutorial_text']['game_mode'])
 
         ## Create an input field for Game Over Text
-        LabelEntryRow(main_frame, "Game Over Text:", self.case['game_over_text'], ["", "Congratulations! You have completed the game!", "Please Enter Custom Instruction After Deleting This Text"], entry_callback=lambda x: self.case.update({'game_over_text': x}))
+        self.add_case_row(LabelEntryRow(main_frame, "Game Over Text:", self.case['game_over_text'], ["", "Congratulations! You have completed the game!", "Please Enter Custom Instruction After Deleting This Text"], entry_callback=lambda x: self.case.update({'game_over_text': x})), lambda case: case['game_over_text'])
 
         ## Create an input field for Survey URL
-        LabelEntryRow(main_frame, "Survey URL:", self.case['survey_url'], [""]+[f"{link['nickname']} - {link['url']}" for link in self.settings['Links']], entry_callback=lambda x: self.case.update({'survey_url': x}))
+        self.survey_url_row = LabelEntryRow(main_frame, "Survey URL:", self.case['survey_url'], [""]+[f"{link['nickname']} - {link['url']}" for link in self.settings['Links']], entry_callback=lambda x: self.case.update({'survey_url': x}))
+        self.add_case_row(self.survey_url_row, lambda case: case['survey_url'])
+
+    def add_case_row(self, row, value_getter, toggle_getter=None):
+        """
+        Registers a LabelEntryRow so that it can be refreshed in place when a case is loaded.
+
+        Args:
+            row (LabelEntryRow): The row displaying a case value.
+            value_getter (function): Reads the row value from a case configuration.
+            toggle_getter (function, optional): Reads the row toggle value from a case configuration.
+        """
+        self.case_rows.append((row, value_getter, toggle_getter))
+
+    def load_model(self, case):
+        """
+        Swaps a case configuration into the existing widgets without rebuilding them.
+
+        Args:
+            case (dict): The case configuration to display.
+        """
+        self.case = case
+
+        # Refresh the single value rows
+        for row, value_getter, toggle_getter in self.case_rows:
+            row.set_value(value_getter(case), toggle_getter(case) if toggle_getter else None)
+
+        # Refresh the array lists
+        self.order_list.set_entries([[idx] for idx in case['order_array']])
+        self.custom_text_list.set_entries([[idx] for idx in case['custom_text_array']])
+        self.interaction_delay_list.set_entries([[idx] for idx in case['interaction_delay']])
+        self.location_list.set_entries([[loc['x'], loc['y']] for loc in case['location_array']])
+        self.highlight_list.set_entries([[idx] for idx in case['highlight_array']])
+        for file_type in ['correct_haptic', 'wrong_haptic', 'correct_audio', 'wrong_audio']:
+            getattr(self, file_type).set_entries([[idx] for idx in case['linked_files'][file_type]])
+
+        # Refresh the toggles, which also reapply the enabled state of their widgets
+        self.custom_text_enabled_var.set(case['custom_text_enabled'])
+        self.toggle_custom_text_array()
+        self.location_array_enabled_var.set(case['location_array_enabled'])
+        self.toggle_location_array()
+        self.highlight_array_enabled_var.set(case['highlight_array_enabled'])
+        self.toggle_highlight_array()
+        self.timer_enabled_var.set(case['timer']['enabled'])
+        self.toggle_timer_settings()
+        self.scoreboard_enabled_var.set(case['scoreboard']['enabled'])
+        self.toggle_scoreboard_settings()
+
+    def reset_case(self):
+        """
+        Resets the case editor to the default case configuration.
+        """
+        self.load_model(copy.deepcopy(default_case_config))
+
+    def refresh_settings(self, settings):
+        """
+        Updates the settings used by the case editor without rebuilding it.
+
+        Args:
+            settings (dict): The application settings.
+        """
+        self.settings = settings
+        self.survey_url_row.set_dropdown_values([""]+[f"{link['nickname']} - {link['url']}" for link in self.settings['Links']])
+        self.refresh_media_files()
+        self.refresh_layout_preview()
+
+    def refresh_media_files(self):
+        """
+        Lists the media folders again and updates the linked file dropdowns, so files added since
+        the editor was built, such as newly converted latency files, can be selected.
+        """
+        haptic_files = self.load_haptic_files()
+        audio_files = self.load_audio_files()
+        self.correct_haptic.set_dropdown_values(haptic_files)
+        self.wrong_haptic.set_dropdown_values(haptic_files)
+        self.correct_audio.set_dropdown_values(audio_files)
+        self.wrong_audio.set_dropdown_values(audio_files)
 
 
     def toggle_scoreboard_settings(self):
@@ -363,6 +491,7 @@ class CaseUI(tk.Frame):
         # Enable or disable the custom_text_array frame based on the checkbutton state
         state = "normal" if self.case['custom_text_enabled'] else "disabled"
         self.custom_text_list.set_state(state)
+        self.refresh_layout_preview()
 
     def toggle_highlight_array(self):
         """
@@ -381,6 +510,45 @@ class CaseUI(tk.Frame):
         # Enable or disable the location_array frame based on the checkbutton state
         state = "normal" if self.case['location_array_enabled'] else "disabled"
         self.location_list.set_state(state)
+        self.refresh_layout_preview()
+
+    def refresh_layout_preview(self):
+        """
+        Redraws the layout preview with the layout image matching the interaction type
+        and the current location array.
+        """
+        if self.layout_preview is None:
+            return
+
+        # Pick the layout the app will use for this interaction type
+        interaction_type = self.case['interaction'].split(" & ")[0]
+        location_enabled = self.case['location_array_enabled']
+        image_path = None
+        for layout in self.settings['layout_descriptions']:
+            if layout['interaction_type'] == interaction_type and layout['location_array_available'] == location_enabled:
+                image_path = layout['image']
+                break
+
+        # Skip the redraw while a location is being typed and is not a number yet
+        try:
+            locations = [(float(loc['x']), float(loc['y'])) for loc in self.case['location_array']] if location_enabled else []
+        except ValueError:
+            return
+
+        labels = self.case['custom_text_array'] if self.case['custom_text_enabled'] else self.case['order_array']
+        self.layout_preview.set_layout(image_path, locations, labels, editable=location_enabled)
+
+    def move_location(self, index, x, y):
+        """
+        Writes a location dragged in the layout preview back to the location array.
+
+        Args:
+            index (int): The index of the button.
+            x (int): The new x position in percent.
+            y (int): The new y position in percent.
+        """
+        self.location_list.entries[index][0].set(str(x))
+        self.location_list.entries[index][1].set(str(y))
 
     def randomize_location(self):
         """
@@ -390,19 +558,8 @@ class CaseUI(tk.Frame):
             return
         
         self.case['location_array'] = self.generate_location_array()
-        # destroy current location list
-        self.location_list.destroy()
-        # Create a new location list with the updated location array
-        self.location_list = EditableList(
-            self.location_array_frame,
-            [[loc['x'], loc['y']] for loc in self.case['location_array']],
-            lambda x: self.case.update({'location_array': [{'x': loc[0], 'y': loc[1]} for loc in x]}),
-            entry_factory=lambda: [tk.StringVar(value="50"), tk.StringVar(value="50")],
-            delete_enabled=False,
-            add_enabled=False,
-            order_change_enabled=False
-        )
-        self.location_list.pack(fill="both", expand=True)
+        # Swap the new locations into the existing location list
+        self.location_list.set_entries([[loc['x'], loc['y']] for loc in self.case['location_array']])
     
     def generate_location_array(self, width=15, height=10, allow_overlap=False):
         location_array = []
@@ -441,18 +598,37 @@ class CaseUI(tk.Frame):
         """
         Load the haptic files from the haptic folder.
         """
-        haptic_files = [f"{f} - {os.path.join(self.settings['FolderVariables']['OriginalHapticFolder'],f)}" for f in os.listdir(self.settings['FolderVariables']['OriginalHapticFolder']) if f.endswith('.ahap')]
-        latency_files = [f"{f} - {os.path.join(self.settings['FolderVariables']['LatencyHapticFolder'],f)}" for f in os.listdir(self.settings['FolderVariables']['LatencyHapticFolder']) if f.endswith('.ahap')]
-        return ['None'] + haptic_files + latency_files
+        folders = self.settings['FolderVariables']
+        return catalog.dropdown_values([folders['OriginalHapticFolder'], folders['LatencyHapticFolder']], HAPTIC_EXTENSIONS)
 
     # Load audio files from the audio folder
     def load_audio_files(self):
         """
         Load the audio files from the audio folder.
         """
-        audio_files = [f"{f} - {os.path.join(self.settings['FolderVariables']['OriginalAudioFolder'],f)}" for f in os.listdir(self.settings['FolderVariables']['OriginalAudioFolder']) if f.endswith('.wav') or f.endswith('.mp3')]
-        latency_files = [f"{f} - {os.path.join(self.settings['FolderVariables']['LatencyAudioFolder'],f)}" for f in os.listdir(self.settings['FolderVariables']['LatencyAudioFolder']) if f.endswith('.wav') or f.endswith('.mp3')]
-        return ['None'] + audio_files + latency_files
+        folders = self.settings['FolderVariables']
+        return catalog.dropdown_values([folders['OriginalAudioFolder'], folders['LatencyAudioFolder']], AUDIO_EXTENSIONS)
+
+    def preview_audio(self, value):
+        """
+        Shows the waveform of an audio dropdown value in the waveform preview.
+        The red marker shows where the sound starts, which reveals any latency padding.
+
+        Args:
+            value (str): The dropdown value, formatted as "name - path" or "None".
+        """
+        file_path = value.split(' - ', 1)[-1]
+        if value == "None" or not os.path.isfile(file_path):
+            self.waveform_preview.clear("No audio file selected")
+            return
+        try:
+            waveform = load_waveform(file_path)
+        except Exception as e:
+            self.waveform_preview.clear(f"Cannot preview {file_path}: {str(e)}")
+            return
+        caption = f"{file_path}  |  {waveform['duration']:.3f} s, {waveform['samplerate']} Hz, {waveform['channels']} ch  |  sound starts at {waveform['onset']:.3f} s"
+        marker = waveform['onset'] / waveform['duration'] if waveform['duration'] else None
+        self.waveform_preview.show(waveform['thumbnail'][0].tolist(), waveform['thumbnail'][1].tolist(), caption, marker)
 
     def save_case(self):
         """
@@ -475,9 +651,8 @@ class CaseUI(tk.Frame):
         # Open a file dialog to select the file path, defaulting to the case folder, and JSON file type
         file_path = filedialog.askopenfilename(initialdir=DEFAULT_CASE_FOLDER, title="Select File", defaultextension=".json", filetypes=[("JSON files", "*.json")])
         if file_path:
-            self.case = load_case_config(file_path)
+            self.load_model(load_case_config(file_path))
             messagebox.showinfo("Load Case Configuration", "Case configuration loaded successfully.")
-            self.create_widgets()
 
     def generate_case_json(self):
         if not self.case['case_id']:
@@ -489,10 +664,7 @@ class CaseUI(tk.Frame):
             return
 
         # Determine the root URL
-        if self.settings['use_server_address']:
-            root = self.settings['ServerAddress']
-        else:
-            root = f"https://{self.settings['github_id']}.github.io/{self.settings['github_repo']}"
+        root = get_root_url(self.settings)
 
         # Prepare the case data
         case_data = {
@@ -568,6 +740,9 @@ class CaseUI(tk.Frame):
         file_name = f"{self.case['case_id']}.json"
         file_path = os.path.join("Files", "Case", file_name)  # Using predefined folder structure
 
+        # Keep the ranking tables built from collected sessions by ranking_builder.py
+        keep_ranking_tables(case_data, file_path)
+
         # Verify if case data is valid with json schema before writing to file
         format_json = json.dumps(case_data, indent=4)
         
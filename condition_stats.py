@@ -0,0 +1,241 @@
+"""
+condition_stats.py
+
+This file contains the latency condition analysis. The sessions in the log store are
+grouped by case, latency condition and feedback modality, both read from the linked_files
+of the case: files from a latency folder make the case a "latency" case, and the linked
+audio and haptic files give the modality. For every session the reaction time (the mean
+interval between counted interactions, after rejecting intervals more than OUTLIER_MADS
+scaled median absolute deviations from the median of their case) and the error rate
+(errors per counted interaction, from the scoreboard replay) are computed.
+
+The groups, the latency effect per case (latency minus original group of the same
+modality) and the order effect (by the position of the case in the participant's
+case_id_array) get bootstrap confidence intervals from resampling.bootstrap, which spreads
+the resamples of all the statistics across a process pool.
+
+Usage:
+    python condition_stats.py
+    python condition_stats.py --resamples 10000 --json stats.json
+"""
+
+import os
+import json
+import argparse
+import numpy as np
+from default_configs import default_settings
+from log_store import LogStore, DEFAULT_STORE_FOLDER
+from scoreboard_replay import scoring_rules, replay
+from resampling import bootstrap, DEFAULT_RESAMPLES, DEFAULT_CONFIDENCE
+
+# Intervals further than this many scaled MADs from their group median are outliers
+OUTLIER_MADS = 3.5
+# Scales the MAD to the standard deviation of a normal distribution
+MAD_SCALE = 1.4826
+
+def case_condition(case_data, latency_folders):
+    """
+    Returns the latency condition and the feedback modality of a case from its linked_files.
+    """
+    linked_files = case_data.get('linked_files', {})
+    urls = [url for file_type in ('correct_audio', 'wrong_audio', 'correct_haptic', 'wrong_haptic') for url in linked_files.get(file_type, []) if url]
+    latency = "latency" if any(folder in url for url in urls for folder in latency_folders) else "original"
+    kinds = [kind for kind in ("audio", "haptic") if any(linked_files.get(f"{prefix}_{kind}") and any(linked_files[f"{prefix}_{kind}"]) for prefix in ("correct", "wrong"))]
+    return latency, "+".join(kinds) if kinds else "none"
+
+def group_median_mad(group, values):
+    """
+    Returns the median and the MAD of the group of every value, with the groups sorted once.
+    """
+    order = np.lexsort((values, group))
+    sorted_group, sorted_values = group[order], values[order]
+    starts = np.flatnonzero(np.concatenate([[True], sorted_group[1:] != sorted_group[:-1]])) if len(order) else np.zeros(0, dtype=np.int64)
+    counts = np.diff(np.concatenate([starts, [len(order)]]))
+
+    def medians(vals):
+        return (vals[starts + (counts - 1) // 2] + vals[starts + counts // 2]) / 2
+    median = medians(sorted_values)
+    group_index = np.repeat(np.arange(len(starts)), counts)
+    deviations = np.abs(sorted_values - median[group_index])
+    # Sort the deviations within their groups, reusing the group order
+    deviation_order = np.lexsort((deviations, group_index))
+    mad = medians(deviations[deviation_order])
+    position = np.empty(len(order), dtype=np.int64)
+    position[order] = group_index
+    return median[position], mad[position]
+
+def session_table(store, case_folder, latency_folders, experiments):
+    """
+    Replays the stored sessions of every case and computes the per-session measures.
+
+    Returns:
+        dict: Per session, the "case", "latency" and "modality" labels, the "position" of the case in the
+        participant's case_id_array (-1 when unknown), the "reaction_time" in ms and the "error_rate".
+    """
+    table = {key: [] for key in ("case", "latency", "modality", "position", "reaction_time", "error_rate")}
+    interval_group, interval_session, intervals = [], [], []
+    session_count = 0
+    session_column, experiment_column = store.column("session"), store.column("experiment")
+    experiment_orders = [experiments.get(name, []) for name in store.manifest["experiment"]]
+    for case_index, case_id in enumerate(store.manifest["case"]):
+        case_path = os.path.join(case_folder, f"{case_id}.json")
+        if not os.path.exists(case_path):
+            continue
+        with open(case_path, 'r') as f:
+            case_data = json.load(f)
+        rows = store.select(case=case_id)
+        if not len(rows):
+            continue
+        events = store.events(case_id)
+        result = replay(events, scoring_rules(case_data))
+        latency, modality = case_condition(case_data, latency_folders)
+        sessions = len(events["sessions"])
+
+        # Intervals between counted interactions, the first one from the start of the session
+        counted = result["counted"]
+        event_session = np.repeat(np.arange(sessions), np.diff(events["offsets"]))
+        previous = np.concatenate([[0.0], events["time"][:-1]])
+        previous[events["offsets"][:-1][np.diff(events["offsets"]) > 0]] = 0.0
+        interval_group.append(np.full(counted.sum(), case_index))
+        interval_session.append(event_session[counted] + session_count)
+        intervals.append((events["time"] - previous)[counted])
+
+        # The experiment of a session, from its first row; np.unique sorts the sessions like events_from_arrays
+        _, first_rows = np.unique(session_column[rows], return_index=True)
+        positions = {code: (order.index(case_id) if case_id in order else -1) for code, order in enumerate(experiment_orders)}
+        table["position"].extend(positions[code] for code in experiment_column[rows][first_rows])
+
+        counted_per_session = np.bincount(event_session[counted], minlength=sessions)
+        table["error_rate"].extend(np.divide(result["errors"], counted_per_session, out=np.full(sessions, np.nan), where=counted_per_session > 0))
+        table["case"].extend([case_id] * sessions)
+        table["latency"].extend([latency] * sessions)
+        table["modality"].extend([modality] * sessions)
+        session_count += sessions
+
+    # Robust reaction times: intervals far from the median of their case are left out
+    interval_group = np.concatenate(interval_group) if intervals else np.zeros(0, dtype=np.int64)
+    interval_session = np.concatenate(interval_session) if intervals else np.zeros(0, dtype=np.int64)
+    intervals = np.concatenate(intervals) if intervals else np.zeros(0)
+    median, mad = group_median_mad(interval_group, intervals)
+    kept = np.abs(intervals - median) <= OUTLIER_MADS * MAD_SCALE * np.maximum(mad, 1e-9)
+    totals = np.bincount(interval_session[kept], weights=intervals[kept], minlength=session_count)
+    counts = np.bincount(interval_session[kept], minlength=session_count)
+    table["reaction_time"] = np.divide(totals, counts, out=np.full(session_count, np.nan), where=counts > 0)
+
+    table = {key: np.asarray(values) for key, values in table.items()}
+    table["rejected_intervals"] = int((~kept).sum())
+    return table
+
+def analyze(table, resamples=DEFAULT_RESAMPLES, confidence=DEFAULT_CONFIDENCE, workers=None):
+    """
+    Summarizes the sessions by case and condition, and computes the latency and order effects.
+
+    Returns:
+        dict: The "groups", "latency_effects" and "order_effects" rows.
+    """
+    jobs, rows = [], []
+
+    def add(row, *statistics):
+        # Statistics with fewer than two values get no interval
+        row["_jobs"] = []
+        for statistic in statistics:
+            if statistic is not None and all(len(array) > 1 for array in statistic[1:]):
+                row["_jobs"].append(len(jobs))
+                jobs.append(statistic)
+            else:
+                row["_jobs"].append(None)
+        rows.append(row)
+
+    reaction_time, error_rate = table["reaction_time"], table["error_rate"]
+    groups = {}
+    for key in sorted(set(zip(table["case"], table["latency"], table["modality"]))):
+        mask = (table["case"] == key[0]) & (table["latency"] == key[1]) & (table["modality"] == key[2])
+        rt, errors = reaction_time[mask & np.isfinite(reaction_time)], error_rate[mask & np.isfinite(error_rate)]
+        groups[key] = (rt, errors)
+        add({"section": "groups", "case": key[0], "latency": key[1], "modality": key[2], "sessions": int(mask.sum()),
+             "reaction_time_ms": float(rt.mean()) if rt.size else None, "median_reaction_time_ms": float(np.median(rt)) if rt.size else None,
+             "error_rate": float(errors.mean()) if errors.size else None},
+            ("mean", rt), ("mean", errors))
+
+    # Latency effect: every latency group against the original groups of the same modality
+    for (case_id, latency, modality), (rt, errors) in groups.items():
+        if latency != "latency":
+            continue
+        baseline = [value for key, value in groups.items() if key[1] == "original" and key[2] == modality]
+        if not baseline:
+            continue
+        baseline_rt = np.concatenate([value[0] for value in baseline])
+        baseline_errors = np.concatenate([value[1] for value in baseline])
+        add({"section": "latency_effects", "case": case_id, "modality": modality,
+             "reaction_time_difference_ms": float(rt.mean() - baseline_rt.mean()) if rt.size and baseline_rt.size else None,
+             "error_rate_difference": float(errors.mean() - baseline_errors.mean()) if errors.size and baseline_errors.size else None},
+            ("difference", rt, baseline_rt), ("difference", errors, baseline_errors))
+
+    # Order effect: change per position in case_id_array, over the sessions with a known position
+    known = (table["position"] >= 0) & np.isfinite(reaction_time) & np.isfinite(error_rate)
+    position = table["position"][known].astype(np.float64)
+    for name, values in (("reaction_time_ms", reaction_time[known]), ("error_rate", error_rate[known])):
+        slope = float(np.polyfit(position, values, 1)[0]) if len(np.unique(position)) > 1 else None
+        add({"section": "order_effects", "measure": name, "sessions": int(known.sum()), "slope_per_position": slope}, ("slope", position, values))
+
+    intervals = bootstrap(jobs, resamples, confidence, workers) if jobs else []
+    report = {"groups": [], "latency_effects": [], "order_effects": []}
+    for row in rows:
+        row["ci"] = [intervals[job] if job is not None else (None, None) for job in row.pop("_jobs")]
+        report[row.pop("section")].append(row)
+    return report
+
+def load_experiments(experiment_folder):
+    experiments = {}
+    for file_name in sorted(os.listdir(experiment_folder)):
+        if file_name.endswith('.json'):
+            with open(os.path.join(experiment_folder, file_name), 'r') as f:
+                experiments[file_name[:-5]] = json.load(f).get('case_id_array', [])
+    return experiments
+
+def format_interval(interval, scale=1.0, digits=1):
+    return "-" if interval[0] is None else f"[{interval[0] * scale:.{digits}f}, {interval[1] * scale:.{digits}f}]"
+
+def format_value(value, scale=1.0, digits=1):
+    return "-" if value is None else f"{value * scale:.{digits}f}"
+
+def print_report(report, confidence):
+    percent = int(round(confidence * 100))
+    print(f"{'Case':<8}{'Latency':<10}{'Modality':<14}{'Sessions':>9}{'RT ms':>10}  {percent}% CI{'':<14}{'Error %':>9}  {percent}% CI")
+    for row in report["groups"]:
+        print(f"{row['case']:<8}{row['latency']:<10}{row['modality']:<14}{row['sessions']:>9}{format_value(row['reaction_time_ms']):>10}  {format_interval(row['ci'][0]):<20}"
+              f"{format_value(row['error_rate'], 100):>9}  {format_interval(row['ci'][1], 100)}")
+    if report["latency_effects"]:
+        print("\nLatency effect (latency minus original of the same modality)")
+        for row in report["latency_effects"]:
+            print(f"{row['case']:<8}{row['modality']:<14}RT {format_value(row['reaction_time_difference_ms'])} ms {format_interval(row['ci'][0])}, "
+                  f"errors {format_value(row['error_rate_difference'], 100)} % {format_interval(row['ci'][1], 100)}")
+    print("\nOrder effect (change per position in case_id_array)")
+    for row in report["order_effects"]:
+        scale = 100 if row["measure"] == "error_rate" else 1
+        print(f"{row['measure']:<18}{format_value(row['slope_per_position'], scale, 2):>10} {format_interval(row['ci'][0], scale, 2)} from {row['sessions']} sessions")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare reaction times and error rates across latency conditions with bootstrap confidence intervals.")
+    parser.add_argument("--store", default=DEFAULT_STORE_FOLDER, help=f"Log store folder (default: {DEFAULT_STORE_FOLDER})")
+    parser.add_argument("--case-folder", default=default_settings['FolderVariables']['CaseFolder'], help="Folder of the case JSON files")
+    parser.add_argument("--experiment-folder", default=default_settings['FolderVariables']['ExperimentFolder'], help="Folder of the experiment JSON files")
+    parser.add_argument("--resamples", type=int, default=DEFAULT_RESAMPLES, help=f"Bootstrap resamples (default: {DEFAULT_RESAMPLES})")
+    parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE, help=f"Confidence level (default: {DEFAULT_CONFIDENCE})")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--json", default=None, help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    folders = default_settings['FolderVariables']
+    latency_folders = [folders['LatencyAudioFolder'].replace(os.sep, '/'), folders['LatencyHapticFolder'].replace(os.sep, '/')]
+    store = LogStore(args.store, args.case_folder)
+    table = session_table(store, args.case_folder, latency_folders, load_experiments(args.experiment_folder))
+    report = analyze(table, args.resamples, args.confidence, args.workers)
+    print_report(report, args.confidence)
+    print(f"\n{table['rejected_intervals']} outlier interval(s) rejected")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(dict(report, rejected_intervals=table["rejected_intervals"]), f, indent=4)
+
+if __name__ == "__main__":
+    main()
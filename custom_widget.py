@@ -4,14 +4,34 @@ custom_widget.py
 Author: Seung Heon Lee (University of Southern California, HaRVI Lab)
 
 This file contains custom Tkinter widget classes used throughout the application.
-It includes implementations for ScrollableFrame, EditableList, EditableRow, and
-LabelEntryRow, providing reusable UI components for the application.
+It includes implementations for ScrollableFrame, EditableList, EditableRow,
+LabelEntryRow, WaveformPreview and LayoutPreview, providing reusable UI components
+for the application.
 """
 
 import os
+from collections import OrderedDict
 import tkinter as tk
 from tkinter import ttk, filedialog
 
+# Size of a layout button in percent of the layout image, matching the case schema
+BUTTON_WIDTH_PERCENT = 15
+BUTTON_HEIGHT_PERCENT = 10
+# PhotoImage only scales by integer factors. The zoomed image is built before it is subsampled,
+# so the zoom is kept small to bound that intermediate image
+MAX_ZOOM = 2
+MAX_SUBSAMPLE = 8
+# Scaled layout images kept by each preview
+SCALED_IMAGE_CACHE = 8
+
+def split_dropdown_values(values):
+    """
+    Splits dropdown values into the labels shown in the list and the values stored when one is selected.
+    A value is either a string, shown and stored as is, or a (label, value) pair.
+    """
+    pairs = [value if isinstance(value, tuple) else (value, value) for value in values or []]
+    return [label for label, _ in pairs], [value for _, value in pairs]
+
 class EditableRow(ttk.Frame):
     """
     A frame that contains entries for multiple text variables and buttons to remove the entry or change its order.
@@ -24,8 +44,9 @@ class EditableRow(ttk.Frame):
         move_down_callback (function): The callback function to move the entry down.
         order_change_enabled (bool): Whether the order change buttons are enabled.
         delete_enabled (bool): Whether the delete buttons are enabled.
+        focus_callback (function, optional): Called with the value of an entry when it gets focus or a dropdown value is selected.
     """
-    def __init__(self, parent, text_vars, remove_callback, move_up_callback, move_down_callback, order_change_enabled=True, delete_enabled=True, dropdown_values=None, label_text=None, folder_path=None):
+    def __init__(self, parent, text_vars, remove_callback, move_up_callback, move_down_callback, order_change_enabled=True, delete_enabled=True, dropdown_values=None, label_text=None, folder_path=None, focus_callback=None):
         super().__init__(parent)
         
         self.text_vars = text_vars
@@ -65,15 +86,40 @@ class EditableRow(ttk.Frame):
             self.entries_frame.columnconfigure(0, weight=1)
 
         # Create entries for each text variable using grid manager
+        self.dropdowns = []
+        dropdown_labels, self.dropdown_stored = split_dropdown_values(dropdown_values)
         for i, text_var in enumerate(self.text_vars):
             if dropdown_values:
-                entry = ttk.Combobox(self.entries_frame, textvariable=text_var, values=dropdown_values)
+                entry = ttk.Combobox(self.entries_frame, textvariable=text_var, values=dropdown_labels)
+                self.dropdowns.append(entry)
+                entry.bind("<<ComboboxSelected>>", lambda event, dropdown=entry, var=text_var: self.select_value(dropdown, var, focus_callback))
             else:
                 entry = ttk.Entry(self.entries_frame, textvariable=text_var)
             entry.grid(row=0, column=i + int(label_text is not None), sticky="ew", padx=(0, 5))
+            if focus_callback:
+                entry.bind("<FocusIn>", lambda event, var=text_var: focus_callback(var.get()))
             self.entries_frame.columnconfigure(i + int(label_text is not None), weight=1)
 
+    def select_value(self, dropdown, text_var, focus_callback=None):
+        """
+        Stores the value of the selected dropdown label instead of the label itself.
+        """
+        index = dropdown.current()
+        if 0 <= index < len(self.dropdown_stored):
+            text_var.set(self.dropdown_stored[index])
+        if focus_callback:
+            focus_callback(text_var.get())
+
+    def set_dropdown_values(self, values):
+        """
+        Replaces the options of the dropdowns of the entry.
 
+        Args:
+            values (list): The new dropdown options, strings or (label, value) pairs.
+        """
+        labels, self.dropdown_stored = split_dropdown_values(values)
+        for dropdown in self.dropdowns:
+            dropdown["values"] = labels
 
     def set_state(self, state):
         """
@@ -104,8 +150,9 @@ class EditableList(ttk.Frame):
         entry_factory (function, optional): A factory function to create default text variables for a new entry.
         order_change_enabled (bool): Whether the order change buttons are enabled.
         delete_enabled (bool): Whether the delete buttons are enabled.
+        focus_callback (function, optional): Called with the value of an entry when it gets focus or a dropdown value is selected.
     """
-    def __init__(self, parent, entries, entry_callback, entry_factory=None, order_change_enabled=True, delete_enabled=True, add_enabled=True, move_up_callback=None, move_down_callback=None, dropdown_values=None, label_texts=None, folder_path=None):
+    def __init__(self, parent, entries, entry_callback, entry_factory=None, order_change_enabled=True, delete_enabled=True, add_enabled=True, move_up_callback=None, move_down_callback=None, dropdown_values=None, label_texts=None, folder_path=None, focus_callback=None):
         super().__init__(parent)
         
         # List of entry variables and the callback function
@@ -115,10 +162,15 @@ class EditableList(ttk.Frame):
         self.order_change_enabled = order_change_enabled
         self.delete_enabled = delete_enabled
         self.dropdown_values = dropdown_values
+        self.label_texts = label_texts
+        self.folder_path = folder_path
+        self.focus_callback = focus_callback
+        # Suppresses the entry callback while a whole list is being replaced
+        self._bulk_update = False
 
         if add_enabled:
             # Button to add a new entry
-            self.add_button = ttk.Button(self, text="Add Entry", command=lambda: self.add_entry(dropdown_values=dropdown_values,folder_path=folder_path))
+            self.add_button = ttk.Button(self, text="Add Entry", command=lambda: self.add_entry(dropdown_values=self.dropdown_values, folder_path=folder_path))
             self.add_button.pack(fill="x", padx=10, pady=5, side="bottom")
 
         # Create a scrollable frame for the list entries
@@ -166,7 +218,8 @@ class EditableList(ttk.Frame):
                                   self.delete_enabled,
                                   dropdown_values=dropdown_values,
                                   label_text=label_text,
-                                  folder_path=folder_path)
+                                  folder_path=folder_path,
+                                  focus_callback=self.focus_callback)
         entry.pack(fill="x", expand=True, padx=10, pady=5)
         
         # Add the entry to the list
@@ -247,10 +300,49 @@ class EditableList(ttk.Frame):
             text_var1.set(text_var2.get())
             text_var2.set(temp)
 
+    def set_entries(self, entries):
+        """
+        Replaces the values of the list in place, reusing the existing rows.
+        Rows are only created or destroyed when the number of entries changes.
+
+        Args:
+            entries (list): A list of entries. Each entry is a list of text values.
+        """
+        self._bulk_update = True
+        try:
+            rows = self.scrollable_frame.winfo_children()
+            for i, values in enumerate(entries):
+                if i < len(self.entries):
+                    for text_var, text in zip(self.entries[i], values):
+                        text_var.set(text)
+                else:
+                    label_text = self.label_texts[i] if self.label_texts and i < len(self.label_texts) else None
+                    self.add_entry(values, self.dropdown_values, label_text, self.folder_path)
+            # Remove the rows that are no longer needed
+            for entry_frame, text_vars in list(zip(rows, self.entries))[len(entries):]:
+                entry_frame.destroy()
+                self.entries.remove(text_vars)
+        finally:
+            self._bulk_update = False
+        self.update_entries()
+
+    def set_dropdown_values(self, values):
+        """
+        Replaces the dropdown options of the existing rows and of the rows added later.
+
+        Args:
+            values (list): The new dropdown options.
+        """
+        self.dropdown_values = values
+        for entry_frame in self.scrollable_frame.winfo_children():
+            entry_frame.set_dropdown_values(values)
+
     def update_entries(self, *args):
         """
         Updates the list of entries.
         """
+        if self._bulk_update:
+            return
         updated_entries = [[var.get() for var in vars] for vars in self.entries]
         self.entry_callback(updated_entries)
     
@@ -356,7 +448,246 @@ class LabelEntryRow(ttk.Frame):
             else:
                 self._entry["state"] = "enabled" if self.enable_var.get() and parent_state else "disabled"
 
+    def set_value(self, text, toggle_val=None):
+        """
+        Sets the value of the row in place without rebuilding it.
+
+        Args:
+            text (str): The new text for the entry or dropdown.
+            toggle_val (bool, optional): The new value for the enable toggle.
+        """
+        self._string_var.set(text)
+        if toggle_val is not None and self._toggle_callback:
+            self.enable_var.set(toggle_val)
+            self.toggle_element()
+
+    def set_dropdown_values(self, values):
+        """
+        Replaces the options of the dropdown, if the row has one.
+
+        Args:
+            values (list): The new dropdown options.
+        """
+        if self._dropdown_values:
+            self._dropdown_values = values
+            self._dropdown["values"] = values
+
     def set_state(self, state):
         for widge in self.winfo_children():
             widge.configure(state=state)
-        self.toggle_element(state != 'disabled')
\ No newline at end of file
+        self.toggle_element(state != 'disabled')
+
+class WaveformPreview(tk.Canvas):
+    """
+    A canvas drawing a waveform thumbnail as a filled min/max envelope.
+
+    Args:
+        parent (tk.Widget): The parent widget for the canvas.
+    """
+    def __init__(self, parent, height=100, **kwargs):
+        super().__init__(parent, height=height, background="white", highlightthickness=0, **kwargs)
+        self._waveform = None
+        self._caption = ""
+        # Redraw with the new width when the canvas is resized
+        self.bind("<Configure>", lambda event: self.redraw())
+
+    def show(self, mins, maxs, caption="", marker=None):
+        """
+        Displays a waveform thumbnail.
+
+        Args:
+            mins (list[float]): The minimum sample of each column, between -1 and 1.
+            maxs (list[float]): The maximum sample of each column, between -1 and 1.
+            caption (str): The text drawn in the top left corner.
+            marker (float, optional): The position of a vertical marker as a fraction of the width.
+        """
+        self._waveform = (list(mins), list(maxs), marker)
+        self._caption = caption
+        self.redraw()
+
+    def clear(self, caption=""):
+        """
+        Removes the waveform and optionally shows a caption instead.
+        """
+        self._waveform = None
+        self._caption = caption
+        self.redraw()
+
+    def redraw(self):
+        self.delete("all")
+        width = max(self.winfo_width(), 1)
+        height = max(self.winfo_height(), 1)
+        middle = height / 2
+        self.create_line(0, middle, width, middle, fill="gray80")
+
+        if self._waveform is not None:
+            mins, maxs, marker = self._waveform
+            columns = len(maxs)
+            if columns > 1:
+                scale = (width - 1) / (columns - 1)
+                # Draw the envelope as a single polygon: maximums left to right, then minimums back
+                points = []
+                for i, value in enumerate(maxs):
+                    points += [i * scale, middle - value * middle]
+                for i in range(columns - 1, -1, -1):
+                    points += [i * scale, middle - mins[i] * middle]
+                self.create_polygon(points, fill="steelblue", outline="steelblue")
+            if marker is not None:
+                self.create_line(marker * width, 0, marker * width, height, fill="red", dash=(3, 2))
+
+        if self._caption:
+            self.create_text(5, 5, text=self._caption, anchor="nw")
+
+def scale_factors(scale):
+    """
+    Returns the (zoom, subsample) pair whose ratio is the largest not above scale, with zoom at most
+    MAX_ZOOM and subsample at most MAX_SUBSAMPLE, or (1, MAX_SUBSAMPLE) for smaller scales.
+    """
+    pairs = [(zoom, subsample) for zoom in range(1, MAX_ZOOM + 1) for subsample in range(1, MAX_SUBSAMPLE + 1) if zoom <= scale * subsample]
+    return max(pairs, key=lambda pair: (pair[0] / pair[1], -pair[0]), default=(1, MAX_SUBSAMPLE))
+
+class LayoutPreview(tk.Canvas):
+    """
+    A canvas drawing a layout image with the button rectangles of a location array.
+    Buttons can be dragged, and their new location is reported through move_callback.
+
+    Args:
+        parent (tk.Widget): The parent widget for the canvas.
+        move_callback (function): Called with (index, x, y) in percent when a button is dropped.
+    """
+    def __init__(self, parent, move_callback, **kwargs):
+        super().__init__(parent, background="white", highlightthickness=0, **kwargs)
+        self.move_callback = move_callback
+        self._image_path = None
+        self._locations = []
+        self._labels = []
+        self._editable = False
+        # Image area on the canvas as (left, top, width, height)
+        self._area = (0, 0, 1, 1)
+        # Index of the dragged button and the pointer offset inside it
+        self._drag = None
+        # The decoded layout image as ((path, mtime), PhotoImage) and its scaled versions by (zoom, subsample).
+        # They belong to this widget's interpreter, so they are kept here and dropped with the widget
+        self._source_image = None
+        self._scaled_images = OrderedDict()
+
+        self.bind("<Configure>", lambda event: self.redraw())
+        self.bind("<ButtonPress-1>", self.start_drag)
+        self.bind("<B1-Motion>", self.drag)
+        self.bind("<ButtonRelease-1>", self.end_drag)
+
+    def set_layout(self, image_path, locations, labels, editable=True):
+        """
+        Displays a layout.
+
+        Args:
+            image_path (str): The path to the layout image, or None.
+            locations (list[tuple]): The (x, y) position of each button in percent, or an empty list.
+            labels (list[str]): The text shown on each button.
+            editable (bool): Whether buttons can be dragged.
+        """
+        # Ignore updates caused by our own drag so the dragged button is not redrawn under the pointer
+        if self._drag is not None:
+            return
+        self._image_path = image_path
+        self._locations = [(float(x), float(y)) for x, y in locations]
+        self._labels = list(labels)
+        self._editable = editable
+        self.redraw()
+
+    def redraw(self):
+        self.delete("all")
+        width = max(self.winfo_width(), 1)
+        height = max(self.winfo_height(), 1)
+
+        image = None
+        if self._image_path and os.path.isfile(self._image_path):
+            try:
+                image = self.scaled_image(self._image_path, width, height)
+            except tk.TclError:
+                image = None
+        if image is not None:
+            self._area = ((width - image.width()) // 2, (height - image.height()) // 2, image.width(), image.height())
+            self.create_image(self._area[0], self._area[1], image=image, anchor="nw")
+        else:
+            self._area = (0, 0, width, height)
+        self.create_rectangle(self._area[0], self._area[1], self._area[0] + self._area[2], self._area[1] + self._area[3], outline="gray70")
+
+        for index, (x, y) in enumerate(self._locations):
+            self.draw_button(index, x, y)
+
+    def scaled_image(self, image_path, width, height):
+        """
+        Returns the layout image scaled to fit inside width x height while keeping its aspect ratio.
+        The image is decoded once per file version, and the last SCALED_IMAGE_CACHE scaled versions
+        are kept so redrawing or resizing the canvas does not scale it again.
+        """
+        key = (image_path, os.path.getmtime(image_path))
+        if self._source_image is None or self._source_image[0] != key:
+            self._source_image = (key, tk.PhotoImage(master=self, file=image_path))
+            self._scaled_images.clear()
+        image = self._source_image[1]
+        factors = scale_factors(min(width / image.width(), height / image.height()))
+        scaled = self._scaled_images.pop(factors, None)
+        if scaled is None:
+            zoom, subsample = factors
+            scaled = image.zoom(zoom) if zoom != 1 else image
+            scaled = scaled.subsample(subsample) if subsample != 1 else scaled
+        self._scaled_images[factors] = scaled
+        while len(self._scaled_images) > SCALED_IMAGE_CACHE:
+            self._scaled_images.popitem(last=False)
+        return scaled
+
+    def destroy(self):
+        self._source_image = None
+        self._scaled_images.clear()
+        super().destroy()
+
+    def draw_button(self, index, x, y):
+        left, top, area_width, area_height = self._area
+        x0 = left + x * area_width / 100
+        y0 = top + y * area_height / 100
+        x1 = x0 + BUTTON_WIDTH_PERCENT * area_width / 100
+        y1 = y0 + BUTTON_HEIGHT_PERCENT * area_height / 100
+        tag = f"button{index}"
+        self.create_rectangle(x0, y0, x1, y1, outline="red" if self._editable else "gray50", width=2, tags=("button", tag))
+        label = self._labels[index] if index < len(self._labels) else str(index + 1)
+        self.create_text((x0 + x1) / 2, (y0 + y1) / 2, text=label, tags=("button", tag))
+
+    def to_percent(self, canvas_x, canvas_y):
+        left, top, area_width, area_height = self._area
+        return (canvas_x - left) * 100 / area_width, (canvas_y - top) * 100 / area_height
+
+    def start_drag(self, event):
+        if not self._editable:
+            return
+        x, y = self.to_percent(event.x, event.y)
+        # Pick the top-most button under the pointer
+        for index in range(len(self._locations) - 1, -1, -1):
+            bx, by = self._locations[index]
+            if bx <= x <= bx + BUTTON_WIDTH_PERCENT and by <= y <= by + BUTTON_HEIGHT_PERCENT:
+                self._drag = (index, x - bx, y - by)
+                self.tag_raise(f"button{index}")
+                return
+
+    def drag(self, event):
+        if self._drag is None:
+            return
+        index, offset_x, offset_y = self._drag
+        x, y = self.to_percent(event.x, event.y)
+        # Keep the button inside the layout, as required by the case schema
+        x = min(max(round(x - offset_x), 0), 100 - BUTTON_WIDTH_PERCENT)
+        y = min(max(round(y - offset_y), 0), 100 - BUTTON_HEIGHT_PERCENT)
+        if (x, y) != self._locations[index]:
+            left, top, area_width, area_height = self._area
+            old_x, old_y = self._locations[index]
+            self.move(f"button{index}", (x - old_x) * area_width / 100, (y - old_y) * area_height / 100)
+            self._locations[index] = (x, y)
+
+    def end_drag(self, event):
+        if self._drag is None:
+            return
+        index = self._drag[0]
+        self._drag = None
+        x, y = self._locations[index]
+        self.move_callback(index, int(x), int(y))
@@ -9,6 +9,7 @@ provides functions for loading, saving, and initializing configuration files.
 """
 
 import os
+import copy
 import json
 
 # Default folder paths for the GUI application
@@ -16,6 +17,7 @@ DEFAULT_GUI_FOLDER = '.gui'
 DEFAULT_SETTINGS_FOLDER = '.gui/setting'
 DEFAULT_CASE_FOLDER = '.gui/case'
 DEFAULT_EXPERIMENT_FOLDER = '.gui/experiment'
+DEFAULT_WAVEFORM_FOLDER = '.gui/waveform'
 
 # Default file paths for the GUI application
 DEFAULT_SETTINGS_PATH = os.path.join(DEFAULT_SETTINGS_FOLDER, 'default.json')
@@ -24,6 +26,7 @@ DEFAULT_CASE_PATH = os.path.join(DEFAULT_CASE_FOLDER, 'default.json')
 LAST_ACCESSED_CASE_PATH = os.path.join(DEFAULT_CASE_FOLDER, 'last_saved')
 DEFAULT_EXPERIMENT_PATH = os.path.join(DEFAULT_EXPERIMENT_FOLDER, 'default.json')
 LAST_ACCESSED_EXPERIMENT_PATH = os.path.join(DEFAULT_EXPERIMENT_FOLDER, 'last_saved')
+SIZE_INDEX_PATH = os.path.join(DEFAULT_GUI_FOLDER, 'size_index.json')
 
 # Default settings for the GUI application
 default_settings = {
@@ -31,6 +34,13 @@ default_settings = {
     "github_repo": "TouchTact-Experiment-Generation-GUI",
     "ServerAddress": "https://harvi-lab.github.io/TouchTact-Experiment-Generation-GUI",
     "use_server_address": False,
+    "profile_actions": False,
+    "LocalServer": {
+        "enabled": False,
+        "address": "http://127.0.0.1:8000",
+        "latency": "0",
+        "bandwidth": "0"
+    },
     "FolderVariables": {
         "OriginalAudioFolder": os.path.join("Files", "Audio", "Original"),
         "LatencyAudioFolder": os.path.join("Files", "Audio", "Latency"),
@@ -177,11 +187,32 @@ def load_setting(file_path = None):
     # Load the settings from the specified file path
     with open(file_path, 'r') as f:
         try:
-            return json.load(f)
+            settings = json.load(f)
         except json.JSONDecodeError:
             raise ValueError("Load Setting: {file_path} is not a valid JSON file.")
         except FileNotFoundError:
             raise FileNotFoundError("Load Setting: {file_path} file does not exist.")
+    # Fill in settings added after the file was saved
+    for key, value in default_settings.items():
+        settings.setdefault(key, copy.deepcopy(value))
+    return settings
+
+def get_root_url(settings):
+    """
+    Returns the URL the experiment files are served from.
+    The local preview server takes precedence over the server address, which takes precedence over GitHub Pages.
+
+    Args:
+        settings (dict): The application settings.
+
+    Returns:
+        str: The root URL without a trailing slash.
+    """
+    if settings.get('LocalServer', {}).get('enabled'):
+        return settings['LocalServer']['address'].rstrip('/')
+    if settings['use_server_address']:
+        return settings['ServerAddress']
+    return f"https://{settings['github_id']}.github.io/{settings['github_repo']}"
 
 def load_case_config(file_path = None):
     """
@@ -0,0 +1,192 @@
+"""
+device_latency.py
+
+This file contains the end-to-end device latency measurement. A reference stimulus from
+the OriginalAudioFolder is played on the phone and recorded, e.g. with a microphone or an
+accelerometer track exported as WAV, and the delay between the reference and each capture
+is estimated with an FFT cross-correlation and a parabolic sub-sample peak interpolation.
+Many captures are measured in a process pool, and the per-trial delays are summarized
+with a bootstrap confidence interval, so the device latency can be subtracted when
+picking the latencies of the generator.
+
+Captures of the vibration motor do not share the waveform of the audio, so the envelope
+mode correlates the smoothed amplitude envelopes instead of the raw signals.
+
+Usage:
+    python device_latency.py 1.wav captures/*.wav
+    python device_latency.py Dtmf-0.wav captures/*.wav --envelope --json device.json
+"""
+
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import soundfile as sf
+from default_configs import default_settings
+from resampling import bootstrap_interval, DEFAULT_CONFIDENCE, DEFAULT_RESAMPLES
+
+# Smoothing window of the envelope mode in seconds
+ENVELOPE_WINDOW = 0.002
+# Trials whose normalized correlation peak is lower than this are reported but left out of the summary
+DEFAULT_MIN_CORRELATION = 0.3
+
+def load_mono(file_path, channel=None):
+    """
+    Reads a WAV file as a float64 mono signal, either one channel or the mix of all channels.
+
+    Returns:
+        tuple: The signal and the sample rate.
+    """
+    signal, samplerate = sf.read(file_path, dtype='float64', always_2d=True)
+    return (signal[:, channel] if channel is not None else signal.mean(axis=1)), samplerate
+
+def resample(signal, samplerate, target_rate):
+    """
+    Resamples a signal to target_rate with linear interpolation, so a reference matches the rate of a capture.
+    """
+    if samplerate == target_rate:
+        return signal
+    count = int(round(len(signal) * target_rate / samplerate))
+    return np.interp(np.arange(count) * samplerate / target_rate, np.arange(len(signal)), signal)
+
+def envelope(signal, samplerate, window=ENVELOPE_WINDOW):
+    """
+    Returns the zero mean, moving RMS envelope of a signal.
+    """
+    size = max(1, int(round(window * samplerate)))
+    smoothed = np.sqrt(np.convolve(signal ** 2, np.ones(size) / size, mode='same'))
+    return smoothed - smoothed.mean()
+
+def parabolic_peak(values, index):
+    """
+    Returns the sub-sample offset in [-0.5, 0.5] of the vertex of the parabola through a peak and its two neighbours.
+    """
+    if index <= 0 or index >= len(values) - 1:
+        return 0.0
+    left, center, right = values[index - 1], values[index], values[index + 1]
+    curvature = left - 2 * center + right
+    return 0.0 if curvature == 0 else float(np.clip(0.5 * (left - right) / curvature, -0.5, 0.5))
+
+def estimate_delay(reference, capture, samplerate, envelope_mode=False):
+    """
+    Estimates the delay of a reference inside a capture.
+
+    Args:
+        reference (numpy.ndarray): The mono reference signal.
+        capture (numpy.ndarray): The mono capture, at the same sample rate.
+        samplerate (int): The sample rate in Hz.
+        envelope_mode (bool): Whether the amplitude envelopes are correlated instead of the signals.
+
+    Returns:
+        dict: The "delay_s" in seconds and the normalized "correlation" at the peak (0 to 1).
+    """
+    if envelope_mode:
+        reference, capture = envelope(reference, samplerate), envelope(capture, samplerate)
+    fft_size = 1 << (len(reference) + len(capture) - 2).bit_length()
+    correlation = np.fft.irfft(np.fft.rfft(capture, fft_size) * np.conj(np.fft.rfft(reference, fft_size)), fft_size)
+    # Only non-negative lags: a capture never starts before the stimulus is sent
+    correlation = correlation[:len(capture)]
+    # Microphones and accelerometers may invert the polarity, so the strongest peak of either sign counts
+    magnitude = np.abs(correlation)
+    index = int(np.argmax(magnitude))
+    lag = index + parabolic_peak(magnitude, index)
+
+    # Normalize by the energy of the capture under the reference at that lag
+    energy = np.concatenate([[0.0], np.cumsum(capture ** 2)])
+    end = min(index + len(reference), len(capture))
+    norm = np.sqrt(np.sum(reference ** 2) * (energy[end] - energy[index]))
+    return {"delay_s": lag / samplerate, "correlation": float(magnitude[index] / norm) if norm > 0 else 0.0}
+
+def measure_capture(reference_path, capture_path, channel=None, envelope_mode=False):
+    """
+    Measures one trial. Runs in the worker processes.
+
+    Returns:
+        dict: The capture file, its sample rate, the delay in seconds and the normalized correlation.
+    """
+    capture, samplerate = load_mono(capture_path, channel)
+    reference, reference_rate = load_mono(reference_path)
+    reference = resample(reference, reference_rate, samplerate)
+    result = estimate_delay(reference, capture, samplerate, envelope_mode)
+    return {"capture": capture_path, "samplerate": samplerate, "delay_s": round(result["delay_s"], 7), "correlation": round(result["correlation"], 4)}
+
+def summarize(trials, confidence=DEFAULT_CONFIDENCE, resamples=DEFAULT_RESAMPLES, min_correlation=DEFAULT_MIN_CORRELATION):
+    """
+    Aggregates the trials whose correlation peak is clear enough.
+
+    Returns:
+        dict: The trial counts, the mean, median, standard deviation, range and the confidence intervals of the mean and the median, in seconds.
+    """
+    delays = np.array([trial["delay_s"] for trial in trials if trial["correlation"] >= min_correlation])
+    summary = {"trials": len(trials), "used": int(delays.size), "confidence": confidence}
+    if delays.size == 0:
+        return summary
+    mean_ci = bootstrap_interval(delays, confidence, resamples, "mean")
+    median_ci = bootstrap_interval(delays, confidence, resamples, "median")
+    summary.update({
+        "mean_s": round(float(delays.mean()), 7),
+        "mean_ci_s": [round(value, 7) for value in mean_ci],
+        "median_s": round(float(np.median(delays)), 7),
+        "median_ci_s": [round(value, 7) for value in median_ci],
+        "std_s": round(float(delays.std(ddof=1)), 7) if delays.size > 1 else 0.0,
+        "min_s": round(float(delays.min()), 7),
+        "max_s": round(float(delays.max()), 7),
+    })
+    return summary
+
+def measure_batch(reference_path, capture_paths, channel=None, envelope_mode=False, workers=None):
+    """
+    Measures many captures of the same reference in a process pool.
+
+    Args:
+        reference_path (str): The reference stimulus.
+        capture_paths (list[str]): The capture files, one trial each.
+        channel (int, optional): The capture channel to use, the mix of all channels by default.
+        envelope_mode (bool): Whether the amplitude envelopes are correlated instead of the signals.
+        workers (int, optional): The number of worker processes, the CPU count by default.
+
+    Returns:
+        list[dict]: One result per capture, in the order of capture_paths.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(measure_capture, reference_path, capture_path, channel, envelope_mode) for capture_path in capture_paths]
+        return [future.result() for future in futures]
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the end-to-end device latency from recorded captures of a stimulus.")
+    parser.add_argument("reference", help="Reference stimulus, a path or a file name in the original audio folder")
+    parser.add_argument("captures", nargs="+", help="Recorded capture WAV files, one trial each")
+    parser.add_argument("--channel", type=int, default=None, help="Capture channel to use (default: mix of all channels)")
+    parser.add_argument("--envelope", action="store_true", help="Correlate amplitude envelopes, e.g. for accelerometer captures")
+    parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE, help=f"Confidence level of the intervals (default: {DEFAULT_CONFIDENCE})")
+    parser.add_argument("--resamples", type=int, default=DEFAULT_RESAMPLES, help=f"Bootstrap resamples (default: {DEFAULT_RESAMPLES})")
+    parser.add_argument("--min-correlation", type=float, default=DEFAULT_MIN_CORRELATION, help=f"Trials below this normalized correlation are left out of the summary (default: {DEFAULT_MIN_CORRELATION})")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--json", default=None, help="Also write the trials and the summary to this JSON file")
+    args = parser.parse_args()
+
+    reference_path = args.reference
+    if not os.path.isfile(reference_path):
+        reference_path = os.path.join(default_settings['FolderVariables']['OriginalAudioFolder'], args.reference)
+    trials = measure_batch(reference_path, args.captures, args.channel, args.envelope, args.workers)
+    summary = summarize(trials, args.confidence, args.resamples, args.min_correlation)
+
+    print(f"{'Capture':<48}{'Delay ms':>12}{'Correlation':>13}")
+    for trial in trials:
+        flag = "" if trial["correlation"] >= args.min_correlation else "  (left out)"
+        print(f"{os.path.basename(trial['capture']):<48}{trial['delay_s'] * 1000:>12.3f}{trial['correlation']:>13.4f}{flag}")
+    if summary["used"]:
+        percent = int(round(args.confidence * 100))
+        print(f"\n{summary['used']} of {summary['trials']} trial(s): "
+              f"mean {summary['mean_s'] * 1000:.3f} ms ({percent}% CI {summary['mean_ci_s'][0] * 1000:.3f} to {summary['mean_ci_s'][1] * 1000:.3f}), "
+              f"median {summary['median_s'] * 1000:.3f} ms ({percent}% CI {summary['median_ci_s'][0] * 1000:.3f} to {summary['median_ci_s'][1] * 1000:.3f}), "
+              f"std {summary['std_s'] * 1000:.3f} ms")
+    else:
+        print("\nNo trial has a clear correlation peak")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"reference": reference_path, "trials": trials, "summary": summary}, f, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+experiment_files.py
+
+This file contains helper functions describing which files a participant downloads for
+a generated experiment. Starting from Files/Experiment/<id>.json, the fetch plan lists
+the experiment JSON, then every case in case_id_array followed by the layout image and
+the linked audio and haptic files of that case, in the order the app requests them.
+When a case has an audio or haptic sprite (see sprite_builder.py), the sprite replaces
+the individual files of that kind.
+The load test, publish and payload report tools share these functions.
+"""
+
+import os
+import json
+from urllib.parse import urlsplit, unquote
+from default_configs import default_settings
+
+# Linked file types of a generated case JSON
+LINKED_FILE_TYPES = ['correct_haptic', 'wrong_haptic', 'correct_audio', 'wrong_audio']
+
+def url_to_path(url):
+    """
+    Maps a deployed file URL to its path relative to the repository root.
+    Everything before the Files/ folder (the server address or GitHub Pages repository) is dropped,
+    so the same path is found whatever root URL the files were generated with.
+
+    Args:
+        url (str): The absolute URL, or a path relative to the repository.
+
+    Returns:
+        str: The relative path using forward slashes, e.g. "Files/Audio/Original/1.wav".
+    """
+    path = unquote(urlsplit(url).path)
+    index = path.find('Files/')
+    return path[index:] if index >= 0 else path.lstrip('/')
+
+def case_layout_image(case_data, layout_descriptions):
+    """
+    Returns the layout image URL a generated case is displayed with, or None.
+    Cases with a location_array use the layout with location_array_available.
+    """
+    interaction_type = case_data['interaction']['interaction_type']
+    location_available = 'location_array' in case_data
+    for layout in layout_descriptions:
+        if layout['interaction_type'] == interaction_type and layout['location_array_available'] == location_available:
+            return layout['image']
+    return None
+
+def load_fetch_plan(experiment_id, experiment_folder=None, case_folder=None, unique=True, use_sprites=True):
+    """
+    Builds the ordered list of files a participant downloads for an experiment.
+
+    Args:
+        experiment_id (str): The experiment ID, i.e. the experiment JSON name without extension.
+        experiment_folder (str, optional): The folder of the generated experiment JSON files.
+        case_folder (str, optional): The folder of the generated case JSON files.
+        unique (bool): Whether files referenced several times are only listed the first time.
+        use_sprites (bool): Whether a case sprite is fetched instead of the individual files it packs.
+
+    Returns:
+        list[dict]: Steps with the "kind" (experiment, case, layout, audio or haptic), the "case_id"
+                    (None for the experiment) and the repository relative "path" of each file.
+                    Cases whose JSON file does not exist are listed without their files.
+    """
+    experiment_folder = experiment_folder or default_settings['FolderVariables']['ExperimentFolder']
+    case_folder = case_folder or default_settings['FolderVariables']['CaseFolder']
+
+    experiment_path = os.path.join(experiment_folder, f"{experiment_id}.json")
+    with open(experiment_path, 'r') as f:
+        experiment_data = json.load(f)
+
+    plan = [{"kind": "experiment", "case_id": None, "path": experiment_path.replace(os.sep, '/')}]
+    seen = set()
+
+    def add(kind, case_id, path):
+        if unique and path in seen:
+            return
+        seen.add(path)
+        plan.append({"kind": kind, "case_id": case_id, "path": path})
+
+    for case_id in experiment_data['case_id_array']:
+        case_path = os.path.join(case_folder, f"{case_id}.json")
+        add("case", case_id, case_path.replace(os.sep, '/'))
+        # A missing case is still requested by the app, but has no files to follow
+        if not os.path.isfile(case_path):
+            continue
+        with open(case_path, 'r') as f:
+            case_data = json.load(f)
+
+        layout_image = case_layout_image(case_data, experiment_data['layout_descriptions'])
+        if layout_image:
+            add("layout", case_id, url_to_path(layout_image))
+
+        linked_files = case_data.get('linked_files', {})
+        for file_type in LINKED_FILE_TYPES:
+            kind = file_type.split('_')[1]
+            sprite = linked_files.get(f"{kind}_sprite")
+            if use_sprites and sprite:
+                add(kind, case_id, url_to_path(sprite['file']))
+                continue
+            for url in linked_files.get(file_type, []):
+                if url:
+                    add(kind, case_id, url_to_path(url))
+    return plan
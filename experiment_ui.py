@@ -13,8 +13,9 @@ import json, jsonschema
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from custom_widget import ScrollableFrame, EditableList, LabelEntryRow
-from default_configs import load_experiment_config, update_last_used_file_record, LAST_ACCESSED_EXPERIMENT_PATH, DEFAULT_EXPERIMENT_FOLDER
+from default_configs import get_root_url, load_experiment_config, update_last_used_file_record, LAST_ACCESSED_EXPERIMENT_PATH, DEFAULT_EXPERIMENT_FOLDER
 from case_ui import CaseUI
+from action_profiler import action_command
 
 class ExperimentUI(tk.Frame):
     """
@@ -52,15 +53,15 @@ class ExperimentUI(tk.Frame):
         button_frame.pack(fill='x', side="bottom", pady=10)
 
         ## Create save button
-        save_button = ttk.Button(button_frame, text="Save", command=self.save_experiment)
+        save_button = ttk.Button(button_frame, text="Save", command=action_command(self.save_experiment))
         save_button.pack(side="left", padx=10)
 
         ## Create load button
-        load_button = ttk.Button(button_frame, text="Load", command=self.load_experiment)
+        load_button = ttk.Button(button_frame, text="Load", command=action_command(self.load_experiment))
         load_button.pack(side="left", padx=10)
 
         # Create Generate button 
-        generate_button = ttk.Button(button_frame, text="Generate", command=self.generate_experiment_json)
+        generate_button = ttk.Button(button_frame, text="Generate", command=action_command(self.generate_experiment_json))
         generate_button.pack(side="left", padx=10)
 
         # Create a scrollable main frame to contain the experiment configurations
@@ -89,7 +90,7 @@ class ExperimentUI(tk.Frame):
         self.refresh_available_cases()
 
         ## Create an Add Selected button
-        add_selected_button = ttk.Button(main_frame, text="Add Selected Case To The Experiment", command=self.add_selected_cases)
+        add_selected_button = ttk.Button(main_frame, text="Add Selected Case To The Experiment", command=action_command(self.add_selected_cases))
         add_selected_button.pack(fill="x", padx=10, pady=0)
 
         ## Create a frame for selected case files
@@ -107,7 +108,7 @@ class ExperimentUI(tk.Frame):
         self.selected_case_list.pack(fill="both", expand=True)
 
         ## Create a button to generate the new case file
-        open_case_creation_window_button = ttk.Button(main_frame, text="Create New Case", command=self.open_case_creation_window)
+        open_case_creation_window_button = ttk.Button(main_frame, text="Create New Case", command=action_command(self.open_case_creation_window))
         open_case_creation_window_button.pack(fill="x", padx=10, pady=10)
 
         ## Create an input field for Survey URL
@@ -155,22 +156,36 @@ class ExperimentUI(tk.Frame):
         """
         self.settings = settings
         self.create_widgets()
+        # Keep the hidden case editor in sync with the new settings
+        if self.case_window is not None:
+            self.case_ui.refresh_settings(settings)
 
     def open_case_creation_window(self):
         """
-        Create a new case file using a new window. 
-        CaseUI will be separated into case_Ui.py just like SettingsUI and ExperimentUI.
-        Only create new window when window doesn't exist.
+        Show the case creation window. 
+        The window and its CaseUI are built on first use only. Closing the window hides it,
+        so reopening it keeps the editor state and skips rebuilding the widgets; only the
+        media dropdowns are listed again.
         """
-        
-        if not hasattr(self, 'case_window') or self.case_window is None: 
+        if self.case_window is None:
             self.case_window = tk.Toplevel(self)
             self.case_window.title("Create New Case")
             self.case_window.geometry("1450x770")
             self.case_ui = CaseUI(self.case_window, self.settings)
             self.case_ui.pack(fill="both", expand=True)
-            # Closing the window will set case_window to None, and destroy the window using lambda function
-            self.case_window.protocol("WM_DELETE_WINDOW", lambda: [self.case_window.destroy(), setattr(self, 'case_window', None)])
+            # Closing the window only hides it so it can be reused
+            self.case_window.protocol("WM_DELETE_WINDOW", self.case_window.withdraw)
+        else:
+            # The media folders may have changed while the window was hidden
+            self.case_ui.refresh_media_files()
+            self.case_window.deiconify()
+            self.case_window.lift()
+
+    def is_case_window_open(self):
+        """
+        Returns whether the case creation window is currently shown.
+        """
+        return self.case_window is not None and self.case_window.state() != "withdrawn"
 
     def save_experiment(self):
         """
@@ -207,10 +222,7 @@ class ExperimentUI(tk.Frame):
             return 
 
         # Determine the root URL
-        if self.settings['use_server_address']:
-            root = self.settings['ServerAddress']
-        else:
-            root = f"https://{self.settings['github_id']}.github.io/{self.settings['github_repo']}"
+        root = get_root_url(self.settings)
 
         # Prepare the layout descriptions with full URLs
         layout_descriptions = []
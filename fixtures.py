@@ -0,0 +1,247 @@
+"""
+fixtures.py
+
+This file contains the hand-computed fixtures of the analysis tools: scoreboard_replay,
+swipe_analysis, participant_sim and the AHAP trimming of ahap_pattern. Every fixture is run through run_fixtures, once as
+its own session and, where the tool takes many sessions, as several identical sessions
+together, which checks that sessions do not affect each other.
+
+Usage:
+    python fixtures.py
+    python fixtures.py swipe_analysis
+"""
+
+import os
+import json
+import argparse
+import numpy as np
+from default_configs import default_settings
+from ahap_pattern import AhapPattern
+from latency_verify import expected_pattern, same_content
+from scoreboard_replay import scoring_rules, replay, displayed, events_from_arrays
+from swipe_analysis import samples_from_arrays, analyze, path_metrics
+from participant_sim import DEFAULT_PARTICIPANTS, MAX_STEPS, draw_participants, play, summarize, sweep
+
+def run_fixtures(fixtures, run, copies=(1,)):
+    """
+    Runs every fixture with every number of identical sessions and collects the mismatches.
+
+    Args:
+        fixtures (list[tuple]): The fixtures of one tool.
+        run (function): Takes a fixture and a number of sessions, and returns None when the result
+            matches the fixture or a description of the result when it does not.
+        copies (tuple[int]): The numbers of identical sessions to run every fixture as.
+
+    Returns:
+        list[str]: The mismatches.
+    """
+    failures = []
+    for number, fixture in enumerate(fixtures, 1):
+        for count in copies:
+            mismatch = run(fixture, count)
+            if mismatch is not None:
+                failures.append(f"Fixture {number} ({count} session(s)): {mismatch}")
+    return failures
+
+def _completion_matches(completion, expected):
+    return np.all(np.isnan(completion)) if expected is None else np.allclose(completion, expected)
+
+# Hand-computed games as (case JSON, [(time_ms, button)], expected per-event scores, errors, completion time)
+REPLAY_FIXTURES = [
+    ({"order_array": [1, 2, 3], "interaction": {"game_mode": "continue"}, "score": {"reward_score": 90, "penalty_percentage": 10, "decimal_places": 0, "display_negative": False}},
+     [(100, 1), (200, 5), (300, 2), (400, 3)], [30, 21, 51, 81], 1, 400),
+    ({"order_array": [1, 2, 3], "interaction": {"game_mode": "restart"}, "score": {"reward_score": 90, "penalty_percentage": 10, "decimal_places": 0, "display_negative": False}},
+     [(100, 1), (200, 2), (300, 9), (400, 1), (500, 2), (600, 3)], [30, 60, 51, 51, 51, 81], 1, 600),
+    ({"order_array": [1, 2, 3], "interaction": {"game_mode": "continue"}, "score": {"reward_score": 90, "penalty_percentage": 10, "decimal_places": 0, "display_negative": False}},
+     [(100, 7), (200, 1)], [0, 30], 1, None),
+    ({"order_array": [1, 2, 3], "interaction": {"game_mode": "continue"}, "score": {"reward_score": 90, "penalty_percentage": 10, "decimal_places": 0, "display_negative": True}},
+     [(100, 7), (200, 1)], [-9, 21], 1, None),
+    ({"order_array": [3, 1, 2], "interaction": {"game_mode": "restart"}, "score": {"reward_score": 100, "penalty_percentage": 5, "decimal_places": 2, "display_negative": False}, "timer": {"max_time": 1000}},
+     [(100, 3), (900, 1), (1500, 2)], [33.33, 66.67, 66.67], 0, None),
+    ({"order_array": [1, 2], "interaction": {"game_mode": "continue"}, "score": {"reward_score": 10, "penalty_percentage": 50, "decimal_places": 1, "display_negative": False}},
+     [(100, 1), (200, 2), (300, 1)], [5, 10, 10], 0, 200),
+]
+
+def _run_replay(fixture, copies):
+    case_data, steps, expected_scores, expected_errors, expected_completion = fixture
+    rules = scoring_rules(case_data)
+    events = events_from_arrays(
+        np.repeat(np.arange(copies), len(steps)),
+        np.tile([time_ms for time_ms, _ in steps], copies),
+        np.tile([button for _, button in steps], copies),
+    )
+    result = replay(events, rules)
+    scores = displayed(result['score'], rules).reshape(copies, len(steps))
+    completion = result['completion_time']
+    if np.allclose(scores, expected_scores) and np.all(result['errors'] == expected_errors) and _completion_matches(completion, expected_completion):
+        return None
+    return f"scores {scores[0].tolist()}, errors {result['errors'][0]}, completion {completion[0]}"
+
+def check_replay():
+    """
+    Replays the REPLAY_FIXTURES with scoreboard_replay and returns the mismatches.
+    """
+    return run_fixtures(REPLAY_FIXTURES, _run_replay, (1, 3))
+
+# Each swipe fixture is a case, the touch samples of one stroke (time_ms, x, y), the expected crossings and the expected errors and completion time
+SWIPE_CASE = {
+    "order_array": [1, 2, 3], "interaction": {"game_mode": "restart"},
+    "location_array": [{"x": 10, "y": 10}, {"x": 50, "y": 10}, {"x": 50, "y": 60}],
+}
+SWIPE_FIXTURES = [
+    # Straight through 1 and 2, then down to 3; both buttons are passed between two samples
+    (SWIPE_CASE, [(0, 5, 15), (100, 90, 15), (200, 55, 80)], [1, 2, 3], 0, 100 + 100 * 25 / 35),
+    # Starting on 1, missing 2 and reaching 3 is an error
+    (SWIPE_CASE, [(0, 15, 15), (100, 57, 40), (200, 57, 65)], [1, 3], 1, None),
+    # Moving inside a button does not cross it again
+    (SWIPE_CASE, [(0, 12, 12), (50, 20, 15), (100, 24, 18), (200, 40, 18)], [1], 0, None),
+    # A segment along an edge touches the button
+    (SWIPE_CASE, [(0, 0, 10), (100, 100, 10)], [1, 2], 0, None),
+]
+
+def _run_swipe(fixture, copies):
+    case_data, steps, expected_crossed, expected_errors, expected_completion = fixture
+    steps_array = np.tile(np.array(steps, dtype=np.float64), (copies, 1))
+    samples = samples_from_arrays(np.repeat(np.arange(copies), len(steps)), steps_array[:, 0], steps_array[:, 1], steps_array[:, 2])
+    result = analyze(case_data, samples)
+    crossed = result["crossings"]["button"]
+    completion = result["replay"]["completion_time"]
+    if len(crossed) == copies * len(expected_crossed) and np.all(crossed.reshape(copies, -1) == expected_crossed) \
+            and np.all(result["replay"]["errors"] == expected_errors) and _completion_matches(completion, expected_completion):
+        return None
+    return f"crossed {crossed.tolist()}, errors {result['replay']['errors'].tolist()}, completion {completion.tolist()}"
+
+def check_swipe():
+    """
+    Analyzes the SWIPE_FIXTURES with swipe_analysis, checks the path metrics of one stroke and returns the mismatches.
+    """
+    failures = run_fixtures(SWIPE_FIXTURES, _run_swipe, (1, 3))
+    lengths = path_metrics(samples_from_arrays([0, 0, 0], [0, 1000, 2000], [0, 30, 30], [0, 0, 40]))
+    if not np.allclose([lengths["path_length"][0], lengths["straightness"][0], lengths["mean_speed"][0], lengths["peak_speed"][0]], [70, 50 / 70, 35, 40]):
+        failures.append(f"Path metrics: {lengths}")
+    return failures
+
+# Simulated games whose outcome is known exactly, as (case JSON, participant model, expected share of games cut off,
+# completion rate, completion time, score), with None where no game gives a value
+SIM_CASE = {
+    "order_array": [3, 1, 2, 4, 5, 6, 7, 8, 9], "interaction_delay": [0] * 9,
+    "interaction": {"interaction_type": "tap", "game_mode": "restart"},
+    "score": {"reward_score": 90, "penalty_percentage": 10, "decimal_places": 0, "display_negative": False},
+}
+EXACT_PARTICIPANTS = dict(DEFAULT_PARTICIPANTS, reaction_time_median=500.0, reaction_time_sigma=0.0, participant_sigma=0.0, error_rate=0.0)
+SIM_FIXTURES = [
+    (SIM_CASE, EXACT_PARTICIPANTS, 0, 1.0, 4500, 90),
+    (dict(SIM_CASE, interaction_delay=[100] * 9), EXACT_PARTICIPANTS, 0, 1.0, 5400, 90),
+    (dict(SIM_CASE, interaction_delay=[0, 0, 1000, 0, 0, 0, 0, 0, 0]), EXACT_PARTICIPANTS, 0, 1.0, 5500, 90),
+    (dict(SIM_CASE, timer={"direction": "up", "format": "s", "max_time": 4000}), EXACT_PARTICIPANTS, 0, 0.0, None, 80),
+    # Every game runs out of time before it is cut off
+    (dict(SIM_CASE, timer={"direction": "up", "format": "s", "max_time": 4000}), dict(EXACT_PARTICIPANTS, error_rate=1.0), 0, 0.0, None, 0),
+    # Without a timer a game that never completes is cut off, and has no outcome
+    (SIM_CASE, dict(EXACT_PARTICIPANTS, error_rate=1.0), 1, None, None, None),
+]
+
+def _matches(value, expected):
+    return np.isnan(value) if expected is None else np.isclose(value, expected)
+
+def _run_sim(fixture, participants_count):
+    case_data, participants, expected_cut_off, expected_rate, expected_time, expected_score = fixture
+    summary = summarize(play(case_data, draw_participants(participants_count, participants, seed=0)), scoring_rules(case_data))
+    if summary['cut_off'] == expected_cut_off * participants_count and _matches(summary['completion_rate'], expected_rate) \
+            and _matches(summary['time_p50'], expected_time) and _matches(summary['score_p50'], expected_score):
+        return None
+    return str(summary)
+
+def check_sim():
+    """
+    Simulates the SIM_FIXTURES with participant_sim, checks the mistakes of continue games, the cut-off restart
+    games and the delays of swipe games, and returns the mismatches.
+    """
+    failures = run_fixtures(SIM_FIXTURES, _run_sim, (1, 50))
+
+    # A mistake never hits the target, and in the continue mode every game completes
+    draws = draw_participants(500, dict(DEFAULT_PARTICIPANTS, error_rate=0.3), seed=0)
+    continued = dict(SIM_CASE, interaction={"interaction_type": "tap", "game_mode": "continue"})
+    result = replay(play(continued, draws), scoring_rules(continued))
+    if not result['completed'].all() or result['errors'].sum() != draws['mistake'][np.arange(MAX_STEPS) < (9 + result['errors'])[:, None]].sum():
+        failures.append("Continue mode: mistakes do not match the drawn mistakes")
+
+    # Without a timer every restart game that is not cut off completes
+    summary = summarize(play(SIM_CASE, draws), scoring_rules(SIM_CASE))
+    if summary['completion_rate'] != 1.0 or not 0 < summary['cut_off'] < 500:
+        failures.append(f"Restart mode: {summary}")
+
+    # Candidate delays are not applied to swipe cases
+    swiped = dict(SIM_CASE, interaction={"interaction_type": "swipe_through", "game_mode": "restart"})
+    rows = sweep(swiped, draw_participants(5, EXACT_PARTICIPANTS, seed=0), delays=(0, 500))
+    if len(rows) != 1 or rows[0]['time_p50'] != 4500:
+        failures.append(f"Swipe delays: {rows}")
+    return failures
+
+# A curve crossing zero after a shift, as (AHAP data, shift, expected Pattern)
+AHAP_FIXTURES = [
+    ({"Version": 1.0, "Pattern": [
+        {"Event": {"Time": 0.1, "EventType": "HapticTransient", "EventParameters": [{"ParameterID": "HapticIntensity", "ParameterValue": 1.0}]}},
+        {"Event": {"Time": 0.1, "EventType": "HapticContinuous", "EventDuration": 0.5, "EventParameters": []}},
+        {"ParameterCurve": {"ParameterID": "HapticIntensityControl", "Time": 0.1, "ParameterCurveControlPoints": [
+            {"Time": 0.0, "ParameterValue": 0.2}, {"Time": 0.2, "ParameterValue": 0.6}, {"Time": 0.3, "ParameterValue": 0.0}]}},
+    ]}, -0.2, [
+        {"Event": {"Time": 0.0, "EventType": "HapticContinuous", "EventDuration": 0.4, "EventParameters": []}},
+        {"ParameterCurve": {"ParameterID": "HapticIntensityControl", "Time": 0.0, "ParameterCurveControlPoints": [
+            {"Time": 0.0, "ParameterValue": 0.4}, {"Time": 0.1, "ParameterValue": 0.6}, {"Time": 0.2, "ParameterValue": 0.0}]}},
+    ]),
+]
+# Shifts the shipped AHAP files are checked with, in seconds
+AHAP_SHIFTS = (0.5, -0.03, -0.07, -0.12)
+
+def _run_ahap(fixture, _):
+    ahap_data, shift, expected = fixture
+    pattern = AhapPattern.from_dict(ahap_data).shift(shift).trim(0.0).to_dict()['Pattern']
+    if same_content(expected, pattern, 1e-9) and same_content(expected, expected_pattern(ahap_data['Pattern'], shift), 1e-9):
+        return None
+    return f"trimmed {pattern}"
+
+def check_ahap():
+    """
+    Trims the AHAP_FIXTURES, checks that trim(0.0) gives back every shipped AHAP file unchanged and that
+    shifted and trimmed files match latency_verify.expected_pattern, and returns the mismatches.
+    """
+    failures = run_fixtures(AHAP_FIXTURES, _run_ahap)
+    folders = default_settings['FolderVariables']
+    for folder in (folders['OriginalHapticFolder'], folders['LatencyHapticFolder']):
+        for name in sorted(os.listdir(folder)):
+            if not name.endswith('.ahap'):
+                continue
+            with open(os.path.join(folder, name), 'r') as f:
+                ahap_data = json.load(f)
+            pattern = AhapPattern.from_dict(ahap_data)
+            if pattern.trim(0.0).to_dict() != ahap_data:
+                failures.append(f"{name}: trim(0.0) changes the pattern")
+            for shift in AHAP_SHIFTS:
+                if not same_content(expected_pattern(ahap_data['Pattern'], shift), pattern.shift(shift).trim(0.0).to_dict()['Pattern'], 1e-9):
+                    failures.append(f"{name}: shifting by {shift} s and trimming does not match the expected pattern")
+    return failures
+
+CHECKS = {
+    "scoreboard_replay": check_replay,
+    "swipe_analysis": check_swipe,
+    "participant_sim": check_sim,
+    "ahap_pattern": check_ahap,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the hand-computed fixtures of the analysis tools.")
+    parser.add_argument("tools", nargs="*", help=f"Tools to check, of {', '.join(CHECKS)} (default: all)")
+    args = parser.parse_args()
+    unknown = [tool for tool in args.tools if tool not in CHECKS]
+    if unknown:
+        parser.error(f"unknown tools: {', '.join(unknown)}")
+
+    failed = False
+    for tool in args.tools or CHECKS:
+        failures = CHECKS[tool]()
+        print(f"{tool}: " + ("\n    ".join(["failed"] + failures) if failures else "all fixtures passed"))
+        failed |= bool(failures)
+    raise SystemExit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
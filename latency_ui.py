@@ -3,8 +3,11 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import numpy as np
 import soundfile as sf
-import json
 from custom_widget import ScrollableFrame, EditableList, LabelEntryRow
+from asset_catalog import catalog
+from waveform import find_onset, BLOCK_FRAMES
+from ahap_pattern import AhapPattern
+from action_profiler import action_command
 
 class LatencyUI(tk.Toplevel):
     def __init__(self, parent, settings):
@@ -13,6 +16,7 @@ class LatencyUI(tk.Toplevel):
         self.title("Latency Management")
         self.geometry("500x770")
         self.latency = 0.5  # Default latency
+        self.align_onset = False  # Pad from the start of the file, not from the first onset
         self.audio_files = []
         self.haptic_files = []
         
@@ -25,6 +29,12 @@ class LatencyUI(tk.Toplevel):
 
         # Latency input
         LabelEntryRow(main_frame, "Latency (seconds):", str(self.latency), entry_callback=self.update_latency)
+
+        # Onset alignment: the first sound (or first haptic event) lands exactly at the latency
+        self.align_onset_var = tk.BooleanVar(value=self.align_onset)
+        self.align_onset_var.trace_add("write", lambda *args: setattr(self, 'align_onset', self.align_onset_var.get()))
+        align_onset_checkbox = ttk.Checkbutton(main_frame, text="Align First Onset To The Latency", variable=self.align_onset_var)
+        align_onset_checkbox.pack(side="top", padx=10, pady=5)
         
         # Audio files
         audio_frame = ttk.LabelFrame(main_frame, text="Audio Files")
@@ -53,15 +63,15 @@ class LatencyUI(tk.Toplevel):
         self.haptic_list.pack(fill="both", expand=True)
 
         # Convert button
-        convert_button = ttk.Button(main_frame, text="Convert", command=self.convert_files)
+        convert_button = ttk.Button(main_frame, text="Convert", command=action_command(self.convert_files))
         convert_button.pack(pady=10)
 
     def load_audio_files(self):
-        audio_files = [f for f in os.listdir(self.settings['FolderVariables']['OriginalAudioFolder']) if f.endswith('.wav')]
+        audio_files = [entry['name'] for entry in catalog.list_files(self.settings['FolderVariables']['OriginalAudioFolder'], ('.wav',))]
         return [''] + audio_files  # Empty string instead of 'None'
 
     def load_haptic_files(self):
-        haptic_files = [f for f in os.listdir(self.settings['FolderVariables']['OriginalHapticFolder']) if f.endswith('.ahap')]
+        haptic_files = [entry['name'] for entry in catalog.list_files(self.settings['FolderVariables']['OriginalHapticFolder'], ('.ahap',))]
         return [''] + haptic_files  # Empty string instead of 'None'
 
     def update_latency(self, value):
@@ -95,27 +105,33 @@ class LatencyUI(tk.Toplevel):
         input_folder = self.settings['FolderVariables']['OriginalAudioFolder']
         output_folder = self.settings['FolderVariables']['LatencyAudioFolder']
         file_path = os.path.join(input_folder, file_name)
-        data, fs = sf.read(file_path)
-        latency_samples = int(self.latency * fs)
-        if data.ndim == 1:  # mono
-            latency_data = np.zeros(latency_samples, dtype=data.dtype)
-        else:  # stereo
-            latency_data = np.zeros((latency_samples, data.shape[1]), dtype=data.dtype)
-        data_with_latency = np.concatenate([latency_data, data])
+        info = sf.info(file_path)
+        latency_samples = int(self.latency * info.samplerate)
+        # In onset aligned mode the leading silence is trimmed or padded so the onset lands at the latency
+        onset = find_onset(file_path) if self.align_onset else 0
+        padding = latency_samples - onset
         output_file_path = os.path.join(output_folder, file_name)
-        sf.write(output_file_path, data_with_latency, fs)
+        os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+        # Stream the file so large recordings are never loaded at once
+        with sf.SoundFile(output_file_path, 'w', samplerate=info.samplerate, channels=info.channels, format=info.format) as output:
+            for start in range(0, max(padding, 0), BLOCK_FRAMES):
+                output.write(np.zeros((min(BLOCK_FRAMES, padding - start), info.channels)))
+            for block in sf.blocks(file_path, blocksize=BLOCK_FRAMES, start=max(-padding, 0), always_2d=True):
+                output.write(block)
 
     def haptic_latency(self, file_name):
         input_folder = self.settings['FolderVariables']['OriginalHapticFolder']
         output_folder = self.settings['FolderVariables']['LatencyHapticFolder']
         file_path = os.path.join(input_folder, file_name)
-        with open(file_path, 'r') as f:
-            ahap_data = json.load(f)
-        for pattern in ahap_data['Pattern']:
-            if 'Event' in pattern:
-                pattern['Event']['Time'] += self.latency
-            elif 'ParameterCurve' in pattern:
-                pattern['ParameterCurve']['Time'] += self.latency
+        pattern = AhapPattern.load(file_path)
+        shift = self.latency
+        if self.align_onset and pattern.event_times.size:
+            # Anchor on the first event, so it lands exactly at the latency
+            shift = self.latency - pattern.event_times.min()
+        pattern = pattern.shift(shift)
+        if shift < 0:
+            # Anything moved before the start is cut off, curves keep their value at zero
+            pattern = pattern.trim(0.0)
         output_file_path = os.path.join(output_folder, file_name)
-        with open(output_file_path, 'w') as f:
-            json.dump(ahap_data, f, indent=4)
\ No newline at end of file
+        os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+        pattern.save(output_file_path)
\ No newline at end of file
@@ -0,0 +1,280 @@
+"""
+latency_verify.py
+
+This file contains the latency verifier, which checks that the files in the latency
+folders really are the originals shifted by the configured latency. For each audio pair
+the actual shift is found with an FFT cross-correlation in NumPy, and the residual error
+between the aligned files tells whether the content still matches. For each AHAP pair
+the expected entries are built from the original by expected_pattern, written entry by
+entry without AhapPattern so it checks the generator independently, and compared with
+the file in the latency folder. The pairs are checked in parallel
+in a process pool, and a per-file table is printed.
+
+Usage:
+    python latency_verify.py --latency 0.5
+    python latency_verify.py --latency 0.5 --aligned --json report.json
+"""
+
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import soundfile as sf
+from default_configs import default_settings
+from waveform import find_onset
+from ahap_pattern import AhapPattern
+
+DEFAULT_LATENCY = 0.5
+# Shift error allowed, in seconds
+DEFAULT_TOLERANCE = 0.001
+# Highest residual error after alignment, relative to the original energy, in dB
+DEFAULT_MAX_RESIDUAL = -30.0
+# Residual reported for an exact match
+RESIDUAL_FLOOR = -200.0
+
+def cross_correlation_lag(reference, signal):
+    """
+    Returns the lag in samples at which the signal best matches the reference, using an FFT cross-correlation.
+    A positive lag means the signal is the reference delayed.
+    """
+    size = len(reference) + len(signal) - 1
+    fft_size = 1 << (size - 1).bit_length()
+    correlation = np.fft.irfft(np.fft.rfft(signal, fft_size) * np.conj(np.fft.rfft(reference, fft_size)), fft_size)
+    # Lags 0..len(signal)-1 sit at the start, negative lags wrap around to the end
+    lags = np.concatenate([np.arange(len(signal)), np.arange(-len(reference) + 1, 0)])
+    values = np.concatenate([correlation[:len(signal)], correlation[fft_size - len(reference) + 1:]])
+    return int(lags[np.argmax(values)])
+
+def residual_db(reference, signal, lag):
+    """
+    Returns the energy of the difference between the signal and the reference shifted by lag,
+    relative to the reference energy, over the whole signal. Samples of the signal outside the
+    shifted reference count as error, so extra content is caught as well.
+    """
+    expected = np.zeros(len(signal))
+    start, end = max(lag, 0), min(lag + len(reference), len(signal))
+    if end > start:
+        expected[start:end] = reference[start - lag:end - lag]
+    error = np.sum((signal - expected) ** 2)
+    energy = np.sum(reference ** 2)
+    if energy == 0:
+        return RESIDUAL_FLOOR if error == 0 else -RESIDUAL_FLOOR
+    return max(10 * np.log10(max(error / energy, 1e-300)), RESIDUAL_FLOOR)
+
+def verify_audio(original_path, latency_path, expected_shift, tolerance=DEFAULT_TOLERANCE, max_residual=DEFAULT_MAX_RESIDUAL):
+    """
+    Verifies one audio pair. Runs in the worker processes.
+
+    Args:
+        original_path (str): The original file.
+        latency_path (str): The file from the latency folder.
+        expected_shift (float): The expected shift in seconds.
+        tolerance (float): The shift error allowed, in seconds.
+        max_residual (float): The highest residual error after alignment, in dB.
+
+    Returns:
+        dict: The measured shift, the residual and the status of the pair.
+    """
+    original, original_rate = sf.read(original_path, dtype='float64', always_2d=True)
+    shifted, shifted_rate = sf.read(latency_path, dtype='float64', always_2d=True)
+    result = {"file": os.path.basename(original_path), "kind": "audio", "expected_s": None, "measured_s": None, "residual_db": None, "status": "OK"}
+    if original_rate != shifted_rate:
+        result["status"] = f"STALE ({shifted_rate} Hz, original {original_rate} Hz)"
+        return result
+    if original.shape[1] != shifted.shape[1]:
+        result["status"] = f"STALE ({shifted.shape[1]} channels, original {original.shape[1]})"
+        return result
+
+    reference, signal = original.mean(axis=1), shifted.mean(axis=1)
+    lag = cross_correlation_lag(reference, signal)
+    result["measured_s"] = round(lag / original_rate, 6)
+    result["residual_db"] = round(float(residual_db(reference, signal, lag)), 1)
+    result["expected_s"] = round(expected_shift, 6)
+
+    problems = []
+    if abs(lag / original_rate - expected_shift) > max(tolerance, 1 / original_rate):
+        problems.append("shift")
+    if result["residual_db"] > max_residual:
+        problems.append("content")
+    if problems:
+        result["status"] = "STALE (" + ", ".join(problems) + ")"
+    return result
+
+def same_content(expected, actual, tolerance):
+    """
+    Compares two JSON values, allowing numbers to differ by the tolerance.
+    """
+    if isinstance(expected, dict):
+        return isinstance(actual, dict) and expected.keys() == actual.keys() and all(same_content(expected[key], actual[key], tolerance) for key in expected)
+    if isinstance(expected, list):
+        return isinstance(actual, list) and len(expected) == len(actual) and all(same_content(e, a, tolerance) for e, a in zip(expected, actual))
+    if isinstance(expected, (int, float)) and not isinstance(expected, bool) and isinstance(actual, (int, float)) and not isinstance(actual, bool):
+        return abs(expected - actual) <= tolerance
+    return expected == actual
+
+def expected_pattern(pattern, shift):
+    """
+    Builds the Pattern entries an original Pattern should have once shifted by shift seconds and cut at zero.
+
+    Entries moved before zero are dropped. Continuous events crossing zero start at zero and keep their end.
+    Curves crossing zero start at zero, lose the control points before it and get one interpolated at zero
+    when no point falls on it. Everything else is unchanged.
+
+    Args:
+        pattern (list[dict]): The Pattern entries of the original AHAP file.
+        shift (float): The shift in seconds.
+
+    Returns:
+        list[dict]: The expected Pattern entries.
+    """
+    expected = []
+    for entry in pattern:
+        key = next((key for key in ('Event', 'ParameterCurve', 'Parameter') if key in entry), None)
+        if key is None:
+            # Entries without a time are taken as starting at zero
+            if shift >= 0:
+                expected.append(entry)
+            continue
+        body = dict(entry[key])
+        time = body.get('Time', 0.0) + shift
+        points = body.get('ParameterCurveControlPoints', []) if key == 'ParameterCurve' else []
+        if points:
+            absolute = [time + point.get('Time', 0.0) for point in points]
+            first = next((index for index, point_time in enumerate(absolute) if point_time >= 0), None)
+            if first is None:
+                continue
+            kept = [(point_time, point) for point_time, point in zip(absolute[first:], points[first:])]
+            if first > 0 and absolute[first] > 0:
+                t0, t1 = absolute[first - 1], absolute[first]
+                v0, v1 = points[first - 1]['ParameterValue'], points[first]['ParameterValue']
+                kept.insert(0, (0.0, {"Time": 0.0, "ParameterValue": v0 + (v1 - v0) * -t0 / (t1 - t0)}))
+            body['Time'] = max(time, 0.0)
+            body['ParameterCurveControlPoints'] = [dict(point, Time=point_time - body['Time']) for point_time, point in kept]
+        elif key == 'Event' and 'EventDuration' in body:
+            end = time + body['EventDuration']
+            if time < 0:
+                if end <= 0:
+                    continue
+                time, body['EventDuration'] = 0.0, end
+            body['Time'] = time
+        elif time < 0:
+            continue
+        else:
+            body['Time'] = time
+        expected.append({key: body})
+    return expected
+
+def verify_haptic(original_path, latency_path, expected_shift, tolerance=DEFAULT_TOLERANCE):
+    """
+    Verifies one AHAP pair against the entries expected_pattern builds from the original.
+    Entry times may differ by the tolerance, and the rest of every entry must match.
+    """
+    with open(original_path, 'r') as f:
+        expected = expected_pattern(json.load(f)['Pattern'], expected_shift)
+    with open(latency_path, 'r') as f:
+        shifted = json.load(f)['Pattern']
+    result = {"file": os.path.basename(original_path), "kind": "haptic", "expected_s": round(expected_shift, 6), "measured_s": None, "residual_db": None, "status": "OK"}
+    if len(expected) != len(shifted):
+        result["status"] = f"STALE ({len(shifted)} entries, expected {len(expected)})"
+        return result
+
+    def split(entry):
+        key = next(iter(entry))
+        body = dict(entry[key])
+        return key, body.pop('Time', 0.0), body
+    deviations, changed = [], False
+    for expected_entry, shifted_entry in zip(expected, shifted):
+        expected_key, expected_time, expected_body = split(expected_entry)
+        shifted_key, shifted_time, shifted_body = split(shifted_entry)
+        changed = changed or expected_key != shifted_key or not same_content(expected_body, shifted_body, tolerance)
+        deviations.append(shifted_time - expected_time)
+    if deviations:
+        result["measured_s"] = round(expected_shift + float(np.median(deviations)), 6)
+        result["max_deviation_s"] = round(float(np.max(np.abs(deviations))), 6)
+
+    problems = []
+    if deviations and result["max_deviation_s"] > tolerance:
+        problems.append("shift")
+    if changed:
+        problems.append("content")
+    if problems:
+        result["status"] = "STALE (" + ", ".join(problems) + ")"
+    return result
+
+def verify_pair(kind, original_path, latency_path, latency, aligned, tolerance, max_residual):
+    """
+    Works out the expected shift of a pair and verifies it. Runs in the worker processes.
+    Onset aligned files put the first onset of the original at the latency.
+    """
+    if kind == "audio":
+        rate = sf.info(original_path).samplerate
+        expected = latency - find_onset(original_path) / rate if aligned else latency
+        return verify_audio(original_path, latency_path, expected, tolerance, max_residual)
+    expected = latency
+    if aligned:
+        event_times = AhapPattern.load(original_path).event_times
+        expected = latency - float(event_times.min()) if event_times.size else latency
+    return verify_haptic(original_path, latency_path, expected, tolerance)
+
+def verify_folders(settings, latency=DEFAULT_LATENCY, aligned=False, tolerance=DEFAULT_TOLERANCE, max_residual=DEFAULT_MAX_RESIDUAL, workers=None):
+    """
+    Verifies every file of the latency folders against the original with the same name.
+
+    Args:
+        settings (dict): The settings holding the FolderVariables.
+        latency (float): The latency the files were generated with, in seconds.
+        aligned (bool): Whether the files were generated in onset aligned mode.
+        tolerance (float): The shift error allowed, in seconds.
+        max_residual (float): The highest residual error after alignment, in dB.
+        workers (int, optional): The number of worker processes, the CPU count by default.
+
+    Returns:
+        list[dict]: One result per file, including the files missing their original.
+    """
+    folders = settings['FolderVariables']
+    jobs, results = [], []
+    for kind, original_folder, latency_folder, extension in (
+        ("audio", folders['OriginalAudioFolder'], folders['LatencyAudioFolder'], '.wav'),
+        ("haptic", folders['OriginalHapticFolder'], folders['LatencyHapticFolder'], '.ahap'),
+    ):
+        if not os.path.isdir(latency_folder):
+            continue
+        for name in sorted(f for f in os.listdir(latency_folder) if f.lower().endswith(extension)):
+            original_path = os.path.join(original_folder, name)
+            if not os.path.isfile(original_path):
+                results.append({"file": name, "kind": kind, "expected_s": None, "measured_s": None, "residual_db": None, "status": "no original"})
+                continue
+            jobs.append((kind, original_path, os.path.join(latency_folder, name), latency, aligned, tolerance, max_residual))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(verify_pair, *zip(*jobs))) + results if jobs else results
+    return results
+
+def print_report(results):
+    print(f"{'File':<36}{'Kind':<8}{'Expected s':>12}{'Measured s':>12}{'Residual dB':>13}  Status")
+    for result in results:
+        values = [str(result[key]) if result[key] is not None else '-' for key in ('expected_s', 'measured_s', 'residual_db')]
+        print(f"{result['file']:<36}{result['kind']:<8}{values[0]:>12}{values[1]:>12}{values[2]:>13}  {result['status']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the latency folders hold the originals shifted by the latency.")
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY, help=f"Latency the files were generated with, in seconds (default: {DEFAULT_LATENCY})")
+    parser.add_argument("--aligned", action="store_true", help="The files were generated with the first onset aligned to the latency")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help=f"Shift error allowed in seconds (default: {DEFAULT_TOLERANCE})")
+    parser.add_argument("--max-residual", type=float, default=DEFAULT_MAX_RESIDUAL, help=f"Highest residual error after alignment in dB (default: {DEFAULT_MAX_RESIDUAL})")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--json", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = verify_folders(default_settings, args.latency, args.aligned, args.tolerance, args.max_residual, args.workers)
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+    failed = [result for result in results if result['status'] != "OK"]
+    if failed:
+        print(f"{len(failed)} of {len(results)} file(s) do not match their original")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
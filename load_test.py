@@ -0,0 +1,232 @@
+"""
+load_test.py
+
+This file contains an asyncio load generator that simulates many participants opening
+an experiment at the same time. Each simulated participant replays the real fetch
+sequence of Files/Experiment/<id>.json (see experiment_files.load_fetch_plan) against
+a base URL over its own keep-alive connection. The report lists the throughput,
+the p50/p95/p99 request and session latencies and the bytes transferred.
+
+Usage:
+    python load_test.py SZE --base-url http://127.0.0.1:8000 --participants 50
+"""
+
+import ssl
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+from urllib.parse import urlsplit, quote
+from experiment_files import load_fetch_plan
+
+class HTTPConnection:
+    """
+    A minimal HTTP/1.1 client connection supporting keep-alive, Content-Length and chunked bodies.
+
+    Args:
+        base_url (str): The scheme, host, port and optional path prefix requests are sent to.
+        timeout (float): The timeout of each request in seconds.
+    """
+    def __init__(self, base_url, timeout=30.0):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        ssl_context = ssl.create_default_context() if self.scheme == 'https' else None
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=ssl_context)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, ssl.SSLError):
+                pass
+            self.writer = None
+
+    async def get(self, path):
+        """
+        Sends a GET request, reconnecting when the server closed the previous connection.
+
+        Returns:
+            tuple: The status code and the number of body bytes received on the wire.
+        """
+        return await asyncio.wait_for(self._get(path), self.timeout)
+
+    async def _get(self, path):
+        if self.writer is None:
+            await self.connect()
+        request = (
+            f"GET {self.prefix}/{quote(path)} HTTP/1.1\r\n"
+            f"Host: {self.host}\r\n"
+            "Accept-Encoding: gzip\r\n"
+            "Connection: keep-alive\r\n"
+            "User-Agent: TouchTact-LoadTest\r\n\r\n"
+        )
+        self.writer.write(request.encode('latin-1'))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            # The server closed an idle keep-alive connection, retry on a new one
+            await self.close()
+            await self.connect()
+            self.writer.write(request.encode('latin-1'))
+            await self.writer.drain()
+            status_line = await self.reader.readline()
+        status = int(status_line.split()[1])
+
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        received = 0
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # Skip the trailers
+                    while (await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                received += len(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+        elif 'content-length' in headers:
+            received = len(await self.reader.readexactly(int(headers['content-length'])))
+        elif status not in (204, 304):
+            # No length given: the body ends when the server closes the connection
+            received = len(await self.reader.read())
+            await self.close()
+
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, received
+
+async def run_participant(base_url, plan, results, start_delay, timeout):
+    """
+    Replays the fetch plan once, recording (kind, status, seconds, bytes) for each request.
+
+    Returns:
+        float: The duration of the whole session in seconds.
+    """
+    await asyncio.sleep(start_delay)
+    connection = HTTPConnection(base_url, timeout)
+    session_start = time.perf_counter()
+    try:
+        for step in plan:
+            request_start = time.perf_counter()
+            try:
+                status, received = await connection.get(step['path'])
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+                status, received = 0, 0
+                await connection.close()
+            results.append((step['kind'], status, time.perf_counter() - request_start, received))
+    finally:
+        await connection.close()
+    return time.perf_counter() - session_start
+
+async def run_load_test(base_url, plan, participants, ramp_up=0.0, timeout=30.0):
+    """
+    Runs the fetch plan for many concurrent participants.
+
+    Args:
+        base_url (str): The root URL the Files folder is served under.
+        plan (list[dict]): The fetch plan from experiment_files.load_fetch_plan.
+        participants (int): The number of simulated participants.
+        ramp_up (float): Seconds over which participant start times are spread evenly.
+        timeout (float): The timeout of each request in seconds.
+
+    Returns:
+        dict: The load test report.
+    """
+    results = []
+    start = time.perf_counter()
+    sessions = await asyncio.gather(*[
+        run_participant(base_url, plan, results, ramp_up * i / max(participants, 1), timeout)
+        for i in range(participants)
+    ])
+    elapsed = time.perf_counter() - start
+    return summarize(results, sessions, elapsed, participants)
+
+def summarize(results, sessions, elapsed, participants):
+    """
+    Aggregates the request results into throughput, latency percentiles and byte counts.
+    """
+    statuses = np.array([result[1] for result in results])
+    latencies = np.array([result[2] for result in results]) * 1000
+    received = np.array([result[3] for result in results], dtype=np.int64)
+    ok = (statuses >= 200) & (statuses < 400)
+
+    def percentiles(values):
+        if values.size == 0:
+            return {"p50": None, "p95": None, "p99": None}
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2)}
+
+    by_kind = {}
+    kinds = np.array([result[0] for result in results])
+    for kind in sorted(set(kinds.tolist())):
+        mask = (kinds == kind) & ok
+        by_kind[kind] = dict(requests=int((kinds == kind).sum()), **percentiles(latencies[mask]))
+
+    return {
+        "participants": participants,
+        "requests": len(results),
+        "errors": int((~ok).sum()),
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(results) / elapsed, 2) if elapsed else None,
+        "bytes": int(received.sum()),
+        "bytes_per_s": round(float(received.sum()) / elapsed, 1) if elapsed else None,
+        "request_latency_ms": percentiles(latencies[ok]),
+        "session_s": percentiles(np.array(sessions)),
+        "by_kind": by_kind
+    }
+
+def print_report(report):
+    print(f"Participants:      {report['participants']}")
+    print(f"Requests:          {report['requests']} ({report['errors']} errors)")
+    print(f"Elapsed:           {report['elapsed_s']} s")
+    print(f"Throughput:        {report['requests_per_s']} requests/s, {report['bytes_per_s'] / 1024:.1f} KiB/s")
+    print(f"Bytes transferred: {report['bytes']}")
+    latency = report['request_latency_ms']
+    print(f"Request latency:   p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms")
+    session = report['session_s']
+    print(f"Session duration:  p50 {session['p50']} s, p95 {session['p95']} s, p99 {session['p99']} s")
+    print(f"{'Kind':<12}{'Requests':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for kind, stats in report['by_kind'].items():
+        print(f"{kind:<12}{stats['requests']:>10}{str(stats['p50']):>10}{str(stats['p95']):>10}{str(stats['p99']):>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent participants downloading an experiment.")
+    parser.add_argument("experiment_id", help="Experiment ID, e.g. SZE for Files/Experiment/SZE.json")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Root URL the Files folder is served under")
+    parser.add_argument("--participants", type=int, default=10, help="Number of concurrent participants")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds over which participants start")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout of each request in seconds")
+    parser.add_argument("--all-references", action="store_true", help="Request files every time they are referenced instead of once per participant")
+    parser.add_argument("--experiment-folder", default=None, help="Folder of the experiment JSON files")
+    parser.add_argument("--case-folder", default=None, help="Folder of the case JSON files")
+    parser.add_argument("--json", default=None, help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    plan = load_fetch_plan(args.experiment_id, args.experiment_folder, args.case_folder, unique=not args.all_references)
+    print(f"Replaying {len(plan)} requests per participant against {args.base_url}")
+    report = asyncio.run(run_load_test(args.base_url, plan, args.participants, args.ramp_up, args.timeout))
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""
+log_store.py
+
+This file contains the columnar store for participant interaction logs. Exported JSONL
+and CSV logs are streamed in chunks of CHUNK_ROWS rows, so memory stays bounded however
+large an export is, normalized against the generated cases in Files/Case, and appended
+to one .npy file per column. Analyses open the columns as memory maps, so they start
+instantly and only read the columns they use. A participant/case index lists the rows of
+every participant, case and session, ordered by time.
+
+The store is append-only. The manifest is written last and holds the committed row count,
+so an interrupted ingest leaves no visible rows. A log file that is ingested again is
+skipped when its content is unchanged. When it changed, its old rows are retired instead
+of deleted, and the new content is appended.
+
+A log row has "participant", "case", "session", "time_ms" and "button" (the 1-based
+button number), and optionally the "experiment" the participant took part in. Rows of
+unknown cases, with a button outside the case's order_array or with an invalid time are
+rejected and counted.
+
+Usage:
+    python log_store.py logs/*.jsonl logs/*.csv
+    python log_store.py --summary
+"""
+
+import os
+import csv
+import json
+import argparse
+import numpy as np
+from default_configs import DEFAULT_GUI_FOLDER
+from waveform import content_hash
+from scoreboard_replay import DEFAULT_CASE_FOLDER, events_from_arrays
+
+DEFAULT_STORE_FOLDER = os.path.join(DEFAULT_GUI_FOLDER, 'log_store')
+MANIFEST_NAME = 'manifest.json'
+CHUNK_ROWS = 100000
+# The .npy header is written with a fixed size, so the row count can be updated in place when appending
+HEADER_BYTES = 128
+INTERACTION_CODES = {"tap": 0, "swipe_through": 1}
+
+COLUMNS = {
+    "participant": np.int32,
+    "case": np.int32,
+    "session": np.int32,
+    "time_ms": np.float64,
+    "button": np.int16,
+    "target_rank": np.int16,
+    "interaction": np.int8,
+    "file": np.int32,
+    "experiment": np.int32,
+}
+# Columns stored as codes into a list of names in the manifest
+CODED_COLUMNS = ("participant", "case", "session", "experiment")
+
+def _write_header(f, dtype, rows):
+    header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (np.lib.format.dtype_to_descr(np.dtype(dtype)), rows)
+    prefix = np.lib.format.magic(1, 0) + (HEADER_BYTES - 10).to_bytes(2, 'little')
+    f.seek(0)
+    f.write(prefix + header.ljust(HEADER_BYTES - 10 - 1).encode('latin1') + b'\n')
+
+def append_column(file_path, values, rows_before):
+    """
+    Appends values to a .npy column holding rows_before committed rows. Rows written after the last
+    committed count, e.g. by an interrupted ingest, are overwritten.
+    """
+    values = np.ascontiguousarray(values)
+    mode = 'r+b' if os.path.exists(file_path) else 'w+b'
+    with open(file_path, mode) as f:
+        f.seek(HEADER_BYTES + rows_before * values.dtype.itemsize)
+        f.write(values.tobytes())
+        f.truncate()
+        _write_header(f, values.dtype, rows_before + len(values))
+
+def load_cases(case_folder=DEFAULT_CASE_FOLDER):
+    """
+    Returns the order_array and the interaction type of every generated case, by case id.
+    """
+    cases = {}
+    for file_name in sorted(os.listdir(case_folder)):
+        if file_name.endswith('.json'):
+            with open(os.path.join(case_folder, file_name), 'r') as f:
+                case_data = json.load(f)
+            cases[file_name[:-5]] = {
+                "order": np.array([int(target) for target in case_data['order_array']], dtype=np.int64),
+                "interaction": INTERACTION_CODES[case_data['interaction']['interaction_type']],
+            }
+    return cases
+
+def read_chunks(file_path, chunk_rows=CHUNK_ROWS):
+    """
+    Yields the rows of a JSONL or CSV log as dicts of lists, chunk_rows rows at a time.
+    """
+    fields = ("participant", "case", "session", "time_ms", "button", "experiment")
+    with open(file_path, 'r', newline='') as f:
+        rows = (json.loads(line) for line in f if line.strip()) if file_path.lower().endswith('.jsonl') else csv.DictReader(f)
+        chunk = {field: [] for field in fields}
+        for row in rows:
+            for field in fields:
+                chunk[field].append(row.get(field))
+            if len(chunk["time_ms"]) >= chunk_rows:
+                yield chunk
+                chunk = {field: [] for field in fields}
+        if chunk["time_ms"]:
+            yield chunk
+
+def _to_number(values, dtype):
+    """
+    Converts a list of JSON or CSV values to floats, with NaN for the values that are not numbers.
+    """
+    array = np.array([value if value not in (None, '') else 'nan' for value in values], dtype=object)
+    try:
+        return array.astype(dtype)
+    except (TypeError, ValueError):
+        result = np.empty(len(array), dtype=dtype)
+        for index, value in enumerate(array):
+            try:
+                result[index] = float(value)
+            except (TypeError, ValueError):
+                result[index] = np.nan
+        return result
+
+class LogStore:
+    """
+    An append-only columnar store of interaction logs.
+
+    Args:
+        folder (str): The store folder.
+        case_folder (str): The folder of the generated case JSON files the logs are checked against.
+    """
+    def __init__(self, folder=DEFAULT_STORE_FOLDER, case_folder=DEFAULT_CASE_FOLDER):
+        self.folder = folder
+        self.case_folder = case_folder
+        self.manifest_path = os.path.join(folder, MANIFEST_NAME)
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"rows": 0, "files": {}, "versions": [], "retired_versions": []}
+        for column in CODED_COLUMNS:
+            self.manifest.setdefault(column, [])
+        self._codes = {column: {name: code for code, name in enumerate(self.manifest[column])} for column in CODED_COLUMNS}
+
+    @property
+    def rows(self):
+        return self.manifest["rows"]
+
+    def column_path(self, column):
+        return os.path.join(self.folder, f"{column}.npy")
+
+    def column(self, column):
+        """
+        Opens a column as a read-only memory map of the committed rows, retired rows included.
+        """
+        if self.rows == 0:
+            return np.zeros(0, dtype=COLUMNS[column])
+        return np.load(self.column_path(column), mmap_mode='r')[:self.rows]
+
+    def _encode(self, column, names):
+        """
+        Returns the codes of names, adding the new ones to the manifest.
+        """
+        unique, inverse = np.unique(np.asarray(names, dtype=str), return_inverse=True)
+        codes = self._codes[column]
+        for name in unique:
+            if name not in codes:
+                codes[name] = len(self.manifest[column])
+                self.manifest[column].append(str(name))
+        return np.array([codes[name] for name in unique], dtype=COLUMNS[column])[inverse]
+
+    def _save_manifest(self):
+        temporary_path = f"{self.manifest_path}.tmp"
+        with open(temporary_path, 'w') as f:
+            json.dump(self.manifest, f, indent=4)
+        os.replace(temporary_path, self.manifest_path)
+
+    def ingest(self, file_path, cases=None, chunk_rows=CHUNK_ROWS):
+        """
+        Streams one log file into the store, unless its content is already stored.
+
+        Args:
+            file_path (str): The JSONL or CSV log.
+            cases (dict, optional): The cases from load_cases, loaded from case_folder by default.
+            chunk_rows (int): The number of rows read and normalized at a time.
+
+        Returns:
+            dict: The "status" (ingested or unchanged) and the "rows" stored and "rejected".
+        """
+        key = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        entry = self.manifest["files"].get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return {"status": "unchanged", "rows": entry["rows"], "rejected": entry["rejected"]}
+        file_hash = content_hash(file_path)
+        if entry and entry["hash"] == file_hash:
+            entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            self._save_manifest()
+            return {"status": "unchanged", "rows": entry["rows"], "rejected": entry["rejected"]}
+
+        cases = load_cases(self.case_folder) if cases is None else cases
+        os.makedirs(self.folder, exist_ok=True)
+        version = len(self.manifest["versions"])
+        rows = self.rows
+        # Columns added after the store was created are filled for the existing rows
+        for column, dtype in COLUMNS.items():
+            if rows and not os.path.exists(self.column_path(column)):
+                fill = self._encode(column, [""])[0] if column in CODED_COLUMNS else 0
+                append_column(self.column_path(column), np.full(rows, fill, dtype=dtype), 0)
+        stored = rejected = 0
+        for chunk in read_chunks(file_path, chunk_rows):
+            columns = self._normalize(chunk, cases)
+            rejected += len(chunk["time_ms"]) - len(columns["time_ms"])
+            columns["file"] = np.full(len(columns["time_ms"]), version, dtype=COLUMNS["file"])
+            for column, values in columns.items():
+                append_column(self.column_path(column), values.astype(COLUMNS[column]), rows)
+            rows += len(columns["time_ms"])
+            stored += len(columns["time_ms"])
+
+        # The previous content of a changed file stays in the columns but is no longer live
+        if entry:
+            self.manifest["retired_versions"].append(entry["version"])
+        self.manifest["versions"].append(key)
+        self.manifest["files"][key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": file_hash, "version": version, "rows": stored, "rejected": rejected}
+        self.manifest["rows"] = rows
+        if rows:
+            self.build_index()
+        self._save_manifest()
+        return {"status": "ingested", "rows": stored, "rejected": rejected}
+
+    def _normalize(self, chunk, cases):
+        """
+        Checks a chunk against the cases and converts it to column arrays, dropping the rejected rows.
+        """
+        case_names = np.array([str(value) for value in chunk["case"]])
+        unique_cases, case_inverse = np.unique(case_names, return_inverse=True)
+        known = np.array([name in cases for name in unique_cases], dtype=bool)[case_inverse]
+        target_counts = np.array([len(cases[name]["order"]) if name in cases else 0 for name in unique_cases])[case_inverse]
+
+        time_ms = _to_number(chunk["time_ms"], np.float64)
+        button = _to_number(chunk["button"], np.float64)
+        valid = known & np.isfinite(time_ms) & (time_ms >= 0) & (button == np.round(button)) & (button >= 1) & (button <= target_counts)
+        valid &= np.array([value is not None for value in chunk["participant"]]) & np.array([value is not None for value in chunk["session"]])
+
+        case_names, case_inverse = case_names[valid], case_inverse[valid]
+        button = button[valid].astype(np.int64)
+        participants = np.array([str(value) for value in chunk["participant"]], dtype=str)[valid]
+        sessions = np.array([str(value) for value in chunk["session"]], dtype=str)[valid]
+
+        # Position of the button in the case's order_array, -1 when the button is not a target
+        target_rank = np.full(len(button), -1, dtype=np.int64)
+        interaction = np.zeros(len(button), dtype=np.int64)
+        for case_code, name in enumerate(unique_cases):
+            rows = case_inverse == case_code
+            if name not in cases or not rows.any():
+                continue
+            ranks = np.full(max(len(cases[name]["order"]), cases[name]["order"].max()) + 1, -1, dtype=np.int64)
+            ranks[cases[name]["order"]] = np.arange(len(cases[name]["order"]))
+            target_rank[rows] = ranks[button[rows]]
+            interaction[rows] = cases[name]["interaction"]
+
+        return {
+            "participant": self._encode("participant", participants),
+            "case": self._encode("case", case_names),
+            # A session id only has to be unique per participant
+            "session": self._encode("session", np.char.add(np.char.add(participants, "/"), sessions)),
+            "experiment": self._encode("experiment", np.array(["" if value is None else str(value) for value in chunk["experiment"]], dtype=str)[valid]),
+            "time_ms": time_ms[valid],
+            "button": button,
+            "target_rank": target_rank,
+            "interaction": interaction,
+        }
+
+    def live_mask(self):
+        """
+        Returns which committed rows belong to the current content of their file.
+        """
+        return ~np.isin(self.column("file"), self.manifest["retired_versions"])
+
+    def build_index(self):
+        """
+        Writes the participant/case index: index.npy orders the live rows by participant, case, session
+        and time, and groups.npy holds the participant, case, start and count of every run in that order.
+        """
+        rows = self.manifest["rows"]
+        participant, case, session = (np.load(self.column_path(column), mmap_mode='r')[:rows] for column in ("participant", "case", "session"))
+        time_ms = np.load(self.column_path("time_ms"), mmap_mode='r')[:rows]
+        live = np.flatnonzero(~np.isin(np.load(self.column_path("file"), mmap_mode='r')[:rows], self.manifest["retired_versions"]))
+        order = live[np.lexsort((time_ms[live], session[live], case[live], participant[live]))]
+        keys = np.stack([participant[order], case[order]], axis=1)
+        starts = np.flatnonzero(np.concatenate([[True], np.any(keys[1:] != keys[:-1], axis=1)])) if len(order) else np.zeros(0, dtype=np.int64)
+        groups = np.zeros(len(starts), dtype=[("participant", np.int32), ("case", np.int32), ("start", np.int64), ("count", np.int64)])
+        groups["participant"], groups["case"] = keys[starts, 0], keys[starts, 1]
+        groups["start"] = starts
+        groups["count"] = np.diff(np.concatenate([starts, [len(order)]]))
+        np.save(os.path.join(self.folder, "index.npy"), order.astype(np.int64))
+        np.save(os.path.join(self.folder, "groups.npy"), groups)
+
+    def select(self, participant=None, case=None):
+        """
+        Returns the live row numbers of a participant and/or a case, ordered by participant, case, session and time.
+        """
+        if self.rows == 0:
+            return np.zeros(0, dtype=np.int64)
+        order = np.load(os.path.join(self.folder, "index.npy"), mmap_mode='r')
+        groups = np.load(os.path.join(self.folder, "groups.npy"))
+        wanted = np.ones(len(groups), dtype=bool)
+        if participant is not None:
+            wanted &= groups["participant"] == self._codes["participant"].get(str(participant), -1)
+        if case is not None:
+            wanted &= groups["case"] == self._codes["case"].get(str(case), -1)
+        starts, counts = groups["start"][wanted], groups["count"][wanted]
+        ends = np.cumsum(counts)
+        positions = np.repeat(starts - (ends - counts), counts) + np.arange(int(counts.sum()))
+        return np.asarray(order[positions])
+
+    def events(self, case):
+        """
+        Returns the live interactions of a case in the form scoreboard_replay.replay takes.
+        """
+        rows = self.select(case=case)
+        return events_from_arrays(self.column("session")[rows], self.column("time_ms")[rows], self.column("button")[rows])
+
+    def summary(self):
+        live = self.live_mask()
+        case_rows = np.bincount(self.column("case")[live], minlength=len(self.manifest["case"]))
+        return {
+            "rows": int(live.sum()),
+            "retired_rows": int(self.rows - live.sum()),
+            "files": len(self.manifest["files"]),
+            "participants": len(np.unique(self.column("participant")[live])),
+            "sessions": len(np.unique(self.column("session")[live])),
+            "cases": {name: int(count) for name, count in zip(self.manifest["case"], case_rows) if count},
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest participant interaction logs into the columnar log store.")
+    parser.add_argument("logs", nargs="*", help="JSONL or CSV interaction logs")
+    parser.add_argument("--store", default=DEFAULT_STORE_FOLDER, help=f"Store folder (default: {DEFAULT_STORE_FOLDER})")
+    parser.add_argument("--case-folder", default=DEFAULT_CASE_FOLDER, help=f"Folder of the generated case JSON files (default: {DEFAULT_CASE_FOLDER})")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help=f"Rows read at a time (default: {CHUNK_ROWS})")
+    parser.add_argument("--summary", action="store_true", help="Print what the store holds")
+    args = parser.parse_args()
+
+    store = LogStore(args.store, args.case_folder)
+    cases = load_cases(args.case_folder) if args.logs else None
+    for log in args.logs:
+        result = store.ingest(log, cases, args.chunk_rows)
+        print(f"{log}: {result['status']}, {result['rows']} row(s), {result['rejected']} rejected")
+    if args.summary or not args.logs:
+        print(json.dumps(store.summary(), indent=4))
+
+if __name__ == "__main__":
+    main()
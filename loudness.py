@@ -0,0 +1,279 @@
+"""
+loudness.py
+
+This file contains the loudness normalization stage for stimulus folders. Each file is
+measured block by block with vectorized NumPy: its sample peak, its RMS level, and a
+K-weighted loudness approximating ITU-R BS.1770 (the K-weighting filter is applied to
+the power spectrum of 400 ms gating blocks, with the absolute and relative gates). A
+gain is applied to reach the target in the chosen mode, limited so the peak stays below
+a ceiling, and the file is written back. The applied gains are recorded in a sidecar
+manifest in the output folder together with the content of the source and output files,
+so files that were already normalized to the same target, and whose source has not
+changed since, are skipped on the next run. Files are processed in parallel in a process pool.
+
+Usage:
+    python loudness.py --mode lufs --target -23
+    python loudness.py Files/Audio/Original --mode peak --target -1 --dry-run
+"""
+
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import soundfile as sf
+from default_configs import default_settings
+from waveform import content_hash
+
+MANIFEST_NAME = '.loudness-manifest.json'
+DEFAULT_TARGETS = {"peak": -1.0, "rms": -20.0, "lufs": -23.0}
+# Highest sample peak allowed after the gain, in dBFS
+DEFAULT_CEILING = -1.0
+# BS.1770 gating block length, absolute gate and relative gate
+GATE_BLOCK_TIME = 0.4
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+# Number of gating blocks analyzed in one vectorized pass
+BLOCKS_PER_READ = 64
+# Files whose gain would change by less than this are left untouched, in dB
+MIN_GAIN_CHANGE = 0.05
+AUDIO_EXTENSIONS = ('.wav',)
+
+def to_db(value):
+    return 10 * np.log10(value) if value > 0 else -np.inf
+
+def k_weighting_response(frequencies, samplerate):
+    """
+    Returns the squared magnitude response of the BS.1770 K-weighting filter
+    (high shelf followed by the RLB high pass) at the given frequencies.
+    """
+    def biquad_power(b, a):
+        z = np.exp(-1j * 2 * np.pi * frequencies / samplerate)
+        return np.abs((b[0] + b[1] * z + b[2] * z ** 2) / (a[0] + a[1] * z + a[2] * z ** 2)) ** 2
+
+    # Coefficients derived for any sample rate as in Brecht De Man's formulation, which
+    # reproduces the 48 kHz coefficients of the standard
+    # High shelf: +4 dB above about 1.7 kHz, modelling the acoustic effect of the head
+    gain, q, center = 3.99984385397, 0.7071752369554193, 1681.9744509555319
+    k = np.tan(np.pi * center / samplerate)
+    high_gain = 10 ** (gain / 20)
+    band_gain = high_gain ** 0.4996667741545416
+    shelf = biquad_power(
+        [high_gain + band_gain * k / q + k * k, 2 * (k * k - high_gain), high_gain - band_gain * k / q + k * k],
+        [1 + k / q + k * k, 2 * (k * k - 1), 1 - k / q + k * k])
+
+    # High pass at about 38 Hz (revised low-frequency B-curve)
+    q, center = 0.5003270373253953, 38.13547087613982
+    k = np.tan(np.pi * center / samplerate)
+    high_pass = biquad_power([1.0, -2.0, 1.0], [1.0, 2 * (k * k - 1) / (1 + k / q + k * k), (1 - k / q + k * k) / (1 + k / q + k * k)])
+    return shelf * high_pass
+
+def weighted_mean_square(blocks, samplerate):
+    """
+    Returns the K-weighted mean square of every block and channel of a (blocks, frames, channels) array,
+    using Parseval's theorem on the real FFT of each block.
+    """
+    frames = blocks.shape[1]
+    spectrum = np.fft.rfft(blocks, axis=1)
+    # The bins between DC and Nyquist stand for a positive and a negative frequency
+    bin_weights = np.full(spectrum.shape[1], 2.0)
+    bin_weights[0] = 1.0
+    if frames % 2 == 0:
+        bin_weights[-1] = 1.0
+    response = k_weighting_response(np.fft.rfftfreq(frames, 1 / samplerate), samplerate) * bin_weights
+    return np.einsum('bfc,f->bc', np.abs(spectrum) ** 2, response) / frames ** 2
+
+def measure(file_path):
+    """
+    Measures an audio file block by block.
+
+    Returns:
+        dict: The sample "peak" (dBFS), the "rms" level (dBFS) and the gated K-weighted "lufs".
+    """
+    info = sf.info(file_path)
+    block_frames = max(1, int(GATE_BLOCK_TIME * info.samplerate))
+    peak = 0.0
+    sum_squares = 0.0
+    frame_count = 0
+    block_powers = []
+    for data in sf.blocks(file_path, blocksize=block_frames * BLOCKS_PER_READ, dtype='float64', always_2d=True):
+        peak = max(peak, float(np.abs(data).max()))
+        sum_squares += float(np.square(data).sum())
+        frame_count += data.shape[0]
+        whole = data.shape[0] // block_frames
+        if whole:
+            blocks = data[:whole * block_frames].reshape(whole, block_frames, data.shape[1])
+            block_powers.append(weighted_mean_square(blocks, info.samplerate).sum(axis=1))
+        if whole == 0 and not block_powers:
+            # Stimuli shorter than one gating block are measured as a single block
+            remainder = data[whole * block_frames:]
+            block_powers.append(weighted_mean_square(remainder[None], info.samplerate).sum(axis=1))
+    if frame_count == 0:
+        return {"peak": -np.inf, "rms": -np.inf, "lufs": -np.inf}
+
+    powers = np.concatenate(block_powers)
+    loudness = -0.691 + 10 * np.log10(np.maximum(powers, 1e-20))
+    gated = powers[loudness > ABSOLUTE_GATE]
+    lufs = -np.inf
+    if gated.size:
+        relative_gate = -0.691 + 10 * np.log10(gated.mean()) + RELATIVE_GATE
+        gated = powers[(loudness > ABSOLUTE_GATE) & (loudness > relative_gate)]
+        lufs = -0.691 + 10 * np.log10(gated.mean())
+    return {
+        "peak": 20 * np.log10(peak) if peak > 0 else -np.inf,
+        "rms": to_db(sum_squares / (frame_count * info.channels)),
+        "lufs": float(lufs)
+    }
+
+def normalization_gain(measurement, mode, target, ceiling=DEFAULT_CEILING):
+    """
+    Returns the gain in dB reaching the target, and whether it was reduced to keep the peak below the ceiling.
+    """
+    if not np.isfinite(measurement[mode]):
+        return 0.0, False
+    gain = target - measurement[mode]
+    if measurement["peak"] + gain > ceiling:
+        return ceiling - measurement["peak"], True
+    return gain, False
+
+def apply_gain(input_path, output_path, gain_db):
+    """
+    Writes the input file scaled by a gain in dB, streaming it block by block in the same format.
+    """
+    info = sf.info(input_path)
+    scale = 10 ** (gain_db / 20)
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    temporary_path = f"{output_path}.{os.getpid()}.tmp"
+    with sf.SoundFile(temporary_path, 'w', samplerate=info.samplerate, channels=info.channels, subtype=info.subtype, format=info.format) as output:
+        for data in sf.blocks(input_path, blocksize=1 << 16, dtype='float64', always_2d=True):
+            output.write(np.clip(data * scale, -1.0, 1.0))
+    os.replace(temporary_path, output_path)
+
+def normalize_file(input_path, output_path, mode, target, ceiling=DEFAULT_CEILING, dry_run=False):
+    """
+    Measures a file and writes it normalized to the target. Runs in the worker processes.
+
+    Returns:
+        dict: The manifest record of the file.
+    """
+    # Stamp of the source taken before it is read, so an edit during the run is not recorded as normalized
+    source = file_stamp(input_path)
+    measurement = measure(input_path)
+    gain, limited = normalization_gain(measurement, mode, target, ceiling)
+    applied = 0.0
+    if not dry_run and (abs(gain) >= MIN_GAIN_CHANGE or input_path != output_path):
+        apply_gain(input_path, output_path, gain if abs(gain) >= MIN_GAIN_CHANGE else 0.0)
+        applied = gain if abs(gain) >= MIN_GAIN_CHANGE else 0.0
+    record = {
+        "mode": mode,
+        "target": target,
+        "ceiling": ceiling,
+        "measured": {key: round(value, 3) if np.isfinite(value) else None for key, value in measurement.items()},
+        "gain_db": round(float(gain), 3),
+        "applied_db": round(float(applied), 3),
+        "limited": limited
+    }
+    if not dry_run:
+        record.update(file_stamp(output_path))
+        # A file normalized in place is its own source
+        record["source"] = file_stamp(output_path) if input_path == output_path else source
+    return record
+
+def file_stamp(file_path):
+    """
+    Returns the content hash, size and mtime recorded for a file in the manifest.
+    """
+    stat = os.stat(file_path)
+    return {"hash": content_hash(file_path), "size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+def matches_stamp(stamp, file_path):
+    """
+    Returns whether a file still has the content recorded in a stamp, hashing it only when its size or mtime changed.
+    """
+    if not stamp or 'hash' not in stamp or not os.path.isfile(file_path):
+        return False
+    stat = os.stat(file_path)
+    if stamp['size'] != stat.st_size:
+        return False
+    return stamp['mtime'] == stat.st_mtime_ns or stamp['hash'] == content_hash(file_path)
+
+def is_up_to_date(record, source_path, output_path, mode, target, ceiling):
+    """
+    Returns whether an output file is still the one written by a run with the same settings
+    from the current content of its source file.
+    """
+    if not record or (record['mode'], record['target'], record['ceiling']) != (mode, target, ceiling):
+        return False
+    # Records written before sources were stamped are only trusted for files normalized in place
+    source = record.get('source', record if source_path == output_path else None)
+    return matches_stamp(record, output_path) and matches_stamp(source, source_path)
+
+def normalize_folder(folder, mode="lufs", target=None, ceiling=DEFAULT_CEILING, output_folder=None, workers=None, dry_run=False, force=False):
+    """
+    Normalizes every audio file of a folder in a process pool.
+
+    Args:
+        folder (str): The stimulus folder.
+        mode (str): "peak", "rms" or "lufs".
+        target (float, optional): The target level in dBFS or LUFS, DEFAULT_TARGETS[mode] by default.
+        ceiling (float): The highest sample peak allowed after the gain, in dBFS.
+        output_folder (str, optional): Where the normalized files are written, the folder itself by default.
+        workers (int, optional): The number of worker processes, the CPU count by default.
+        dry_run (bool): Only measure and report the gains.
+        force (bool): Normalize files even when the manifest says they are up to date.
+
+    Returns:
+        dict: The manifest records of the processed files, and the names of the skipped files.
+    """
+    target = DEFAULT_TARGETS[mode] if target is None else target
+    output_folder = output_folder or folder
+    manifest_path = os.path.join(output_folder, MANIFEST_NAME)
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    jobs, skipped = [], []
+    for name in sorted(f for f in os.listdir(folder) if f.lower().endswith(AUDIO_EXTENSIONS)):
+        input_path, output_path = os.path.join(folder, name), os.path.join(output_folder, name)
+        if not force and is_up_to_date(manifest.get(name), input_path, output_path, mode, target, ceiling):
+            skipped.append(name)
+        else:
+            jobs.append((name, input_path, output_path))
+
+    processed = {}
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {name: executor.submit(normalize_file, input_path, output_path, mode, target, ceiling, dry_run) for name, input_path, output_path in jobs}
+            processed = {name: future.result() for name, future in futures.items()}
+
+    if not dry_run:
+        manifest.update(processed)
+        os.makedirs(output_folder, exist_ok=True)
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=4)
+    return {"processed": processed, "skipped": skipped}
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalize the level of every audio stimulus in a folder.")
+    parser.add_argument("folder", nargs="?", default=default_settings['FolderVariables']['OriginalAudioFolder'], help="Stimulus folder (default: OriginalAudioFolder)")
+    parser.add_argument("--mode", choices=sorted(DEFAULT_TARGETS), default="lufs", help="Level measured against the target (default: lufs)")
+    parser.add_argument("--target", type=float, default=None, help="Target level in dBFS, or LUFS for the lufs mode")
+    parser.add_argument("--ceiling", type=float, default=DEFAULT_CEILING, help=f"Highest sample peak after the gain in dBFS (default: {DEFAULT_CEILING})")
+    parser.add_argument("--output", default=None, help="Write the normalized files to this folder instead of in place")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--dry-run", action="store_true", help="Only measure and print the gains")
+    parser.add_argument("--force", action="store_true", help="Normalize files the manifest marks as up to date")
+    args = parser.parse_args()
+
+    result = normalize_folder(args.folder, args.mode, args.target, args.ceiling, args.output, args.workers, args.dry_run, args.force)
+    print(f"{'File':<36}{'Peak':>8}{'RMS':>8}{'LUFS':>8}{'Gain dB':>9}")
+    for name, record in result["processed"].items():
+        measured = record["measured"]
+        print(f"{name:<36}{str(measured['peak']):>8}{str(measured['rms']):>8}{str(measured['lufs']):>8}{record['gain_db']:>9}" + ("  (limited by the ceiling)" if record["limited"] else ""))
+    if result["skipped"]:
+        print(f"Up to date: {len(result['skipped'])} file(s)")
+
+if __name__ == "__main__":
+    main()
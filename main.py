@@ -12,6 +12,8 @@ import tkinter as tk
 from tkinter import ttk
 from settings_ui import SettingsUI
 from experiment_ui import ExperimentUI
+import ui_trace
+import action_profiler
 
 class MainApplication(tk.Tk):
     """
@@ -61,7 +63,7 @@ class MainApplication(tk.Tk):
         selected_tab = event.widget.select()
 
         # If user tries to change the tab while a case window is open, prevent the change
-        if self.current_tab == self.tab_control.tabs()[1] and self.experiment_tab.case_window is not None:
+        if self.current_tab == self.tab_control.tabs()[1] and self.experiment_tab.is_case_window_open():
             event.widget.select(self.current_tab)
             return
         # If the selected tab is the experiment tab, refresh its content
@@ -73,7 +75,15 @@ class MainApplication(tk.Tk):
 # Main.py should be the entry point of the application. 
 # It should create an instance of the MainApplication class and run the main application loop.
 if __name__ == "__main__":
+    # Button commands are profiled when TOUCHTACT_PROFILE or the profile_actions setting is on
+    action_profiler.install()
+    # Time the UI when TOUCHTACT_UI_TRACE is set (before any widget binds the traced methods)
+    tracer = ui_trace.install_from_env({MainApplication: ["create_tabs", "handle_tab_change"]})
     # Create the main application
     app = MainApplication()
+    if tracer:
+        tracer.start(app)
     # Run the main application
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
+    if tracer:
+        print(f"UI trace written to {tracer.save()}")
\ No newline at end of file
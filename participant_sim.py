@@ -0,0 +1,257 @@
+"""
+participant_sim.py
+
+This file contains the Monte Carlo participant simulator, which helps choosing timer.max_time,
+interaction_delay and score.penalty_percentage before a study is fielded. Simulated
+participants play a generated case JSON: each interaction comes a reaction time after the
+target button activates, and is a mistake with the participant's error rate, in which case
+a random other button is hit. The games of all participants are played one step at a time
+for every participant at once, and the resulting interaction streams are scored with
+scoreboard_replay, so the game modes, the timer and the scoring follow exactly the rules
+used for real logs.
+
+Participant model (DEFAULT_PARTICIPANTS):
+    - Reaction times are log-normal. Every participant has their own median, spread around
+      reaction_time_median by participant_sigma, and every interaction varies around it by
+      reaction_time_sigma.
+    - Error rates follow a beta distribution with mean error_rate and concentration
+      error_concentration (0 gives every participant exactly error_rate).
+    - interaction_delay[n - 1] is the activation delay of button n after the previous
+      interaction, and the participant reacts once the target is active.
+    - In swipe_through cases every button swiped through is one interaction, timed by the
+      same reaction-time model, and a mistake swipes through another button. The path of
+      the finger is not modelled, so buttons lying between two targets are never crossed
+      by accident. Swipe cases have no interaction delays (case_ui requires 0), so
+      candidate delays are not swept for them.
+
+Games still running after max_steps interactions, e.g. restart games without a timer and a
+high error rate, are cut off. Their outcome is unknown, so they are counted as "cut_off"
+and left out of the completion rate, the errors and the percentiles.
+
+The sweep runs every combination of the candidate values. The same random draws are used for
+every combination, so the differences between combinations come from the settings alone.
+
+Usage:
+    python participant_sim.py C1 --participants 5000
+    python participant_sim.py C1 --max-time 15000 20000 30000 --penalty 5 10 --delay 0 250
+"""
+
+import os
+import csv
+import copy
+import json
+import argparse
+import itertools
+import numpy as np
+from default_configs import default_settings
+from scoreboard_replay import scoring_rules, replay, displayed
+
+DEFAULT_PARTICIPANTS = {
+    "reaction_time_median": 800.0,
+    "reaction_time_sigma": 0.3,
+    "participant_sigma": 0.25,
+    "error_rate": 0.05,
+    "error_concentration": 20.0,
+}
+DEFAULT_PARTICIPANT_COUNT = 2000
+# Games still running after this many interactions are cut off, see --max-steps
+MAX_STEPS = 200
+PERCENTILES = (10, 50, 90)
+
+def draw_participants(count, participants=DEFAULT_PARTICIPANTS, max_steps=MAX_STEPS, seed=None):
+    """
+    Draws the random parts of the games of simulated participants.
+
+    Args:
+        count (int): The number of participants.
+        participants (dict): The participant model, see DEFAULT_PARTICIPANTS.
+        max_steps (int): The most interactions a game can have.
+        seed (int): The random seed.
+
+    Returns:
+        dict: The (count, max_steps) "reaction_time" in ms, "mistake" flags and "wrong_pick" (0 to 1, choosing
+        the button hit by a mistake).
+    """
+    rng = np.random.default_rng(seed)
+    participant_median = participants['reaction_time_median'] * np.exp(participants['participant_sigma'] * rng.standard_normal(count))
+    reaction_time = participant_median[:, None] * np.exp(participants['reaction_time_sigma'] * rng.standard_normal((count, max_steps)))
+
+    mean, concentration = participants['error_rate'], participants['error_concentration']
+    if concentration > 0 and 0 < mean < 1:
+        error_rate = rng.beta(mean * concentration, (1 - mean) * concentration, count)
+    else:
+        error_rate = np.full(count, float(mean))
+    mistake = rng.random((count, max_steps)) < error_rate[:, None]
+    return {"reaction_time": reaction_time, "mistake": mistake, "wrong_pick": rng.random((count, max_steps))}
+
+def play(case_data, draws, horizon=None):
+    """
+    Plays the games of all participants, one step at a time for every participant at once.
+
+    Args:
+        case_data (dict): The case JSON, whose order_array, interaction_delay and game mode are used.
+        draws (dict): The random parts of the games, from draw_participants.
+        horizon (float): Time in ms after which games are not followed further, e.g. the longest max_time.
+
+    Returns:
+        dict: The interaction events in the form scoreboard_replay.replay takes, one session per participant,
+        with the "truncated" games still running after the last step and the "end_time" of every game.
+    """
+    rules = scoring_rules(case_data)
+    order = rules['order']
+    target_count = len(order)
+    button_count = max(len(case_data['interaction_delay']), int(order.max()))
+    delay = np.zeros(button_count + 1)
+    delay[1:len(case_data['interaction_delay']) + 1] = [float(value) for value in case_data['interaction_delay']]
+
+    count, max_steps = draws['reaction_time'].shape
+    progress = np.zeros(count, dtype=np.int64)
+    now = np.zeros(count)
+    time = np.zeros((count, max_steps))
+    button = np.zeros((count, max_steps), dtype=np.int64)
+    played = np.zeros((count, max_steps), dtype=bool)
+    playing = np.ones(count, dtype=bool)
+    for step in range(max_steps):
+        if not playing.any():
+            break
+        target = order[np.minimum(progress, target_count - 1)]
+        now = now + delay[target] + draws['reaction_time'][:, step]
+        mistake = draws['mistake'][:, step]
+        # A mistake hits one of the other buttons, chosen uniformly
+        wrong = (draws['wrong_pick'][:, step] * (button_count - 1)).astype(np.int64) + 1
+        wrong += wrong >= target
+
+        time[:, step] = now
+        button[:, step] = np.where(mistake, wrong, target)
+        played[:, step] = playing
+        progress = np.where(mistake, 0 if rules['restart'] else progress, progress + 1)
+        playing &= progress < target_count
+        if horizon is not None:
+            playing &= now <= horizon
+
+    counts = played.sum(axis=1)
+    return {
+        "sessions": np.arange(count),
+        "offsets": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+        "time": time[played],
+        "button": button[played],
+        "truncated": playing,
+        "end_time": np.where(counts > 0, time[np.arange(count), np.maximum(counts - 1, 0)], 0.0),
+    }
+
+def with_settings(case_data, max_time=None, delay=None, penalty=None):
+    """
+    Returns a copy of a case JSON with the given timer.max_time, interaction delay for every button
+    and score.penalty_percentage. None keeps the case's own setting and a max_time of 0 removes the timer.
+    """
+    case_data = copy.deepcopy(case_data)
+    if max_time is not None:
+        if max_time > 0:
+            case_data.setdefault('timer', {"direction": "up", "format": "s"})['max_time'] = int(max_time)
+        else:
+            case_data.pop('timer', None)
+    if delay is not None:
+        case_data['interaction_delay'] = [int(delay)] * len(case_data['interaction_delay'])
+    if penalty is not None and 'score' in case_data:
+        case_data['score']['penalty_percentage'] = int(penalty)
+    return case_data
+
+def summarize(events, rules):
+    """
+    Scores the played games with the rules and reduces them to completion-time and score statistics.
+    Games cut off before completing or running out of time are counted, and left out of the statistics.
+    """
+    result = replay(events, rules)
+    cut_off = events['truncated']
+    if rules['max_time'] is not None:
+        # A game whose last interaction came after max_time has timed out, whenever it was cut off
+        cut_off = cut_off & (events['end_time'] <= rules['max_time'])
+    decided = ~cut_off
+    completed = result['completed'][decided]
+    times = result['completion_time'][result['completed']]
+    scores = displayed(result['final_score'][decided], rules)
+    summary = {
+        "cut_off": int(cut_off.sum()),
+        "completion_rate": float(completed.mean()) if len(completed) else float('nan'),
+        "mean_errors": float(result['errors'][decided].mean()) if len(completed) else float('nan'),
+        "mean_score": float(scores.mean()) if len(scores) else float('nan'),
+    }
+    for percentile in PERCENTILES:
+        summary[f"time_p{percentile}"] = float(np.percentile(times, percentile)) if len(times) else float('nan')
+    for percentile in PERCENTILES:
+        summary[f"score_p{percentile}"] = float(np.percentile(scores, percentile)) if len(scores) else float('nan')
+    return summary
+
+def sweep(case_data, draws, max_times=(None,), delays=(None,), penalties=(None,)):
+    """
+    Simulates every combination of the candidate settings with the same participants.
+
+    Returns:
+        list[dict]: One row per combination, with the settings used and the statistics from summarize.
+    """
+    scored = 'score' in case_data
+    if not scored:
+        # Without a scoreboard the penalty changes nothing
+        penalties = (None,)
+    if 'swipe' in case_data['interaction']['interaction_type']:
+        # Swipe cases must keep all interaction delays at 0
+        delays = (None,)
+    rows = []
+    for delay in delays:
+        delayed = with_settings(case_data, delay=delay)
+        # The games only depend on the delays, so they are played once and scored for every timer and penalty
+        limits = [with_settings(delayed, max_time=max_time).get('timer', {}).get('max_time') for max_time in max_times]
+        events = play(delayed, draws, None if None in limits else max(limits))
+        for max_time, penalty in itertools.product(max_times, penalties):
+            candidate = with_settings(delayed, max_time=max_time, penalty=penalty)
+            rules = scoring_rules(candidate)
+            row = {
+                "max_time": candidate.get('timer', {}).get('max_time'),
+                "interaction_delay": delay if delay is not None else "case",
+                "penalty_percentage": candidate.get('score', {}).get('penalty_percentage'),
+            }
+            row.update(summarize(events, rules))
+            if not scored:
+                row.update({key: float('nan') for key in row if key.startswith(('mean_score', 'score_'))})
+            rows.append(row)
+    return rows
+
+def print_rows(rows):
+    print(f"{'max_time':>9} {'delay':>6} {'penalty':>7} {'cut off':>7} {'complete':>8} {'errors':>6} "
+          + " ".join(f"{f'time p{p}':>10}" for p in PERCENTILES) + " " + " ".join(f"{f'score p{p}':>9}" for p in PERCENTILES))
+    for row in rows:
+        print(f"{str(row['max_time'] or '-'):>9} {str(row['interaction_delay']):>6} {str(row['penalty_percentage'] if row['penalty_percentage'] is not None else '-'):>7} {row['cut_off']:>7} "
+              f"{row['completion_rate']:>8.1%} {row['mean_errors']:>6.2f} "
+              + " ".join(f"{row[f'time_p{p}']:>10.0f}" for p in PERCENTILES) + " " + " ".join(f"{row[f'score_p{p}']:>9.1f}" for p in PERCENTILES))
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate participants playing a case to tune its timer, interaction delays and penalty.")
+    parser.add_argument("case_id", help="Case to simulate, e.g. C1 for Files/Case/C1.json")
+    parser.add_argument("--case-folder", default=default_settings['FolderVariables']['CaseFolder'], help="Folder of the case JSON files")
+    parser.add_argument("--participants", type=int, default=DEFAULT_PARTICIPANT_COUNT, help=f"Number of simulated participants (default: {DEFAULT_PARTICIPANT_COUNT})")
+    for key, value in DEFAULT_PARTICIPANTS.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=float, default=value, help=f"Participant model {key} (default: {value})")
+    parser.add_argument("--max-time", type=int, nargs="+", default=[None], help="Candidate timer.max_time values in ms, 0 for no timer (default: the case's)")
+    parser.add_argument("--delay", type=int, nargs="+", default=[None], help="Candidate interaction delays in ms, applied to every button (default: the case's)")
+    parser.add_argument("--penalty", type=int, nargs="+", default=[None], help="Candidate score.penalty_percentage values (default: the case's)")
+    parser.add_argument("--max-steps", type=int, default=MAX_STEPS, help=f"Interactions after which a game is cut off (default: {MAX_STEPS})")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+    parser.add_argument("--output", default=None, help="Write the sweep results to this CSV file")
+    args = parser.parse_args()
+
+    with open(os.path.join(args.case_folder, f"{args.case_id}.json"), 'r') as f:
+        case_data = json.load(f)
+    participants = {key: getattr(args, key) for key in DEFAULT_PARTICIPANTS}
+    draws = draw_participants(args.participants, participants, args.max_steps, seed=args.seed)
+    rows = sweep(case_data, draws, args.max_time, args.delay, args.penalty)
+
+    print(f"{args.case_id}: {case_data['interaction']['interaction_type']} & {case_data['interaction']['game_mode']}, {args.participants} simulated participants")
+    print_rows(rows)
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+payload_report.py
+
+This file contains the payload report, which adds up how many bytes a participant's
+phone downloads for an experiment: the experiment JSON, every case, and every linked
+layout, audio and haptic file, counting each unique file once. JSON and AHAP files are
+counted at their gzip size, as served by GitHub Pages. The load time is estimated for
+configurable bandwidth/RTT profiles, and the report fails when a budget is exceeded.
+File sizes are kept in a size index on disk, so files are only measured again when
+they change.
+
+Usage:
+    python payload_report.py SZE
+    python payload_report.py --all --max-bytes 2000000 --max-first-case 3 --budget-profile 3g
+"""
+
+import os
+import gzip
+import json
+import argparse
+from default_configs import default_settings, SIZE_INDEX_PATH
+from experiment_files import load_fetch_plan
+
+# Network profiles as (downlink kilobits per second, round trip time in milliseconds)
+DEFAULT_PROFILES = {
+    "slow-3g": (400, 400),
+    "3g": (1600, 300),
+    "4g": (9000, 170),
+    "wifi": (30000, 40),
+}
+# Round trips spent opening the HTTPS connection (TCP and TLS handshakes)
+CONNECTION_ROUND_TRIPS = 2
+# Files transferred with gzip content encoding
+COMPRESSED_EXTENSIONS = ('.json', '.ahap')
+
+class SizeIndex:
+    """
+    A persistent index of file sizes and gzip transfer sizes, validated by mtime and size.
+
+    Args:
+        index_path (str): The JSON file holding the index.
+    """
+    def __init__(self, index_path=SIZE_INDEX_PATH):
+        self.index_path = index_path
+        self.changed = False
+        try:
+            with open(index_path, 'r') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, path):
+        """
+        Returns {"size", "transfer_size"} of a file, or None if it does not exist.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        entry = self.entries.get(path)
+        if entry is None or entry['mtime'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+            transfer_size = stat.st_size
+            if path.lower().endswith(COMPRESSED_EXTENSIONS):
+                with open(path, 'rb') as f:
+                    transfer_size = len(gzip.compress(f.read(), mtime=0))
+            entry = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "transfer_size": transfer_size}
+            self.entries[path] = entry
+            self.changed = True
+        return entry
+
+    def save(self):
+        if self.changed:
+            os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+            with open(self.index_path, 'w') as f:
+                json.dump(self.entries, f)
+            self.changed = False
+
+def estimate_seconds(transfer_sizes, bandwidth_kbps, rtt_ms):
+    """
+    Estimates the time to download files one after the other over a single connection.
+    Each request costs one round trip plus its transfer time, after the connection handshakes.
+    """
+    rtt = rtt_ms / 1000
+    transfer_time = sum(transfer_sizes) * 8 / (bandwidth_kbps * 1000)
+    return CONNECTION_ROUND_TRIPS * rtt + len(transfer_sizes) * rtt + transfer_time
+
+def build_report(experiment_id, size_index, profiles=DEFAULT_PROFILES, experiment_folder=None, case_folder=None):
+    """
+    Builds the payload report of an experiment.
+
+    Returns:
+        dict: The byte totals by kind, the missing files, and the first case and total
+              load time estimates for each profile.
+    """
+    plan = load_fetch_plan(experiment_id, experiment_folder, case_folder)
+    steps = []
+    missing = []
+    for step in plan:
+        entry = size_index.get(step['path'])
+        if entry is None:
+            missing.append(step['path'])
+            continue
+        steps.append(dict(step, **entry))
+
+    by_kind = {}
+    for step in steps:
+        totals = by_kind.setdefault(step['kind'], {"files": 0, "bytes": 0, "transfer_bytes": 0})
+        totals["files"] += 1
+        totals["bytes"] += step['size']
+        totals["transfer_bytes"] += step['transfer_size']
+
+    # The first case is ready once the experiment and everything the first case needs are downloaded
+    first_case_id = next((step['case_id'] for step in plan if step['kind'] == 'case'), None)
+    first_case_sizes = [step['transfer_size'] for step in steps if step['case_id'] in (None, first_case_id)]
+    all_sizes = [step['transfer_size'] for step in steps]
+
+    return {
+        "experiment_id": experiment_id,
+        "files": len(steps),
+        "bytes": sum(step['size'] for step in steps),
+        "transfer_bytes": sum(all_sizes),
+        "first_case_transfer_bytes": sum(first_case_sizes),
+        "by_kind": by_kind,
+        "missing": missing,
+        "estimates": {
+            name: {
+                "first_case_s": round(estimate_seconds(first_case_sizes, bandwidth, rtt), 3),
+                "total_s": round(estimate_seconds(all_sizes, bandwidth, rtt), 3)
+            } for name, (bandwidth, rtt) in profiles.items()
+        }
+    }
+
+def check_budget(report, max_bytes=None, max_first_case=None, max_total=None, budget_profile='3g'):
+    """
+    Returns the list of budget violations of a report.
+    """
+    violations = []
+    if max_bytes is not None and report['transfer_bytes'] > max_bytes:
+        violations.append(f"transfer size {report['transfer_bytes']} B exceeds {max_bytes} B")
+    estimate = report['estimates'][budget_profile]
+    if max_first_case is not None and estimate['first_case_s'] > max_first_case:
+        violations.append(f"time to first case on {budget_profile} {estimate['first_case_s']} s exceeds {max_first_case} s")
+    if max_total is not None and estimate['total_s'] > max_total:
+        violations.append(f"total load time on {budget_profile} {estimate['total_s']} s exceeds {max_total} s")
+    return violations
+
+def print_report(report):
+    print(f"Experiment {report['experiment_id']}: {report['files']} files, {report['bytes']} B on disk, {report['transfer_bytes']} B transferred")
+    print(f"{'Kind':<12}{'Files':>8}{'Bytes':>12}{'Transfer':>12}")
+    for kind, totals in report['by_kind'].items():
+        print(f"{kind:<12}{totals['files']:>8}{totals['bytes']:>12}{totals['transfer_bytes']:>12}")
+    print(f"{'Profile':<12}{'First case':>12}{'Total':>12}")
+    for name, estimate in report['estimates'].items():
+        print(f"{name:<12}{estimate['first_case_s']:>11}s{estimate['total_s']:>11}s")
+    for path in report['missing']:
+        print(f"Missing: {path}")
+
+def parse_profile(text):
+    """
+    Parses a "name:kbps:rtt_ms" profile argument.
+    """
+    try:
+        name, bandwidth, rtt = text.split(':')
+        return name, (float(bandwidth), float(rtt))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid profile '{text}', expected name:kbps:rtt_ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the download size and estimated load time of experiments.")
+    parser.add_argument("experiment_ids", nargs="*", help="Experiment IDs, e.g. SZE for Files/Experiment/SZE.json")
+    parser.add_argument("--all", action="store_true", help="Report every experiment in the experiment folder")
+    parser.add_argument("--profile", type=parse_profile, action="append", default=[], help="Extra network profile as name:kbps:rtt_ms")
+    parser.add_argument("--max-bytes", type=int, default=None, help="Budget for the total transfer size in bytes")
+    parser.add_argument("--max-first-case", type=float, default=None, help="Budget for the time to first case in seconds")
+    parser.add_argument("--max-total", type=float, default=None, help="Budget for the total load time in seconds")
+    parser.add_argument("--budget-profile", default="3g", help="Profile the time budgets are checked against (default: 3g)")
+    parser.add_argument("--experiment-folder", default=None, help="Folder of the experiment JSON files")
+    parser.add_argument("--json", default=None, help="Also write the reports to this JSON file")
+    args = parser.parse_args()
+
+    profiles = dict(DEFAULT_PROFILES, **dict(args.profile))
+    if args.budget_profile not in profiles:
+        parser.error(f"Unknown budget profile '{args.budget_profile}'")
+    experiment_folder = args.experiment_folder or default_settings['FolderVariables']['ExperimentFolder']
+    experiment_ids = args.experiment_ids
+    if args.all or not experiment_ids:
+        experiment_ids = sorted(os.path.splitext(f)[0] for f in os.listdir(experiment_folder) if f.endswith('.json'))
+
+    size_index = SizeIndex()
+    reports, failed = [], False
+    for experiment_id in experiment_ids:
+        report = build_report(experiment_id, size_index, profiles, experiment_folder)
+        report['violations'] = check_budget(report, args.max_bytes, args.max_first_case, args.max_total, args.budget_profile)
+        print_report(report)
+        for violation in report['violations']:
+            print(f"Budget exceeded: {violation}")
+        print()
+        failed = failed or bool(report['violations'])
+        reports.append(report)
+    size_index.save()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=4)
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
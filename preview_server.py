@@ -0,0 +1,353 @@
+"""
+preview_server.py
+
+This file contains the PreviewServer class, a local static file server that mimics the
+way GitHub Pages serves the Files/ tree. It is built on asyncio and the standard library
+and supports keep-alive connections, ETag/If-None-Match revalidation, single byte Range
+requests and gzip negotiation. File reads and compression run in the default executor,
+so a large file does not stall the other connections. An artificial latency and bandwidth
+limit can be set so experiment load times can be measured without a network.
+
+The server only listens on 127.0.0.1 unless another host is given, e.g. --host 0.0.0.0 to
+let phones on the same network connect.
+
+Usage:
+    python preview_server.py --port 8000 --latency 0.05 --bandwidth 500000
+    python preview_server.py --host 0.0.0.0 --port 8000
+"""
+
+import os
+import gzip
+import asyncio
+import argparse
+import functools
+import mimetypes
+import threading
+from email.utils import formatdate
+from urllib.parse import unquote, urlsplit
+
+# Folders of the repository that experiments fetch from
+DEFAULT_SERVED_FOLDERS = ('Files',)
+# Content types worth compressing
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'image/svg+xml')
+# Size of the chunks written to the client
+CHUNK_SIZE = 16 * 1024
+
+# AHAP files are JSON documents
+mimetypes.add_type('application/json', '.ahap')
+
+STATUS_TEXT = {
+    200: "OK",
+    206: "Partial Content",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    416: "Range Not Satisfiable",
+}
+
+@functools.lru_cache(maxsize=256)
+def gzip_file(file_path, etag):
+    """
+    Compresses a file once per version; the ETag is part of the cache key so edited files are recompressed.
+    """
+    with open(file_path, 'rb') as f:
+        return gzip.compress(f.read(), compresslevel=6, mtime=0)
+
+def stat_if_file(file_path):
+    """
+    Returns the stat of a regular file, or None when there is no such file.
+    """
+    return os.stat(file_path) if os.path.isfile(file_path) else None
+
+def parse_range(range_header, size):
+    """
+    Parses a single "bytes=" range.
+
+    Args:
+        range_header (str): The value of the Range header.
+        size (int): The size of the file.
+
+    Returns:
+        tuple: The (start, end) inclusive byte positions, None when the header should be ignored,
+               or False when the range cannot be satisfied.
+    """
+    unit, _, ranges = range_header.partition('=')
+    if unit.strip() != 'bytes' or ',' in ranges:
+        # Multiple ranges are not supported, GitHub Pages answers them with the full file too
+        return None
+    start, _, end = ranges.strip().partition('-')
+    try:
+        if start == '':
+            # Suffix range: the last N bytes
+            length = int(end)
+            if length <= 0:
+                return False
+            return max(size - length, 0), size - 1
+        start = int(start)
+        end = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+class PreviewServer:
+    """
+    A local static file server for previewing and load testing experiments.
+
+    Args:
+        root (str): The repository folder to serve.
+        host (str): The address to bind. 0.0.0.0 lets phones on the same network connect, but also exposes the served folders to it.
+        port (int): The port to listen on.
+        latency (float): Artificial delay in seconds added before each response.
+        bandwidth (float): Artificial bandwidth limit in bytes per second for each response, 0 for unlimited.
+        served_folders (tuple): The folders of the root that may be requested.
+    """
+    def __init__(self, root='.', host='127.0.0.1', port=8000, latency=0.0, bandwidth=0, served_folders=DEFAULT_SERVED_FOLDERS):
+        self.root = os.path.abspath(root)
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.served_folders = tuple(os.path.join(self.root, folder) for folder in served_folders)
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    async def start(self):
+        """
+        Starts listening on the configured address.
+        """
+        self._server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        return self._server
+
+    async def serve_forever(self):
+        server = await self.start()
+        async with server:
+            await server.serve_forever()
+
+    def start_in_thread(self):
+        """
+        Runs the server on its own event loop in a daemon thread, so it can be used from the Tk main loop.
+        Errors while binding the port are raised in the calling thread.
+        """
+        started = threading.Event()
+        errors = []
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._loop.run_until_complete(self.start())
+            except OSError as e:
+                errors.append(e)
+                started.set()
+                self._loop.close()
+                return
+            started.set()
+            self._loop.run_forever()
+            # Close the listening socket and the open connections once stop() has stopped the loop
+            self._server.close()
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="PreviewServer", daemon=True)
+        self._thread.start()
+        started.wait()
+        if errors:
+            self._thread = None
+            raise errors[0]
+
+    def stop(self):
+        """
+        Stops a server started with start_in_thread.
+        """
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+
+    def is_running(self):
+        return self._thread is not None
+
+    async def handle_client(self, reader, writer):
+        """
+        Serves the requests of one connection until the client closes it or asks to.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                if len(parts) != 3:
+                    await self.send(writer, 400, {}, b'', 'GET')
+                    break
+                method, target, version = parts
+                await self.respond(writer, method, target, headers)
+
+                # HTTP/1.1 keeps the connection open unless the client closes it
+                connection = headers.get('connection', '').lower()
+                if connection == 'close' or (version != 'HTTP/1.1' and connection != 'keep-alive'):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def resolve(self, target):
+        """
+        Maps a request target to a file inside the served folders, or None.
+        """
+        path = unquote(urlsplit(target).path)
+        file_path = os.path.normpath(os.path.join(self.root, path.lstrip('/')))
+        if not any(file_path.startswith(folder + os.sep) for folder in self.served_folders):
+            return None
+        return file_path if os.path.isfile(file_path) else None
+
+    async def respond(self, writer, method, target, headers):
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+        if method not in ('GET', 'HEAD'):
+            await self.send(writer, 405, {"Allow": "GET, HEAD"}, b'', method)
+            return
+
+        loop = asyncio.get_running_loop()
+        file_path = await loop.run_in_executor(None, self.resolve, target)
+        if file_path is None:
+            await self.send(writer, 404, {"Content-Type": "text/plain"}, b'Not Found', method)
+            return
+
+        stat = await loop.run_in_executor(None, os.stat, file_path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        content_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+        # Text content is compressed when the client accepts gzip, byte ranges are answered from the uncompressed file
+        gzipped = 'gzip' in headers.get('accept-encoding', '') and content_type.startswith(COMPRESSIBLE_TYPES) and 'range' not in headers
+        # The gzip body is a different representation, so it gets its own validator
+        response_etag = f'{etag[:-1]}-gz"' if gzipped else etag
+        response_headers = {
+            "Content-Type": content_type,
+            "ETag": response_etag,
+            "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+            "Cache-Control": "max-age=600",
+            "Accept-Ranges": "bytes",
+            "Vary": "Accept-Encoding",
+            "Access-Control-Allow-Origin": "*",
+        }
+
+        # Revalidation: the client already has this version
+        if_none_match = headers.get('if-none-match')
+        if if_none_match and (if_none_match.strip() == '*' or response_etag in [tag.strip() for tag in if_none_match.split(',')]):
+            await self.send(writer, 304, response_headers, b'', method)
+            return
+
+        if 'range' in headers:
+            byte_range = parse_range(headers['range'], stat.st_size)
+            if byte_range is False:
+                response_headers["Content-Range"] = f"bytes */{stat.st_size}"
+                await self.send(writer, 416, response_headers, b'', method)
+                return
+            if byte_range is not None:
+                start, end = byte_range
+                response_headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+                await self.send_file(writer, 206, response_headers, file_path, start, end - start + 1, method)
+                return
+
+        if gzipped:
+            response_headers["Content-Encoding"] = "gzip"
+            # Prefer a precompressed sibling written by publish.py when it is up to date
+            compressed_path = file_path + '.gz'
+            compressed_stat = await loop.run_in_executor(None, stat_if_file, compressed_path)
+            if compressed_stat is not None and compressed_stat.st_mtime_ns >= stat.st_mtime_ns:
+                await self.send_file(writer, 200, response_headers, compressed_path, 0, compressed_stat.st_size, method)
+            else:
+                body = await loop.run_in_executor(None, gzip_file, file_path, etag)
+                await self.send(writer, 200, response_headers, body, method)
+            return
+
+        await self.send_file(writer, 200, response_headers, file_path, 0, stat.st_size, method)
+
+    async def send(self, writer, status, headers, body, method):
+        """
+        Sends a response whose body is already in memory.
+        """
+        headers = dict(headers, **{"Content-Length": str(len(body))})
+        self.write_head(writer, status, headers)
+        if method != 'HEAD':
+            await self.write_body(writer, [body])
+        else:
+            await writer.drain()
+
+    async def send_file(self, writer, status, headers, file_path, offset, length, method):
+        """
+        Streams length bytes of a file starting at offset.
+        """
+        headers = dict(headers, **{"Content-Length": str(length)})
+        self.write_head(writer, status, headers)
+        if method == 'HEAD':
+            await writer.drain()
+            return
+
+        # Every read runs in the executor, so slow disks do not block the event loop
+        loop = asyncio.get_running_loop()
+        f = await loop.run_in_executor(None, open, file_path, 'rb')
+        try:
+            await loop.run_in_executor(None, f.seek, offset)
+            remaining = length
+            while remaining > 0:
+                chunk = await loop.run_in_executor(None, f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await self.write_body(writer, [chunk])
+        finally:
+            f.close()
+
+    def write_head(self, writer, status, headers):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}", f"Date: {formatdate(usegmt=True)}", "Server: TouchTact-Preview"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+
+    async def write_body(self, writer, chunks):
+        """
+        Writes the body chunks, pacing them to the configured bandwidth.
+        """
+        for chunk in chunks:
+            for start in range(0, len(chunk), CHUNK_SIZE):
+                part = chunk[start:start + CHUNK_SIZE]
+                writer.write(part)
+                await writer.drain()
+                if self.bandwidth > 0:
+                    await asyncio.sleep(len(part) / self.bandwidth)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Files/ tree like GitHub Pages for local experiment previews.")
+    parser.add_argument("--root", default=".", help="Repository folder to serve (default: current folder)")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind, 0.0.0.0 to allow other devices on the network (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on (default: 8000)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Artificial delay per response in seconds")
+    parser.add_argument("--bandwidth", type=float, default=0, help="Artificial bandwidth limit in bytes per second, 0 for unlimited")
+    args = parser.parse_args()
+
+    server = PreviewServer(args.root, args.host, args.port, args.latency, args.bandwidth)
+    print(f"Serving {server.root} on http://{args.host}:{args.port} (latency {args.latency} s, bandwidth {args.bandwidth or 'unlimited'} B/s)")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
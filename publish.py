@@ -0,0 +1,179 @@
+"""
+publish.py
+
+This file contains the publish command, which stages the files experiments actually
+download into a deploy folder for GitHub Pages. Starting from the generated experiments,
+only the experiment and case JSON files and the layout, audio and haptic files they
+reference are staged, plus every file of the folders given with --include, so files no
+experiment references yet stay online. JSON and AHAP files are minified and get a precompressed .gz
+sibling. A manifest of source hashes makes staging incremental: unchanged files are
+skipped and files that are no longer referenced are removed.
+
+Usage:
+    python publish.py --output _site
+    python publish.py SZE SZQ --output _site
+    python publish.py --output _site --include Files Schema
+"""
+
+import os
+import gzip
+import json
+import hashlib
+import argparse
+from default_configs import default_settings
+from experiment_files import load_fetch_plan
+
+DEFAULT_OUTPUT_FOLDER = '_site'
+MANIFEST_NAME = '.publish-manifest.json'
+# Files minified as JSON and precompressed
+JSON_EXTENSIONS = ('.json', '.ahap')
+
+def file_hash(file_path):
+    """
+    Returns the SHA-256 hash of a file content, reading it in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def referenced_files(experiment_ids=None, experiment_folder=None, case_folder=None):
+    """
+    Lists the repository relative paths referenced by the given experiments, or by every
+    experiment in the experiment folder. Both the sprites and the files they pack are listed,
+    since app versions without sprite support still fetch the individual files.
+    """
+    experiment_folder = experiment_folder or default_settings['FolderVariables']['ExperimentFolder']
+    if not experiment_ids:
+        experiment_ids = sorted(os.path.splitext(f)[0] for f in os.listdir(experiment_folder) if f.endswith('.json'))
+    paths = []
+    for experiment_id in experiment_ids:
+        for use_sprites in (True, False):
+            for step in load_fetch_plan(experiment_id, experiment_folder, case_folder, use_sprites=use_sprites):
+                if step['path'] not in paths:
+                    paths.append(step['path'])
+    return paths
+
+def folder_files(folders, source_root='.'):
+    """
+    Lists the repository relative paths, with forward slashes, of every file in the given folders.
+    """
+    paths = []
+    for folder in folders:
+        for directory, _, names in os.walk(os.path.join(source_root, folder)):
+            for name in sorted(names):
+                paths.append(os.path.relpath(os.path.join(directory, name), source_root).replace(os.sep, '/'))
+    return sorted(paths)
+
+def build_artifact(source_path):
+    """
+    Returns the deployed content of a file: minified JSON for JSON and AHAP files, the raw bytes otherwise.
+    """
+    if source_path.lower().endswith(JSON_EXTENSIONS):
+        with open(source_path, 'r') as f:
+            data = json.load(f)
+        return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    with open(source_path, 'rb') as f:
+        return f.read()
+
+def write_file(file_path, content):
+    # Write to a temporary file first so an interrupted publish never leaves a partial file
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    temporary_path = f"{file_path}.tmp"
+    with open(temporary_path, 'wb') as f:
+        f.write(content)
+    os.replace(temporary_path, file_path)
+
+def publish(output_folder=DEFAULT_OUTPUT_FOLDER, experiment_ids=None, experiment_folder=None, case_folder=None, source_root='.', include_folders=()):
+    """
+    Stages the referenced files into the output folder.
+
+    Args:
+        output_folder (str): The deploy folder.
+        experiment_ids (list[str], optional): The experiments to publish, every generated experiment by default.
+        experiment_folder (str, optional): The folder of the generated experiment JSON files.
+        case_folder (str, optional): The folder of the generated case JSON files.
+        source_root (str): The repository folder the referenced paths are relative to.
+        include_folders (list[str]): Repository relative folders whose files are all staged as well.
+
+    Returns:
+        dict: Lists of the written, skipped, removed and missing paths, and the source and deployed byte counts.
+    """
+    manifest_path = os.path.join(output_folder, MANIFEST_NAME)
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    summary = {"written": [], "skipped": [], "removed": [], "missing": [], "source_bytes": 0, "deployed_bytes": 0}
+    new_manifest = {}
+    paths = referenced_files(experiment_ids, experiment_folder, case_folder)
+    referenced = set(paths)
+    paths += [path for path in folder_files(include_folders, source_root) if path not in referenced]
+    for path in paths:
+        source_path = os.path.join(source_root, path)
+        if not os.path.isfile(source_path):
+            summary["missing"].append(path)
+            continue
+        stat = os.stat(source_path)
+        output_path = os.path.join(output_folder, path)
+        compressed = path.lower().endswith(JSON_EXTENSIONS)
+        record = manifest.get(path)
+        outputs_exist = os.path.isfile(output_path) and (not compressed or os.path.isfile(output_path + '.gz'))
+
+        # Unchanged size and mtime: skip without reading the file
+        if record and outputs_exist and record['size'] == stat.st_size and record['mtime'] == stat.st_mtime_ns:
+            new_manifest[path] = record
+        else:
+            digest = file_hash(source_path)
+            if record and outputs_exist and record['hash'] == digest:
+                # Touched but unchanged content
+                new_manifest[path] = dict(record, size=stat.st_size, mtime=stat.st_mtime_ns)
+            else:
+                content = build_artifact(source_path)
+                write_file(output_path, content)
+                deployed_size = len(content)
+                if compressed:
+                    compressed_content = gzip.compress(content, compresslevel=9, mtime=0)
+                    write_file(output_path + '.gz', compressed_content)
+                    deployed_size += len(compressed_content)
+                new_manifest[path] = {"hash": digest, "size": stat.st_size, "mtime": stat.st_mtime_ns, "deployed_size": deployed_size}
+                summary["written"].append(path)
+        if path not in summary["written"]:
+            summary["skipped"].append(path)
+        summary["source_bytes"] += stat.st_size
+        summary["deployed_bytes"] += new_manifest[path]["deployed_size"]
+
+    # Remove the files that are no longer referenced
+    for path in manifest:
+        if path not in new_manifest:
+            for stale_path in (os.path.join(output_folder, path), os.path.join(output_folder, path) + '.gz'):
+                if os.path.isfile(stale_path):
+                    os.remove(stale_path)
+            summary["removed"].append(path)
+
+    write_file(manifest_path, json.dumps(new_manifest, indent=4).encode('utf-8'))
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Stage the files referenced by the experiments into a deploy folder.")
+    parser.add_argument("experiment_ids", nargs="*", help="Experiments to publish (default: every experiment in the experiment folder)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_FOLDER, help=f"Deploy folder (default: {DEFAULT_OUTPUT_FOLDER})")
+    parser.add_argument("--experiment-folder", default=None, help="Folder of the experiment JSON files")
+    parser.add_argument("--case-folder", default=None, help="Folder of the case JSON files")
+    parser.add_argument("--include", nargs="+", default=[], help="Folders whose files are all staged, whether referenced or not, e.g. Files Schema")
+    parser.add_argument("--strict", action="store_true", help="Fail when a referenced file does not exist")
+    args = parser.parse_args()
+
+    summary = publish(args.output, args.experiment_ids, args.experiment_folder, args.case_folder, include_folders=args.include)
+    for path in summary["missing"]:
+        print(f"Warning: missing referenced file {path}")
+    print(f"Written: {len(summary['written'])}, unchanged: {len(summary['skipped'])}, removed: {len(summary['removed'])}, missing: {len(summary['missing'])}")
+    print(f"Source: {summary['source_bytes']} bytes, deployed (including .gz): {summary['deployed_bytes']} bytes")
+    if summary["missing"] and args.strict:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+ranking_builder.py
+
+This file contains the ranking builder, which replaces the hand-typed fake_ranking values
+with tables built from collected sessions. The sessions of every case in the log store are
+replayed with the case's rules, and the completion times and final scores of all cases are
+reduced to sorted quantile tables in one vectorized pass. The tables are written to
+timer.ranking_table and score.ranking_table of the generated case JSON, so the app can
+find the rank of a participant with a binary search.
+
+A table holds the values at QUANTILES evenly spaced quantiles, in ascending order, and the
+number of sessions it was built from. For a participant value v the fraction of sessions
+below v is searchsorted(values, v) / (len(values) - 1). A lower time and a higher score are
+better.
+
+Usage:
+    python ranking_builder.py A1 B1
+    python ranking_builder.py --all --quantiles 65
+"""
+
+import os
+import json
+import argparse
+import jsonschema
+import numpy as np
+from default_configs import default_settings
+from log_store import LogStore, DEFAULT_STORE_FOLDER
+from scoreboard_replay import scoring_rules, replay, displayed
+
+DEFAULT_QUANTILES = 101
+# Cases with fewer sessions keep their fake_ranking
+DEFAULT_MIN_SESSIONS = 10
+
+def quantile_tables(group, values, quantiles=DEFAULT_QUANTILES):
+    """
+    Computes the quantile table of every group in one pass, with linear interpolation between the sorted values.
+
+    Args:
+        group (numpy.ndarray): The group code of every value, from 0 to the number of groups - 1.
+        values (numpy.ndarray): The values.
+        quantiles (int): The number of evenly spaced quantiles, from the minimum to the maximum.
+
+    Returns:
+        tuple: The (groups, quantiles) table, NaN for empty groups, and the number of values of each group.
+    """
+    group = np.asarray(group, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    keep = np.isfinite(values)
+    group, values = group[keep], values[keep]
+    group_count = int(group.max()) + 1 if group.size else 0
+    order = np.lexsort((values, group))
+    sorted_values = values[order]
+    counts = np.bincount(group, minlength=group_count)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+
+    positions = np.linspace(0.0, 1.0, quantiles)[None, :] * np.maximum(counts - 1, 0)[:, None]
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, np.maximum(counts - 1, 0)[:, None])
+    fraction = positions - lower
+    safe = np.minimum(starts[:, None], max(len(sorted_values) - 1, 0))
+    if len(sorted_values):
+        table = sorted_values[safe + lower] * (1 - fraction) + sorted_values[safe + upper] * fraction
+    else:
+        table = np.zeros((group_count, quantiles))
+    table[counts == 0] = np.nan
+    return table, counts
+
+def session_results(store, case_folder):
+    """
+    Replays the sessions of every case in the store that has a generated case JSON.
+
+    Returns:
+        dict: The case ids and, per session, the case code, the completion time (NaN when not completed)
+        and the displayed final score (NaN when the case has no scoreboard).
+    """
+    case_ids, case_codes, times, scores = [], [], [], []
+    for case_id in store.manifest["case"]:
+        case_path = os.path.join(case_folder, f"{case_id}.json")
+        if not os.path.exists(case_path):
+            continue
+        with open(case_path, 'r') as f:
+            case_data = json.load(f)
+        rules = scoring_rules(case_data)
+        result = replay(store.events(case_id), rules)
+        code = len(case_ids)
+        case_ids.append(case_id)
+        case_codes.append(np.full(len(result["final_score"]), code))
+        times.append(result["completion_time"])
+        scores.append(displayed(result["final_score"], rules) if 'score' in case_data else np.full(len(result["final_score"]), np.nan))
+    if not case_ids:
+        return {"case_ids": [], "case": np.zeros(0, dtype=np.int64), "completion_time": np.zeros(0), "final_score": np.zeros(0)}
+    return {"case_ids": case_ids, "case": np.concatenate(case_codes), "completion_time": np.concatenate(times), "final_score": np.concatenate(scores)}
+
+def build_tables(results, quantiles=DEFAULT_QUANTILES, min_sessions=DEFAULT_MIN_SESSIONS):
+    """
+    Builds the time and score ranking tables of every case.
+
+    Returns:
+        dict: For each case id, the "timer" and "score" tables ({"values", "count"}), or None when too few sessions have a value.
+    """
+    time_table, time_counts = quantile_tables(results["case"], results["completion_time"], quantiles)
+    score_table, score_counts = quantile_tables(results["case"], results["final_score"], quantiles)
+    tables = {}
+    for code, case_id in enumerate(results["case_ids"]):
+        tables[case_id] = {}
+        for key, table, counts in (("timer", time_table, time_counts), ("score", score_table, score_counts)):
+            count = int(counts[code]) if code < len(counts) else 0
+            tables[case_id][key] = {"values": table[code].tolist(), "count": count} if count >= min_sessions else None
+    return tables
+
+def write_tables(case_path, tables):
+    """
+    Writes the ranking tables to the timer and score of a generated case JSON, rounded like the
+    values the app displays. Tables of sections the case does not have are left out.
+
+    Returns:
+        dict: For "timer" and "score", whether the table was "written", or the section has "too few sessions" or is "missing".
+    """
+    with open(case_path, 'r') as f:
+        case_data = json.load(f)
+    written = {}
+    for key, decimals in (("timer", 0), ("score", case_data.get('score', {}).get('decimal_places', 0))):
+        if key not in case_data:
+            written[key] = "missing"
+        elif not tables.get(key):
+            written[key] = "too few sessions"
+        else:
+            case_data[key]['ranking_table'] = {"values": [round(value, decimals) for value in tables[key]["values"]], "count": tables[key]["count"]}
+            written[key] = "written"
+    with open(os.path.join('Schema', 'case.json')) as f:
+        jsonschema.validate(case_data, json.load(f))
+    with open(case_path, 'w') as f:
+        f.write(json.dumps(case_data, indent=4))
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Build ranking tables from collected sessions and write them to the case JSON files.")
+    parser.add_argument("case_ids", nargs="*", help="Case IDs, e.g. A1 for Files/Case/A1.json")
+    parser.add_argument("--all", action="store_true", help="Update every case that has sessions in the store")
+    parser.add_argument("--store", default=DEFAULT_STORE_FOLDER, help=f"Log store folder (default: {DEFAULT_STORE_FOLDER})")
+    parser.add_argument("--case-folder", default=default_settings['FolderVariables']['CaseFolder'], help="Folder of the case JSON files")
+    parser.add_argument("--quantiles", type=int, default=DEFAULT_QUANTILES, help=f"Number of quantiles in a table (default: {DEFAULT_QUANTILES})")
+    parser.add_argument("--min-sessions", type=int, default=DEFAULT_MIN_SESSIONS, help=f"Fewest sessions a table is built from (default: {DEFAULT_MIN_SESSIONS})")
+    args = parser.parse_args()
+    if not args.case_ids and not args.all:
+        parser.error("give case IDs or --all")
+
+    store = LogStore(args.store, args.case_folder)
+    tables = build_tables(session_results(store, args.case_folder), args.quantiles, args.min_sessions)
+    for case_id in (sorted(tables) if args.all else args.case_ids):
+        if case_id not in tables:
+            print(f"{case_id}: no sessions in the store")
+            continue
+        written = write_tables(os.path.join(args.case_folder, f"{case_id}.json"), tables[case_id])
+        if all(status == "missing" for status in written.values()):
+            print(f"{case_id}: no timer/score section")
+            continue
+        reports = []
+        for key, status in written.items():
+            if status == "written":
+                reports.append(f"{key} from {tables[case_id][key]['count']} sessions")
+            elif status == "too few sessions":
+                reports.append(f"{key}: too few sessions, fake_ranking kept")
+        print(f"{case_id}: {', '.join(reports)}")
+
+if __name__ == "__main__":
+    main()
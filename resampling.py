@@ -0,0 +1,112 @@
+"""
+resampling.py
+
+This file contains the percentile bootstrap shared by the analysis tools. The resamples of
+a statistic are drawn as (resamples, values) index arrays, in batches of at most
+MAX_DRAW_ELEMENTS indices so memory stays bounded for large samples, and every batch is
+reduced with one NumPy call. Many statistics can be bootstrapped together, with the
+resamples split in chunks of CHUNK_RESAMPLES across a process pool.
+
+A statistic is given as a job tuple:
+    ("mean", values) and ("median", values) resample one sample.
+    ("difference", values, baseline) is the difference of the means of two independent samples.
+    ("slope", x, y) is the least squares slope of paired samples, resampled as pairs.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+DEFAULT_RESAMPLES = 10000
+DEFAULT_CONFIDENCE = 0.95
+# Resamples drawn per worker task
+CHUNK_RESAMPLES = 1000
+# Largest resample index array drawn at once
+MAX_DRAW_ELEMENTS = 1 << 22
+
+def _slope(x, y):
+    x_centered = x - x.mean(axis=1, keepdims=True)
+    variance = (x_centered ** 2).sum(axis=1)
+    covariance = (x_centered * (y - y.mean(axis=1, keepdims=True))).sum(axis=1)
+    return np.divide(covariance, variance, out=np.full(len(x), np.nan), where=variance > 0)
+
+# Statistics of resampled (resamples, values) arrays, one value per resample
+STATISTICS = {
+    "mean": lambda values: values.mean(axis=1),
+    "median": lambda values: np.median(values, axis=1),
+    "slope": _slope,
+}
+
+def resampled_statistic(rng, statistic, arrays, count):
+    """
+    Draws count resamples of paired arrays and returns the statistic of every resample.
+
+    Args:
+        rng (numpy.random.Generator): The random generator.
+        statistic (str): A key of STATISTICS.
+        arrays (list[numpy.ndarray]): The samples, resampled with the same indices.
+        count (int): The number of resamples.
+
+    Returns:
+        numpy.ndarray: The count statistics.
+    """
+    size = len(arrays[0])
+    batch = max(1, MAX_DRAW_ELEMENTS // size)
+    estimates = []
+    for start in range(0, count, batch):
+        index = rng.integers(0, size, (min(batch, count - start), size))
+        estimates.append(STATISTICS[statistic](*(array[index] for array in arrays)))
+    return np.concatenate(estimates)
+
+def _bootstrap_chunk(jobs, resamples, seed):
+    """
+    Draws resamples for every job and returns the resampled statistics. Runs in the worker processes.
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for kind, *arrays in jobs:
+        if kind == "difference":
+            results.append(resampled_statistic(rng, "mean", arrays[:1], resamples) - resampled_statistic(rng, "mean", arrays[1:], resamples))
+        else:
+            results.append(resampled_statistic(rng, kind, arrays, resamples))
+    return results
+
+def bootstrap(jobs, resamples=DEFAULT_RESAMPLES, confidence=DEFAULT_CONFIDENCE, workers=None, seed=0):
+    """
+    Computes percentile bootstrap confidence intervals for many statistics at once.
+
+    Args:
+        jobs (list[tuple]): The statistics, as described in the module docstring.
+        resamples (int): The number of resamples of every statistic.
+        confidence (float): The confidence level.
+        workers (int, optional): The number of worker processes, the CPU count by default. With 1 the
+            chunks run in the calling process.
+        seed (int): The seed the chunk seeds are spawned from, so results are reproducible.
+
+    Returns:
+        list[tuple]: The (low, high) interval of every job, (None, None) when no resample gave a value.
+    """
+    jobs = [(kind, *(np.asarray(array, dtype=np.float64) for array in arrays)) for kind, *arrays in jobs]
+    chunks = [min(CHUNK_RESAMPLES, resamples - start) for start in range(0, resamples, CHUNK_RESAMPLES)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    if workers == 1:
+        parts = [_bootstrap_chunk(jobs, chunk, chunk_seed) for chunk, chunk_seed in zip(chunks, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(_bootstrap_chunk, [jobs] * len(chunks), chunks, seeds))
+    tail = (1 - confidence) / 2 * 100
+    intervals = []
+    for index in range(len(jobs)):
+        estimates = np.concatenate([part[index] for part in parts])
+        estimates = estimates[np.isfinite(estimates)]
+        intervals.append(tuple(float(value) for value in np.percentile(estimates, [tail, 100 - tail])) if estimates.size else (None, None))
+    return intervals
+
+def bootstrap_interval(values, confidence=DEFAULT_CONFIDENCE, resamples=DEFAULT_RESAMPLES, statistic="mean", seed=0):
+    """
+    Returns the percentile bootstrap confidence interval of the mean or median of one small sample,
+    computed in the calling process. A single value is its own interval.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.size < 2:
+        return (float(values[0]), float(values[0])) if values.size else (None, None)
+    return bootstrap([(statistic, values)], resamples, confidence, workers=1, seed=seed)[0]
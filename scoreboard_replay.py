@@ -0,0 +1,220 @@
+"""
+scoreboard_replay.py
+
+This file contains the scoreboard replay engine, which rebuilds the scores of participant
+sessions from their interaction logs using the rules of a generated case JSON. The events
+of all sessions are held in flat NumPy arrays ordered by session and time, and the game
+is played one step at a time for every session at once: step k handles the k-th event of
+all sessions still playing, so the Python loop runs as many times as the longest session
+has events, not once per event.
+
+Scoring rules, following the case schema:
+    - The maximum score is score.reward_score. Every target reached for the first time
+      earns reward_score / len(order_array), so a flawless game ends at reward_score.
+    - Every wrong interaction costs penalty_percentage % of reward_score.
+    - Without score.display_negative the score never drops below zero.
+    - In the "continue" game mode a mistake keeps the progress, in the "restart" mode
+      the participant starts again from the first target of order_array. Targets reached
+      again after a restart earn nothing.
+    - With a timer, interactions after timer.max_time milliseconds are not counted and
+      the session does not complete.
+    - Displayed scores are rounded to score.decimal_places.
+
+A log is a CSV or JSONL file with one interaction per row: "session", "time_ms" and
+"button" (the 1-based button number tapped or swiped through). An optional "case" column
+lets one file hold several cases.
+
+Usage:
+    python scoreboard_replay.py A1 logs/A1.csv --output A1-scores.csv
+"""
+
+import os
+import csv
+import json
+import argparse
+import numpy as np
+
+DEFAULT_CASE_FOLDER = os.path.join("Files", "Case")
+
+def scoring_rules(case_data):
+    """
+    Extracts the scoring and game mode rules of a generated case JSON.
+
+    Args:
+        case_data (dict): The case JSON, as written by generate_case_json.
+
+    Returns:
+        dict: The target order, the reward per target, the penalty, the decimal places, whether negative
+        scores are allowed, whether mistakes restart the game and the time limit in ms (None without a timer).
+    """
+    order = np.array([int(target) for target in case_data['order_array']], dtype=np.int64)
+    score = case_data.get('score', {})
+    reward = float(score.get('reward_score', 0.0))
+    timer = case_data.get('timer')
+    return {
+        "order": order,
+        "reward_per_target": reward / len(order),
+        "penalty": reward * int(score.get('penalty_percentage', 0)) / 100,
+        "decimal_places": int(score.get('decimal_places', 0)),
+        "allow_negative": bool(score.get('display_negative', False)),
+        "restart": case_data['interaction']['game_mode'] == "restart",
+        "max_time": float(timer['max_time']) if timer else None,
+    }
+
+def load_case(case_id, case_folder=DEFAULT_CASE_FOLDER):
+    with open(os.path.join(case_folder, f"{case_id}.json"), 'r') as f:
+        return json.load(f)
+
+def events_from_arrays(session, time_ms, button):
+    """
+    Orders interaction events by session and time.
+
+    Args:
+        session (array-like): The session id of every event, any sortable type.
+        time_ms (array-like): The event times in milliseconds since the start of the session.
+        button (array-like): The 1-based button numbers.
+
+    Returns:
+        dict: The "sessions" ids, the "offsets" of each session's first event plus the total count,
+        and the ordered "time" and "button" arrays.
+    """
+    sessions, codes = np.unique(np.asarray(session), return_inverse=True)
+    time_ms = np.asarray(time_ms, dtype=np.float64)
+    order = np.lexsort((time_ms, codes))
+    counts = np.bincount(codes, minlength=len(sessions))
+    return {
+        "sessions": sessions,
+        "offsets": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+        "time": time_ms[order],
+        "button": np.asarray(button, dtype=np.int64)[order],
+    }
+
+def load_events(file_path, case_id=None):
+    """
+    Loads an interaction log from a CSV or JSONL file, keeping only the rows of case_id when the log has a case column.
+    """
+    with open(file_path, 'r', newline='') as f:
+        if file_path.lower().endswith('.jsonl'):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    if case_id is not None:
+        rows = [row for row in rows if str(row.get('case', case_id)) == case_id]
+    return events_from_arrays([str(row['session']) for row in rows], [row['time_ms'] for row in rows], [row['button'] for row in rows])
+
+def replay(events, rules):
+    """
+    Replays the sessions of a log under the rules of a case.
+
+    Args:
+        events (dict): The ordered events, from events_from_arrays or load_events.
+        rules (dict): The case rules, from scoring_rules.
+
+    Returns:
+        dict: Per event, the "score" after it, whether it was "correct" and whether it was "counted" (played
+        before the end of the game). Per session, the "final_score", the "errors", the "progress" (targets
+        reached), whether it "completed" and the "completion_time" in ms (NaN when not completed).
+    """
+    order, target_count = rules['order'], len(rules['order'])
+    offsets = events['offsets']
+    lengths = np.diff(offsets)
+    session_count = len(lengths)
+
+    # Sessions sorted by decreasing length, so the sessions still having a k-th event are a prefix
+    by_length = np.argsort(-lengths, kind='stable')
+    starts = offsets[:-1][by_length]
+    sorted_lengths = lengths[by_length]
+    time, button = events['time'], events['button']
+
+    progress = np.zeros(session_count, dtype=np.int64)
+    reached = np.zeros(session_count, dtype=np.int64)
+    score = np.zeros(session_count)
+    errors = np.zeros(session_count, dtype=np.int64)
+    done = np.zeros(session_count, dtype=bool)
+    completion_time = np.full(session_count, np.nan)
+    step_score = np.zeros(len(time))
+    step_correct = np.zeros(len(time), dtype=bool)
+    step_counted = np.zeros(len(time), dtype=bool)
+
+    max_length = int(sorted_lengths[0]) if session_count else 0
+    active_counts = np.searchsorted(-sorted_lengths, -np.arange(max_length), side='left')
+    for step in range(max_length):
+        active = slice(0, active_counts[step])
+        index = starts[active] + step
+        live = ~done[active]
+        if rules['max_time'] is not None:
+            live &= time[index] <= rules['max_time']
+        correct = live & (button[index] == order[np.minimum(progress[active], target_count - 1)])
+        wrong = live & ~correct
+
+        new_progress = np.where(correct, progress[active] + 1, np.where(wrong & rules['restart'], 0, progress[active]))
+        gained = np.maximum(new_progress - reached[active], 0)
+        new_score = score[active] + gained * rules['reward_per_target'] - wrong * rules['penalty']
+        if not rules['allow_negative']:
+            new_score = np.maximum(new_score, 0.0)
+        finished = correct & (new_progress == target_count)
+
+        progress[active] = new_progress
+        reached[active] += gained
+        score[active] = new_score
+        errors[active] += wrong
+        completion_time[active] = np.where(finished, time[index], completion_time[active])
+        done[active] |= finished
+        step_score[index] = new_score
+        step_correct[index] = correct
+        step_counted[index] = live
+
+    # Back from length order to session order
+    unsorted = np.empty_like(by_length)
+    unsorted[by_length] = np.arange(session_count)
+    return {
+        "score": step_score,
+        "correct": step_correct,
+        "counted": step_counted,
+        "final_score": score[unsorted],
+        "errors": errors[unsorted],
+        "progress": progress[unsorted],
+        "completed": done[unsorted],
+        "completion_time": completion_time[unsorted],
+    }
+
+def displayed(scores, rules):
+    """
+    Rounds scores the way the scoreboard displays them.
+    """
+    return np.round(scores, rules['decimal_places'])
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild participant scores from interaction logs with the scoring rules of a case.")
+    parser.add_argument("case_id", help="Case whose rules are applied, e.g. A1")
+    parser.add_argument("logs", nargs="+", help="CSV or JSONL interaction logs")
+    parser.add_argument("--case-folder", default=DEFAULT_CASE_FOLDER, help=f"Folder of the generated case JSON files (default: {DEFAULT_CASE_FOLDER})")
+    parser.add_argument("--output", default=None, help="Write the per-session results to this CSV file")
+    args = parser.parse_args()
+
+    rules = scoring_rules(load_case(args.case_id, args.case_folder))
+    loaded = [load_events(log, args.case_id) for log in args.logs]
+    events = events_from_arrays(
+        np.concatenate([np.repeat(batch['sessions'], np.diff(batch['offsets'])) for batch in loaded]),
+        np.concatenate([batch['time'] for batch in loaded]),
+        np.concatenate([batch['button'] for batch in loaded]),
+    )
+    result = replay(events, rules)
+    final_scores = displayed(result['final_score'], rules)
+
+    completed = result['completed']
+    print(f"{len(events['sessions'])} session(s), {len(events['time'])} interaction(s), {int(completed.sum())} completed")
+    if len(final_scores):
+        print(f"Final score: mean {final_scores.mean():.{rules['decimal_places']}f}, median {np.median(final_scores):.{rules['decimal_places']}f}")
+        print(f"Errors: mean {result['errors'].mean():.2f}, max {result['errors'].max()}")
+    if completed.any():
+        print(f"Completion time: median {np.median(result['completion_time'][completed]):.0f} ms")
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["session", "final_score", "errors", "progress", "completed", "completion_time_ms"])
+            for row in zip(events['sessions'], final_scores, result['errors'], result['progress'], completed, result['completion_time']):
+                writer.writerow([row[0], row[1], row[2], row[3], int(row[4]), "" if np.isnan(row[5]) else row[5]])
+
+if __name__ == "__main__":
+    main()
@@ -9,16 +9,20 @@ for server configuration, folder paths, user agreements, and other global settin
 """
 
 import json
+from urllib.parse import urlsplit
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from default_configs import load_setting, update_last_used_file_record, DEFAULT_SETTINGS_FOLDER, LAST_ACCESSED_SETTINGS_PATH
 from custom_widget import ScrollableFrame, EditableList, LabelEntryRow
 from latency_ui import LatencyUI
+from preview_server import PreviewServer
+from action_profiler import action_command
 
 class SettingsUI(tk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
         self.settings = load_setting()
+        self.preview_server = None
         self.create_widgets()
 
     def create_widgets(self):
@@ -31,11 +35,11 @@ class SettingsUI(tk.Frame):
         button_frame.pack(fill='x', side="bottom", pady=10)
 
         ## Create save button
-        save_button = ttk.Button(button_frame, text="Save", command=self.save_setting)
+        save_button = ttk.Button(button_frame, text="Save", command=action_command(self.save_setting))
         save_button.pack(side="left", padx=10)
 
         ## Create load button
-        load_button = ttk.Button(button_frame, text="Load", command=self.load_setting)
+        load_button = ttk.Button(button_frame, text="Load", command=action_command(self.load_setting))
         load_button.pack(side="left", padx=10)
 
         # Create a scrollable main frame to contain the settings 
@@ -90,11 +94,39 @@ class SettingsUI(tk.Frame):
         ## Make sure the correct settings are displayed based on the checkbox value 
         self.switch_between_url_github()
 
+        ## ----Local Preview Server Settings---- ##
+
+        ## Create a frame for the local preview server settings
+        local_server_frame = ttk.LabelFrame(main_frame, text="Local Preview Server", width=500, height=210)
+        local_server_frame.pack(fill="x", padx=10, pady=5)
+        local_server_frame.pack_propagate(False)  # Prevent resizing of the frame
+
+        ### Create a checkbox for using the local preview server as the root URL
+        self.use_local_server_var = tk.BooleanVar(value=self.settings['LocalServer']['enabled'])
+        self.use_local_server_var.trace_add("write", lambda *args: self.settings['LocalServer'].update({'enabled': self.use_local_server_var.get()}))
+        use_local_server_checkbox = ttk.Checkbutton(local_server_frame, text="Use Local Preview Server As Root URL", variable=self.use_local_server_var)
+        use_local_server_checkbox.pack(side="top", padx=10, pady=0)
+
+        ### Create label and textfields for the server address, latency and bandwidth
+        LabelEntryRow(local_server_frame, "Address:", self.settings['LocalServer']['address'], entry_callback=lambda x: self.settings['LocalServer'].update({'address': x}))
+        LabelEntryRow(local_server_frame, "Latency (s):", self.settings['LocalServer']['latency'], entry_callback=lambda x: self.settings['LocalServer'].update({'latency': x}))
+        LabelEntryRow(local_server_frame, "Bandwidth (bytes/s, 0 = unlimited):", self.settings['LocalServer']['bandwidth'], entry_callback=lambda x: self.settings['LocalServer'].update({'bandwidth': x}))
+
+        ### Create a button to start and stop the server
+        self.local_server_button = ttk.Button(local_server_frame, text="Stop Local Server" if self.preview_server else "Start Local Server", command=action_command(self.toggle_preview_server))
+        self.local_server_button.pack(fill="x", padx=10, pady=0)
+
 
         # Add this button after the folder settings
-        latency_button = ttk.Button(main_frame, text="Open Latency Generator", command=self.open_latency_ui)
+        latency_button = ttk.Button(main_frame, text="Open Latency Generator", command=action_command(self.open_latency_ui))
         latency_button.pack(fill="x", padx=10, pady=5)
 
+        ## Create a checkbox for profiling the button actions to .gui/profiles
+        self.profile_actions_var = tk.BooleanVar(value=self.settings['profile_actions'])
+        self.profile_actions_var.trace_add("write", lambda *args: self.settings.update({'profile_actions': self.profile_actions_var.get()}))
+        profile_actions_checkbox = ttk.Checkbutton(main_frame, text="Profile Button Actions", variable=self.profile_actions_var)
+        profile_actions_checkbox.pack(side="top", padx=10, pady=5)
+
         ## ----Folder Settings---- ##
         ## Create a hide and show button for the folder settings
         folder_button = ttk.Button(main_frame, text="Show Folder Settings", command=lambda: (folder_frame.pack_forget() or folder_button.config(text="Show Folder Settings")) if folder_frame.winfo_ismapped() else (folder_frame.pack(fill="x", padx=10, pady=5, before=user_agreement_frame) or folder_button.config(text="Hide Folder Settings")))
@@ -235,5 +267,34 @@ class SettingsUI(tk.Frame):
             messagebox.showinfo("Load Settings", "Settings loaded successfully.")
             self.create_widgets()
 
+    def toggle_preview_server(self):
+        """
+        Starts or stops the local preview server serving the Files folder.
+        """
+        if self.preview_server is not None:
+            self.preview_server.stop()
+            self.preview_server = None
+            self.local_server_button.config(text="Start Local Server")
+            return
+
+        local_server = self.settings['LocalServer']
+        try:
+            address = urlsplit(local_server['address'])
+            host = address.hostname or '127.0.0.1'
+            port = address.port or 80
+            latency = float(local_server['latency'] or 0)
+            bandwidth = float(local_server['bandwidth'] or 0)
+        except ValueError:
+            messagebox.showerror("Local Preview Server", "Please enter a valid address, latency and bandwidth.")
+            return
+        server = PreviewServer(host=host, port=port, latency=latency, bandwidth=bandwidth)
+        try:
+            server.start_in_thread()
+        except OSError as e:
+            messagebox.showerror("Local Preview Server", f"Failed to start the server: {str(e)}")
+            return
+        self.preview_server = server
+        self.local_server_button.config(text="Stop Local Server")
+
     def open_latency_ui(self):
         LatencyUI(self, self.settings)
\ No newline at end of file
@@ -0,0 +1,170 @@
+"""
+sprite_builder.py
+
+This file contains the sprite builder, which packs the audio and haptic stimuli of a
+generated case into one audio file and one AHAP file. The unique audio files are joined
+with a single vectorized NumPy concatenation, optionally separated by silence, and the
+haptic patterns are merged with their times shifted to the same offsets. The
+[start, duration] of every target is written to linked_files.audio_sprite and
+linked_files.haptic_sprite of the case JSON, so the app can fetch one audio and one
+haptic file per case. The per-target file arrays are kept for older app versions.
+
+Usage:
+    python sprite_builder.py A1 B1 --gap 0.05
+    python sprite_builder.py --all
+"""
+
+import os
+import json
+import argparse
+import jsonschema
+import numpy as np
+import soundfile as sf
+from default_configs import default_settings
+from experiment_files import url_to_path
+from ahap_pattern import AhapPattern
+
+DEFAULT_AUDIO_SPRITE_FOLDER = os.path.join("Files", "Audio", "Sprite")
+DEFAULT_HAPTIC_SPRITE_FOLDER = os.path.join("Files", "Haptic", "Sprite")
+# Silence between two packed stimuli in seconds
+DEFAULT_GAP = 0.05
+
+def unique_files(linked_files, file_types):
+    """
+    Returns the unique linked URLs of the given file types, in order of first use.
+    """
+    urls = []
+    for file_type in file_types:
+        for url in linked_files.get(file_type, []):
+            if url and url not in urls:
+                urls.append(url)
+    return urls
+
+def build_audio_sprite(file_paths, gap=DEFAULT_GAP):
+    """
+    Concatenates audio files into one signal, separated by gap seconds of silence.
+    Mono files are duplicated to the largest channel count of the set.
+
+    Args:
+        file_paths (list[str]): The audio files, in order.
+        gap (float): The silence between two files in seconds.
+
+    Returns:
+        tuple: The (frames, channels) signal, the sample rate and the [start, duration] in seconds of each file.
+    """
+    signals = []
+    samplerate = None
+    for file_path in file_paths:
+        data, fs = sf.read(file_path, dtype='float32', always_2d=True)
+        if samplerate is None:
+            samplerate = fs
+        elif fs != samplerate:
+            raise ValueError(f"{file_path} has a sample rate of {fs} Hz, expected {samplerate} Hz like the other files of the sprite")
+        signals.append(data)
+
+    channels = max(signal.shape[1] for signal in signals)
+    signals = [np.repeat(signal, channels, axis=1) if signal.shape[1] == 1 and channels > 1 else signal for signal in signals]
+    if any(signal.shape[1] != channels for signal in signals):
+        raise ValueError("Audio files of a sprite must be mono or share the same channel count")
+
+    # Interleave the signals with silence and join them in a single concatenation
+    gap_frames = int(round(gap * samplerate))
+    silence = np.zeros((gap_frames, channels), dtype=np.float32)
+    pieces = [piece for signal in signals for piece in (signal, silence)][:-1]
+    lengths = np.array([len(signal) for signal in signals])
+    starts = np.concatenate(([0], np.cumsum(lengths + gap_frames)[:-1]))
+    segments = [[round(start / samplerate, 6), round(length / samplerate, 6)] for start, length in zip(starts.tolist(), lengths.tolist())]
+    return np.concatenate(pieces), samplerate, segments
+
+def build_haptic_sprite(file_paths, gap=DEFAULT_GAP, project=""):
+    """
+    Merges AHAP patterns into one pattern, each shifted past the end of the previous one plus gap seconds.
+
+    Args:
+        file_paths (list[str]): The AHAP files, in order.
+        gap (float): The pause between two patterns in seconds.
+        project (str): The project name written to the metadata.
+
+    Returns:
+        tuple: The merged AHAP data and the [start, duration] in seconds of each file.
+    """
+    patterns = [AhapPattern.load(file_path) for file_path in file_paths]
+    # Control point times are relative to their curve, so only the entry times move
+    merged, starts = AhapPattern.concatenate(patterns, gap)
+    merged.header = {"Version": 1.0, "Metadata": {"Project": project, "Description": "Haptic sprite"}}
+    segments = [[round(float(start), 6), round(pattern.end_time, 6)] for start, pattern in zip(starts, patterns)]
+    return merged.to_dict(decimals=6), segments
+
+def pack_case(case_path, gap=DEFAULT_GAP, audio_folder=DEFAULT_AUDIO_SPRITE_FOLDER, haptic_folder=DEFAULT_HAPTIC_SPRITE_FOLDER, source_root='.'):
+    """
+    Builds the audio and haptic sprites of a generated case and records them in its linked_files.
+
+    Args:
+        case_path (str): The generated case JSON file.
+        gap (float): The pause between two packed stimuli in seconds.
+        audio_folder (str): The folder the audio sprite is written to.
+        haptic_folder (str): The folder the haptic sprite is written to.
+        source_root (str): The repository folder the linked file paths are relative to.
+
+    Returns:
+        dict: The sprite paths that were written.
+    """
+    with open(case_path, 'r') as f:
+        case_data = json.load(f)
+    case_id = os.path.splitext(os.path.basename(case_path))[0]
+    linked_files = case_data.get('linked_files', {})
+    written = {}
+
+    for kind, folder, extension in (("audio", audio_folder, ".wav"), ("haptic", haptic_folder, ".ahap")):
+        file_types = [f"correct_{kind}", f"wrong_{kind}"]
+        urls = unique_files(linked_files, file_types)
+        linked_files.pop(f"{kind}_sprite", None)
+        if not urls:
+            continue
+        file_paths = [os.path.join(source_root, url_to_path(url)) for url in urls]
+        sprite_path = os.path.join(folder, f"{case_id}{extension}")
+        os.makedirs(os.path.join(source_root, folder), exist_ok=True)
+
+        if kind == "audio":
+            data, samplerate, segments = build_audio_sprite(file_paths, gap)
+            sf.write(os.path.join(source_root, sprite_path), data, samplerate)
+        else:
+            ahap_data, segments = build_haptic_sprite(file_paths, gap, project=f"{case_id} sprite")
+            with open(os.path.join(source_root, sprite_path), 'w') as f:
+                json.dump(ahap_data, f, indent=4)
+
+        # The sprite is served from the same root as the files it packs
+        root = urls[0][:urls[0].find(url_to_path(urls[0]))]
+        segment_of = dict(zip(urls, segments))
+        sprite = {"file": f"{root}{sprite_path.replace(os.sep, '/')}"}
+        for file_type in file_types:
+            if file_type in linked_files:
+                sprite[file_type] = [segment_of[url] if url else None for url in linked_files[file_type]]
+        linked_files[f"{kind}_sprite"] = sprite
+        written[kind] = sprite_path
+
+    with open(os.path.join('Schema', 'case.json')) as f:
+        jsonschema.validate(case_data, json.load(f))
+    with open(case_path, 'w') as f:
+        f.write(json.dumps(case_data, indent=4))
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack the audio and haptic stimuli of generated cases into sprites.")
+    parser.add_argument("case_ids", nargs="*", help="Case IDs, e.g. A1 for Files/Case/A1.json")
+    parser.add_argument("--all", action="store_true", help="Pack every case in the case folder")
+    parser.add_argument("--gap", type=float, default=DEFAULT_GAP, help=f"Pause between two stimuli in seconds (default: {DEFAULT_GAP})")
+    parser.add_argument("--case-folder", default=default_settings['FolderVariables']['CaseFolder'], help="Folder of the case JSON files")
+    args = parser.parse_args()
+
+    case_ids = args.case_ids
+    if args.all:
+        case_ids = sorted(os.path.splitext(f)[0] for f in os.listdir(args.case_folder) if f.endswith('.json'))
+    if not case_ids:
+        parser.error("Please give case IDs or --all")
+    for case_id in case_ids:
+        written = pack_case(os.path.join(args.case_folder, f"{case_id}.json"), args.gap)
+        print(f"{case_id}: " + (", ".join(f"{kind} sprite {path}" for kind, path in written.items()) or "no linked files"))
+
+if __name__ == "__main__":
+    main()
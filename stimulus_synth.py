@@ -0,0 +1,244 @@
+"""
+stimulus_synth.py
+
+This file contains the stimulus synthesizer, which generates families of audio stimuli
+(pure tones, DTMF key pairs, click trains, chirps and calibration tracks with known
+onsets) together with a matching AHAP pattern for each sound. Every family is computed
+in one vectorized NumPy pass over a (stimuli, samples) array, and the haptic events use
+the same onsets and durations as the audio: clicks and bursts become HapticTransient
+events, sustained sounds become HapticContinuous events. The files are written to the
+OriginalAudioFolder and OriginalHapticFolder with the same base name, so they can be
+linked as a pair in a case.
+
+Usage:
+    python stimulus_synth.py dtmf tones
+    python stimulus_synth.py calibration --samplerate 48000 --overwrite
+"""
+
+import os
+import json
+import argparse
+import numpy as np
+import soundfile as sf
+from default_configs import default_settings
+
+DEFAULT_SAMPLERATE = 44100
+# Raised cosine fade in and out applied to sustained sounds, in seconds
+DEFAULT_FADE = 0.005
+# Apple limits a parameter curve to 16 control points
+MAX_CURVE_POINTS = 16
+
+DTMF_KEYS = "123A456B789C*0#D"
+DTMF_ROWS = np.array([697.0, 770.0, 852.0, 941.0])
+DTMF_COLUMNS = np.array([1209.0, 1336.0, 1477.0, 1633.0])
+# File name safe spelling of the DTMF keys that are not digits or letters
+DTMF_NAMES = {"*": "star", "#": "hash"}
+
+def sharpness_of(frequency):
+    """
+    Maps a frequency to a haptic sharpness, logarithmically from 80 Hz (0.0) to 8 kHz (1.0).
+    """
+    return np.clip(np.log(np.asarray(frequency, dtype=float) / 80.0) / np.log(100.0), 0.0, 1.0)
+
+def fade(signals, samplerate, fade_time=DEFAULT_FADE):
+    """
+    Applies a raised cosine fade in and out to every row of a (stimuli, samples) array in place.
+    """
+    length = min(int(fade_time * samplerate), signals.shape[-1] // 2)
+    if length > 0:
+        ramp = 0.5 - 0.5 * np.cos(np.pi * np.arange(length) / length)
+        signals[..., :length] *= ramp
+        signals[..., -length:] *= ramp[::-1]
+    return signals
+
+def time_axis(duration, samplerate):
+    return np.arange(int(round(duration * samplerate))) / samplerate
+
+def continuous_event(time, duration, intensity, sharpness):
+    return {"type": "continuous", "time": float(time), "duration": float(duration), "intensity": float(intensity), "sharpness": float(sharpness)}
+
+def transient_event(time, intensity, sharpness):
+    return {"type": "transient", "time": float(time), "intensity": float(intensity), "sharpness": float(sharpness)}
+
+def tones(frequencies, duration=0.2, samplerate=DEFAULT_SAMPLERATE, amplitude=0.5):
+    """
+    Generates one pure tone per frequency.
+
+    Returns:
+        list[dict]: Stimuli with the "name", the "audio" signal and the haptic "events".
+    """
+    frequencies = np.asarray(frequencies, dtype=float)
+    t = time_axis(duration, samplerate)
+    signals = fade(amplitude * np.sin(2 * np.pi * frequencies[:, None] * t[None, :]), samplerate)
+    sharpness = sharpness_of(frequencies)
+    return [
+        {"name": f"Tone-{frequency:g}Hz", "audio": signal, "events": [continuous_event(0.0, duration, amplitude, s)]}
+        for frequency, signal, s in zip(frequencies, signals, sharpness)
+    ]
+
+def dtmf(keys=DTMF_KEYS, duration=0.2, samplerate=DEFAULT_SAMPLERATE, amplitude=0.5):
+    """
+    Generates the dual tone of each DTMF key, named like the existing Dtmf-0 stimulus.
+    """
+    indices = np.array([DTMF_KEYS.index(key) for key in keys])
+    low, high = DTMF_ROWS[indices // 4], DTMF_COLUMNS[indices % 4]
+    t = time_axis(duration, samplerate)
+    # Each tone gets half the amplitude so the pair peaks at the requested amplitude
+    signals = 0.5 * amplitude * (np.sin(2 * np.pi * low[:, None] * t) + np.sin(2 * np.pi * high[:, None] * t))
+    signals = fade(signals, samplerate)
+    sharpness = sharpness_of(np.sqrt(low * high))
+    return [
+        {"name": f"Dtmf-{DTMF_NAMES.get(key, key)}", "audio": signal, "events": [continuous_event(0.0, duration, amplitude, s)]}
+        for key, signal, s in zip(keys, signals, sharpness)
+    ]
+
+def click_trains(rates, count=10, click_duration=0.001, samplerate=DEFAULT_SAMPLERATE, amplitude=0.8):
+    """
+    Generates one train of rectangular clicks per rate (clicks per second), starting at 0.
+    """
+    rates = np.asarray(rates, dtype=float)
+    click_samples = max(1, int(round(click_duration * samplerate)))
+    onsets = np.arange(count)[None, :] / rates[:, None]
+    starts = np.round(onsets * samplerate).astype(int)
+    length = starts.max() + click_samples
+    signals = np.zeros((len(rates), length))
+    # Scatter every sample of every click at once: (trains, clicks, samples of a click)
+    columns = starts[:, :, None] + np.arange(click_samples)
+    rows = np.broadcast_to(np.arange(len(rates))[:, None, None], columns.shape)
+    signals[rows, columns] = amplitude
+    stimuli = []
+    for rate, signal, train_onsets in zip(rates, signals, onsets):
+        # Trim the trailing silence of the slower trains
+        end = int(round(train_onsets[-1] * samplerate)) + click_samples
+        stimuli.append({
+            "name": f"Clicks-{rate:g}Hz",
+            "audio": signal[:end],
+            "events": [transient_event(onset, amplitude, 1.0) for onset in train_onsets]
+        })
+    return stimuli
+
+def chirps(sweeps, duration=0.5, samplerate=DEFAULT_SAMPLERATE, amplitude=0.5):
+    """
+    Generates one exponential sine sweep per (start, end) frequency pair.
+    The haptic sharpness follows the instantaneous frequency.
+    """
+    sweeps = np.asarray(sweeps, dtype=float)
+    f0, f1 = sweeps[:, :1], sweeps[:, 1:]
+    t = time_axis(duration, samplerate)[None, :]
+    ratio = np.log(f1 / f0)
+    # Phase of an exponential sweep, the integral of f0 * (f1 / f0) ** (t / duration)
+    phase = 2 * np.pi * f0 * duration / ratio * (np.exp(t / duration * ratio) - 1)
+    signals = fade(amplitude * np.sin(phase), samplerate)
+    point_times = np.linspace(0, duration, MAX_CURVE_POINTS)
+    point_frequencies = f0 * np.exp(point_times[None, :] / duration * ratio)
+    stimuli = []
+    for (start, end), signal, frequencies in zip(sweeps, signals, point_frequencies):
+        event = continuous_event(0.0, duration, amplitude, 0.0)
+        event["sharpness_curve"] = list(zip(point_times.tolist(), sharpness_of(frequencies).tolist()))
+        stimuli.append({"name": f"Chirp-{start:g}-{end:g}Hz", "audio": signal, "events": [event]})
+    return stimuli
+
+def calibration_track(onsets, burst_frequency=1000.0, burst_duration=0.01, tail=0.5, samplerate=DEFAULT_SAMPLERATE, amplitude=0.8, name="Calibration"):
+    """
+    Generates a silent track with short tone bursts at known onsets, for latency measurements.
+
+    Args:
+        onsets (list[float]): The burst onsets in seconds.
+        burst_frequency (float): The burst frequency in Hz.
+        burst_duration (float): The burst duration in seconds.
+        tail (float): The silence after the last burst in seconds.
+    """
+    onsets = np.asarray(onsets, dtype=float)
+    burst = amplitude * np.sin(2 * np.pi * burst_frequency * time_axis(burst_duration, samplerate))
+    burst = fade(burst[None, :], samplerate, min(DEFAULT_FADE, burst_duration / 4))[0]
+    starts = np.round(onsets * samplerate).astype(int)
+    signal = np.zeros(starts.max() + len(burst) + int(tail * samplerate))
+    signal[starts[:, None] + np.arange(len(burst))] = burst
+    sharpness = float(sharpness_of(burst_frequency))
+    return {"name": name, "audio": signal, "events": [transient_event(onset, amplitude, sharpness) for onset in onsets]}
+
+def events_to_ahap(events, project):
+    """
+    Builds an AHAP pattern from synthesizer events.
+
+    Args:
+        events (list[dict]): Transient events with time, intensity and sharpness; continuous events also with
+                             duration and an optional sharpness_curve of (time, value) control points.
+        project (str): The project name written to the metadata.
+
+    Returns:
+        dict: The AHAP data.
+    """
+    pattern = []
+    for event in events:
+        parameters = [
+            {"ParameterID": "HapticIntensity", "ParameterValue": round(event["intensity"], 6)},
+            {"ParameterID": "HapticSharpness", "ParameterValue": round(event["sharpness"], 6)}
+        ]
+        if event["type"] == "transient":
+            pattern.append({"Event": {"EventType": "HapticTransient", "Time": round(event["time"], 6), "EventParameters": parameters}})
+            continue
+        pattern.append({"Event": {"EventType": "HapticContinuous", "Time": round(event["time"], 6), "EventDuration": round(event["duration"], 6), "EventParameters": parameters}})
+        if "sharpness_curve" in event:
+            pattern.append({"ParameterCurve": {
+                "ParameterID": "HapticSharpnessControl",
+                "Time": round(event["time"], 6),
+                "ParameterCurveControlPoints": [{"Time": round(t, 6), "ParameterValue": round(value, 6)} for t, value in event["sharpness_curve"]]
+            }})
+    return {"Version": 1.0, "Metadata": {"Project": project, "Description": "Generated by stimulus_synth.py"}, "Pattern": pattern}
+
+def write_stimuli(stimuli, samplerate=DEFAULT_SAMPLERATE, audio_folder=None, haptic_folder=None, overwrite=False):
+    """
+    Writes each stimulus as <name>.wav in the audio folder and <name>.ahap in the haptic folder.
+
+    Args:
+        stimuli (list[dict]): The stimuli from the family functions.
+        samplerate (int): The sample rate the stimuli were generated with.
+        audio_folder (str, optional): The audio output folder, OriginalAudioFolder by default.
+        haptic_folder (str, optional): The haptic output folder, OriginalHapticFolder by default.
+        overwrite (bool): Whether existing files are replaced.
+
+    Returns:
+        tuple: The lists of written and skipped stimulus names.
+    """
+    audio_folder = audio_folder or default_settings['FolderVariables']['OriginalAudioFolder']
+    haptic_folder = haptic_folder or default_settings['FolderVariables']['OriginalHapticFolder']
+    os.makedirs(audio_folder, exist_ok=True)
+    os.makedirs(haptic_folder, exist_ok=True)
+    written, skipped = [], []
+    for stimulus in stimuli:
+        audio_path = os.path.join(audio_folder, f"{stimulus['name']}.wav")
+        haptic_path = os.path.join(haptic_folder, f"{stimulus['name']}.ahap")
+        if not overwrite and (os.path.exists(audio_path) or os.path.exists(haptic_path)):
+            skipped.append(stimulus['name'])
+            continue
+        sf.write(audio_path, np.clip(stimulus['audio'], -1.0, 1.0).astype(np.float32), samplerate, subtype='PCM_16')
+        with open(haptic_path, 'w') as f:
+            json.dump(events_to_ahap(stimulus['events'], stimulus['name']), f, indent=4)
+        written.append(stimulus['name'])
+    return written, skipped
+
+# Stimulus families written by the command line, as name: function of the sample rate
+FAMILIES = {
+    "tones": lambda samplerate: tones([250, 500, 1000, 2000, 4000], samplerate=samplerate),
+    "dtmf": lambda samplerate: dtmf(samplerate=samplerate),
+    "clicks": lambda samplerate: click_trains([2, 5, 10, 20], samplerate=samplerate),
+    "chirps": lambda samplerate: chirps([(100, 1000), (1000, 100), (200, 4000)], samplerate=samplerate),
+    "calibration": lambda samplerate: [calibration_track(np.arange(1, 11) * 0.5, samplerate=samplerate)],
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate families of audio stimuli with matching AHAP patterns.")
+    parser.add_argument("families", nargs="+", choices=sorted(FAMILIES), help="Stimulus families to generate")
+    parser.add_argument("--samplerate", type=int, default=DEFAULT_SAMPLERATE, help=f"Sample rate in Hz (default: {DEFAULT_SAMPLERATE})")
+    parser.add_argument("--audio-folder", default=None, help="Audio output folder (default: OriginalAudioFolder)")
+    parser.add_argument("--haptic-folder", default=None, help="Haptic output folder (default: OriginalHapticFolder)")
+    parser.add_argument("--overwrite", action="store_true", help="Replace existing stimuli with the same name")
+    args = parser.parse_args()
+
+    for family in args.families:
+        written, skipped = write_stimuli(FAMILIES[family](args.samplerate), args.samplerate, args.audio_folder, args.haptic_folder, args.overwrite)
+        print(f"{family}: wrote {len(written)} stimuli" + (f", skipped {len(skipped)} existing ({', '.join(skipped)})" if skipped else ""))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+swipe_analysis.py
+
+This file contains the swipe trajectory analyzer for swipe_through cases. The touch
+samples of all sessions are turned into line segments, and every segment is tested
+against all button rectangles at once: a bounding box test broadcast over each chunk of
+CHUNK_SEGMENTS segments, then Liang-Barsky clipping of the overlapping pairs, so buttons
+passed between two samples of a fast swipe are still found. Each entry into a button
+becomes a crossing, and the crossings are replayed with the case rules from
+scoreboard_replay to get the order against order_array, the errors and the completion.
+Path length, straightness and speed come from per-stroke reductions over the same segments.
+
+Buttons sit at the location_array positions with the footprint generate_location_array
+assumes: BUTTON_WIDTH by BUTTON_HEIGHT percent units from the top-left corner. Positions
+are in percent of the screen width and height, so lengths and speeds are in percent units
+unless --aspect (screen height / width) is given, which scales vertical distances to
+percent of the screen width.
+
+A touch log is a CSV or JSONL file with one sample per row: "session", "time_ms", "x" and
+"y", and optionally "stroke" when a session has several touches.
+
+Usage:
+    python swipe_analysis.py C1 touches/C1.csv --output C1-swipes.csv
+    python swipe_analysis.py C1 touches/C1.jsonl --aspect 2.16
+"""
+
+import os
+import csv
+import json
+import argparse
+import numpy as np
+from default_configs import default_settings
+from scoreboard_replay import scoring_rules, replay
+
+BUTTON_WIDTH = 15
+BUTTON_HEIGHT = 10
+CHUNK_SEGMENTS = 1 << 15
+
+def button_rectangles(location_array, width=BUTTON_WIDTH, height=BUTTON_HEIGHT):
+    """
+    Returns the left, top, right and bottom edges of the buttons, button n being location_array[n - 1].
+    """
+    x = np.array([float(location['x']) for location in location_array])
+    y = np.array([float(location['y']) for location in location_array])
+    return x, y, x + width, y + height
+
+def samples_from_arrays(session, time_ms, x, y, stroke=None):
+    """
+    Orders touch samples by session, stroke and time.
+
+    Returns:
+        dict: The "sessions" ids, the sorted "session" codes, "stroke" ids, "time", "x" and "y", and
+        "stroke_start", which marks the first sample of every stroke.
+    """
+    # Codes from a stable sort, which is much faster than np.unique with return_inverse on large logs
+    session = np.asarray(session)
+    by_session = np.argsort(session, kind='stable')
+    sorted_session = session[by_session]
+    new_session = np.concatenate([[True], sorted_session[1:] != sorted_session[:-1]]) if len(session) else np.zeros(0, dtype=bool)
+    sessions = sorted_session[new_session]
+    codes = np.empty(len(session), dtype=np.int64)
+    codes[by_session] = np.cumsum(new_session) - 1
+    stroke = np.zeros(len(codes), dtype=np.int64) if stroke is None else np.asarray(stroke, dtype=np.int64)
+    time_ms = np.asarray(time_ms, dtype=np.float64)
+    order = np.lexsort((time_ms, stroke, codes))
+    codes, stroke = codes[order], stroke[order]
+    stroke_start = np.concatenate([[True], (codes[1:] != codes[:-1]) | (stroke[1:] != stroke[:-1])]) if len(order) else np.zeros(0, dtype=bool)
+    return {
+        "sessions": sessions, "session": codes, "stroke": stroke, "stroke_start": stroke_start,
+        "time": time_ms[order], "x": np.asarray(x, dtype=np.float64)[order], "y": np.asarray(y, dtype=np.float64)[order],
+    }
+
+def load_samples(file_path):
+    """
+    Loads a touch log from a CSV or JSONL file.
+    """
+    with open(file_path, 'r', newline='') as f:
+        if file_path.lower().endswith('.jsonl'):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    has_stroke = bool(rows) and all(row.get('stroke') not in (None, '') for row in rows)
+    return samples_from_arrays(
+        [str(row['session']) for row in rows], [row['time_ms'] for row in rows],
+        [row['x'] for row in rows], [row['y'] for row in rows],
+        [row['stroke'] for row in rows] if has_stroke else None,
+    )
+
+def segment_entries(x0, y0, x1, y1, left, top, right, bottom):
+    """
+    Clips segments against rectangles, one rectangle per segment.
+
+    Returns:
+        tuple: Whether each segment reaches its rectangle and the segment parameter (0 to 1) where it enters.
+    """
+    def slab(start, delta, low, high):
+        # Parameter range in which a segment lies between two parallel edges
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t_low, t_high = (low - start) / delta, (high - start) / delta
+        moving = delta != 0
+        inside = (start >= low) & (start <= high)
+        entry = np.where(moving, np.minimum(t_low, t_high), np.where(inside, -np.inf, np.inf))
+        exit = np.where(moving, np.maximum(t_low, t_high), np.where(inside, np.inf, -np.inf))
+        return entry, exit
+
+    x_entry, x_exit = slab(x0, x1 - x0, left, right)
+    y_entry, y_exit = slab(y0, y1 - y0, top, bottom)
+    entry = np.maximum(np.maximum(x_entry, y_entry), 0.0)
+    exit = np.minimum(np.minimum(x_exit, y_exit), 1.0)
+    return entry <= exit, entry
+
+def crossings(samples, rectangles, chunk_segments=CHUNK_SEGMENTS):
+    """
+    Finds every entry of the touch path into a button. A stroke starting on a button enters it at its
+    first sample, and a segment enters a button when it starts outside and reaches it.
+
+    Returns:
+        dict: The "session" code, "time" and 1-based "button" of every crossing, ordered by session and time.
+    """
+    x, y, time = samples["x"], samples["y"], samples["time"]
+    left, top, right, bottom = rectangles
+    parts = []
+
+    # Strokes starting on a button
+    first = np.flatnonzero(samples["stroke_start"])
+    inside = (x[first, None] >= left) & (x[first, None] <= right) & (y[first, None] >= top) & (y[first, None] <= bottom)
+    point, button = np.nonzero(inside)
+    parts.append((samples["session"][first[point]], time[first[point]], button + 1))
+
+    # Segments between consecutive samples of the same stroke
+    segment_start = np.flatnonzero(~samples["stroke_start"][1:]) if len(x) > 1 else np.zeros(0, dtype=np.int64)
+    for chunk_start in range(0, len(segment_start), chunk_segments):
+        start = segment_start[chunk_start:chunk_start + chunk_segments]
+        end = start + 1
+        # Only segments whose bounding box overlaps a button are clipped against it
+        x0, y0, x1, y1 = x[start, None], y[start, None], x[end, None], y[end, None]
+        segment, button = np.nonzero((np.minimum(x0, x1) <= right) & (np.maximum(x0, x1) >= left) & (np.minimum(y0, y1) <= bottom) & (np.maximum(y0, y1) >= top))
+        start, end = start[segment], end[segment]
+        hit, entry = segment_entries(x[start], y[start], x[end], y[end], left[button], top[button], right[button], bottom[button])
+        hit &= entry > 0
+        start, end, button, entry = start[hit], end[hit], button[hit], entry[hit]
+        entry_time = time[start] + entry * (time[end] - time[start])
+        parts.append((samples["session"][start], entry_time, button + 1))
+
+    session = np.concatenate([part[0] for part in parts])
+    entry_time = np.concatenate([part[1] for part in parts])
+    button = np.concatenate([part[2] for part in parts])
+    order = np.lexsort((entry_time, session))
+    return {"session": session[order], "time": entry_time[order], "button": button[order]}
+
+def path_metrics(samples, aspect=1.0):
+    """
+    Computes the path length, straightness, duration and speeds of every session, over all its strokes.
+
+    Args:
+        samples (dict): The ordered samples, from samples_from_arrays or load_samples.
+        aspect (float): The screen height / width, which scales vertical distances to horizontal percent units.
+
+    Returns:
+        dict: Per session, the "path_length", the "straightness" (start to end distance of each stroke over
+        its length, weighted by length), the "duration_ms", the "mean_speed" and the "peak_speed" in units per second.
+    """
+    session_count = len(samples["sessions"])
+    x, y, time, session = samples["x"], samples["y"] * aspect, samples["time"], samples["session"]
+    same_stroke = ~samples["stroke_start"][1:]
+    lengths = np.hypot(np.diff(x), np.diff(y))[same_stroke]
+    durations = np.diff(time)[same_stroke]
+    segment_session = session[1:][same_stroke]
+
+    path_length = np.bincount(segment_session, weights=lengths, minlength=session_count)
+    stroke_first = np.flatnonzero(samples["stroke_start"])
+    stroke_last = np.concatenate([stroke_first[1:] - 1, [len(x) - 1]]) if len(x) else np.zeros(0, dtype=np.int64)
+    displacement = np.bincount(session[stroke_first], weights=np.hypot(x[stroke_last] - x[stroke_first], y[stroke_last] - y[stroke_first]), minlength=session_count)
+    duration = np.bincount(segment_session, weights=durations, minlength=session_count)
+
+    speeds = np.divide(lengths, durations / 1000, out=np.zeros_like(lengths), where=durations > 0)
+    peak_speed = np.zeros(session_count)
+    np.maximum.at(peak_speed, segment_session, speeds)
+    return {
+        "path_length": path_length,
+        "straightness": np.divide(displacement, path_length, out=np.full(session_count, np.nan), where=path_length > 0),
+        "duration_ms": duration,
+        "mean_speed": np.divide(path_length, duration / 1000, out=np.full(session_count, np.nan), where=duration > 0),
+        "peak_speed": peak_speed,
+    }
+
+def analyze(case_data, samples, aspect=1.0):
+    """
+    Analyzes the touch paths of a swipe_through case.
+
+    Returns:
+        dict: The "crossings", the scoreboard replay of the crossings ("replay", whose sessions follow
+        samples["sessions"]) and the "metrics" of the paths.
+    """
+    if 'location_array' not in case_data:
+        raise ValueError("The case has no location_array, so the button positions are unknown")
+    found = crossings(samples, button_rectangles(case_data['location_array']))
+    # Sessions without any crossing still get a replay row, so the rows follow samples["sessions"]
+    session_count = len(samples["sessions"])
+    counts = np.bincount(found["session"], minlength=session_count)
+    events = {"sessions": samples["sessions"], "offsets": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64), "time": found["time"], "button": found["button"]}
+    return {"crossings": found, "replay": replay(events, scoring_rules(case_data)), "metrics": path_metrics(samples, aspect)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Hit-test swipe trajectories against the buttons of a case and compute path metrics.")
+    parser.add_argument("case_id", help="Case whose buttons and rules are used, e.g. C1")
+    parser.add_argument("logs", nargs="+", help="CSV or JSONL touch sample logs")
+    parser.add_argument("--case-folder", default=default_settings['FolderVariables']['CaseFolder'], help="Folder of the case JSON files")
+    parser.add_argument("--aspect", type=float, default=1.0, help="Screen height / width, to measure vertical distances in horizontal units (default: 1.0)")
+    parser.add_argument("--output", default=None, help="Write the per-session results to this CSV file")
+    args = parser.parse_args()
+
+    with open(os.path.join(args.case_folder, f"{args.case_id}.json"), 'r') as f:
+        case_data = json.load(f)
+    loaded = [load_samples(log) for log in args.logs]
+    samples = samples_from_arrays(
+        np.concatenate([batch["sessions"][batch["session"]] for batch in loaded]),
+        np.concatenate([batch["time"] for batch in loaded]),
+        np.concatenate([batch["x"] for batch in loaded]),
+        np.concatenate([batch["y"] for batch in loaded]),
+        np.concatenate([batch["stroke"] for batch in loaded]),
+    )
+    result = analyze(case_data, samples, args.aspect)
+    replayed, metrics = result["replay"], result["metrics"]
+
+    print(f"{len(samples['sessions'])} session(s), {len(samples['time'])} touch sample(s), {len(result['crossings']['button'])} crossing(s)")
+    print(f"Completed in order: {int(replayed['completed'].sum())}, mean errors {replayed['errors'].mean():.2f}")
+    print(f"Path length: median {np.median(metrics['path_length']):.1f}, straightness median {np.nanmedian(metrics['straightness']):.3f}, "
+          f"mean speed median {np.nanmedian(metrics['mean_speed']):.1f} units/s")
+    if args.output:
+        crossed = np.split(result["crossings"]["button"], np.cumsum(np.bincount(result["crossings"]["session"], minlength=len(samples["sessions"])))[:-1])
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["session", "crossed", "progress", "errors", "completed", "completion_time_ms", "path_length", "straightness", "duration_ms", "mean_speed", "peak_speed"])
+            for index, session in enumerate(samples["sessions"]):
+                completion = replayed["completion_time"][index]
+                writer.writerow([session, " ".join(str(button) for button in crossed[index]), replayed["progress"][index], replayed["errors"][index],
+                                 int(replayed["completed"][index]), "" if np.isnan(completion) else round(completion, 1),
+                                 *(round(float(metrics[key][index]), 3) for key in ("path_length", "straightness", "duration_ms", "mean_speed", "peak_speed"))])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+ui_trace.py
+
+This file contains the opt-in UI timing trace. When the TOUCHTACT_UI_TRACE environment
+variable is set, the slow UI methods (widget creation, refresh, load, generate, convert
+and tab switches) are wrapped with timers, and an after() heartbeat records every stall
+of the Tk event loop longer than a threshold. The number of live widgets and traced Tk
+variables is sampled once per second. When the application closes, everything is
+written as a Chrome trace JSON file, which can be opened in chrome://tracing or
+https://ui.perfetto.dev.
+
+Usage:
+    TOUCHTACT_UI_TRACE=1 python main.py
+    TOUCHTACT_UI_TRACE=trace.json TOUCHTACT_UI_TRACE_STALL_MS=50 python main.py
+"""
+
+import os
+import time
+import json
+import importlib
+import functools
+import threading
+from default_configs import DEFAULT_GUI_FOLDER
+
+TRACE_ENV = 'TOUCHTACT_UI_TRACE'
+STALL_THRESHOLD_ENV = 'TOUCHTACT_UI_TRACE_STALL_MS'
+DEFAULT_TRACE_FOLDER = os.path.join(DEFAULT_GUI_FOLDER, 'trace')
+# Heartbeat interval and default stall threshold in milliseconds
+HEARTBEAT_MS = 20
+DEFAULT_STALL_THRESHOLD_MS = 100
+# Seconds between two samples of the widget and variable counts
+COUNTER_INTERVAL = 1.0
+
+# Methods timed by default, as module.Class: [method names]
+TRACED_METHODS = {
+    "settings_ui.SettingsUI": ["create_widgets", "save_setting", "load_setting", "open_latency_ui"],
+    "experiment_ui.ExperimentUI": ["create_widgets", "refresh", "refresh_available_cases", "save_experiment", "load_experiment", "generate_experiment_json", "open_case_creation_window"],
+    "case_ui.CaseUI": ["create_widgets", "refresh_settings", "load_model", "save_case", "load_case", "generate_case_json", "randomize_location", "preview_audio"],
+    "latency_ui.LatencyUI": ["create_widgets", "convert_files"],
+}
+
+class UITracer:
+    """
+    Collects timed sections, event loop stalls and widget counters as Chrome trace events.
+
+    Args:
+        output_path (str): The Chrome trace JSON file written by save().
+        stall_threshold_ms (float): Heartbeat delays longer than this are recorded as stalls.
+    """
+    def __init__(self, output_path, stall_threshold_ms=DEFAULT_STALL_THRESHOLD_MS):
+        self.output_path = output_path
+        self.stall_threshold = stall_threshold_ms / 1000
+        self.origin = time.perf_counter()
+        self.events = []
+        self.pid = os.getpid()
+        self.root = None
+        self.expected_tick = None
+        self.next_sample = 0.0
+        self.stalls = 0
+
+    def timestamp(self, t):
+        # Chrome trace timestamps are in microseconds
+        return round((t - self.origin) * 1e6, 1)
+
+    def add_section(self, name, start, end, category="ui", args=None):
+        event = {"name": name, "cat": category, "ph": "X", "ts": self.timestamp(start), "dur": round((end - start) * 1e6, 1), "pid": self.pid, "tid": threading.get_ident()}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def wrap(self, cls, method_names):
+        """
+        Replaces methods of a class with timed versions. Must run before the instances bind the methods as commands.
+        """
+        for method_name in method_names:
+            method = getattr(cls, method_name)
+            if not getattr(method, '_ui_traced', False):
+                setattr(cls, method_name, self.timed(method, f"{cls.__name__}.{method_name}"))
+
+    def timed(self, method, name):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.add_section(name, start, time.perf_counter())
+        wrapper._ui_traced = True
+        return wrapper
+
+    def start(self, root):
+        """
+        Starts the event loop heartbeat on the Tk root window.
+        """
+        self.root = root
+        self.expected_tick = time.perf_counter() + HEARTBEAT_MS / 1000
+        root.after(HEARTBEAT_MS, self.heartbeat)
+
+    def heartbeat(self):
+        now = time.perf_counter()
+        delay = now - self.expected_tick
+        if delay > self.stall_threshold:
+            self.stalls += 1
+            self.add_section("stall", self.expected_tick, now, category="stall", args={"ms": round(delay * 1000, 1)})
+        if now >= self.next_sample:
+            self.sample_counters(now)
+            self.next_sample = now + COUNTER_INTERVAL
+        self.expected_tick = time.perf_counter() + HEARTBEAT_MS / 1000
+        self.root.after(HEARTBEAT_MS, self.heartbeat)
+
+    def sample_counters(self, now):
+        widgets = 0
+        pending = [self.root]
+        while pending:
+            widget = pending.pop()
+            widgets += 1
+            pending.extend(widget.children.values())
+        # Tk variables created by tkinter are Tcl globals named PY_VAR<n>
+        tk_app = self.root.tk
+        variables = tk_app.splitlist(tk_app.call('info', 'globals', 'PY_VAR*'))
+        traced = sum(1 for name in variables if tk_app.splitlist(tk_app.call('trace', 'info', 'variable', name)))
+        self.events.append({"name": "widgets", "ph": "C", "ts": self.timestamp(now), "pid": self.pid, "args": {"live widgets": widgets}})
+        self.events.append({"name": "variables", "ph": "C", "ts": self.timestamp(now), "pid": self.pid, "args": {"variables": len(variables), "traced": traced}})
+
+    def save(self):
+        """
+        Writes the collected events as a Chrome trace JSON file.
+
+        Returns:
+            str: The path of the written file.
+        """
+        metadata = [{"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": "TouchTact Experiment Generation GUI"}}]
+        trace = {
+            "traceEvents": metadata + self.events,
+            "displayTimeUnit": "ms",
+            "otherData": {"stall_threshold_ms": self.stall_threshold * 1000, "heartbeat_ms": HEARTBEAT_MS, "stalls": self.stalls}
+        }
+        os.makedirs(os.path.dirname(self.output_path) or '.', exist_ok=True)
+        with open(self.output_path, 'w') as f:
+            json.dump(trace, f)
+        return self.output_path
+
+def install_from_env(extra_methods=None):
+    """
+    Wraps the traced methods when TOUCHTACT_UI_TRACE is set.
+    The variable holds the output path, or 1 for a timestamped file in .gui/trace.
+
+    Args:
+        extra_methods (dict, optional): More methods to time, as {class: [method names]}.
+
+    Returns:
+        UITracer: The tracer, or None when tracing is disabled.
+    """
+    value = os.environ.get(TRACE_ENV, '')
+    if value in ('', '0'):
+        return None
+    output_path = value if value != '1' else os.path.join(DEFAULT_TRACE_FOLDER, f"ui-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    tracer = UITracer(output_path, float(os.environ.get(STALL_THRESHOLD_ENV, DEFAULT_STALL_THRESHOLD_MS)))
+
+    for qualified_name, method_names in TRACED_METHODS.items():
+        module_name, class_name = qualified_name.rsplit('.', 1)
+        tracer.wrap(getattr(importlib.import_module(module_name), class_name), method_names)
+    for cls, method_names in (extra_methods or {}).items():
+        tracer.wrap(cls, method_names)
+    return tracer
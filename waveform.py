@@ -0,0 +1,149 @@
+"""
+waveform.py
+
+This file contains the functions used to build waveform thumbnails for the audio
+previews. A thumbnail is the minimum and maximum sample of every pixel column, found
+with vectorized NumPy reductions over blocks of the file so long recordings never have
+to be loaded at once. Thumbnails are cached on disk, keyed by the hash of the file
+content, so a file is only decimated the first time it is previewed.
+"""
+
+import os
+import hashlib
+import numpy as np
+import soundfile as sf
+from default_configs import DEFAULT_WAVEFORM_FOLDER
+
+# Number of pixel columns in a thumbnail
+DEFAULT_COLUMNS = 512
+# Number of frames read from the file at once
+BLOCK_FRAMES = 1 << 16
+# Fraction of the peak amplitude treated as silence when locating the first sound
+SILENCE_RATIO = 0.02
+
+# (path, mtime_ns, size) -> content hash, so unchanged files are only hashed once per session
+_hash_cache = {}
+
+def content_hash(file_path):
+    """
+    Returns the SHA-1 hash of a file content, reading it in chunks.
+    """
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+    if key not in _hash_cache:
+        digest = hashlib.sha1()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        _hash_cache[key] = digest.hexdigest()
+    return _hash_cache[key]
+
+def compute_waveform(file_path, columns=DEFAULT_COLUMNS, block_frames=BLOCK_FRAMES):
+    """
+    Decimates an audio file to the minimum and maximum sample of each pixel column.
+    All channels are folded into the same column.
+
+    Args:
+        file_path (str): The path to the audio file.
+        columns (int): The number of pixel columns.
+        block_frames (int): The number of frames read at once.
+
+    Returns:
+        numpy.ndarray: A (2, columns) float32 array holding the minimums and the maximums.
+    """
+    frames = sf.info(file_path).frames
+    mins = np.zeros(columns, dtype=np.float32)
+    maxs = np.zeros(columns, dtype=np.float32)
+    if frames == 0:
+        return np.stack([mins, maxs])
+    mins.fill(np.inf)
+    maxs.fill(-np.inf)
+
+    start = 0
+    for block in sf.blocks(file_path, blocksize=block_frames, dtype='float32', always_2d=True):
+        # Fold the channels, then find the column of every frame in the block
+        block_min = block.min(axis=1)
+        block_max = block.max(axis=1)
+        column_index = (np.arange(start, start + len(block), dtype=np.int64) * columns) // frames
+        # Reduce each run of frames sharing a column in one call
+        boundaries = np.concatenate(([0], np.flatnonzero(np.diff(column_index)) + 1))
+        run_columns = column_index[boundaries]
+        np.minimum.at(mins, run_columns, np.minimum.reduceat(block_min, boundaries))
+        np.maximum.at(maxs, run_columns, np.maximum.reduceat(block_max, boundaries))
+        start += len(block)
+
+    # Columns without frames (files shorter than the thumbnail) take their left neighbour
+    empty = ~np.isfinite(mins)
+    if empty.any():
+        filled = np.maximum.accumulate(np.where(empty, 0, np.arange(columns)))
+        mins, maxs = mins[filled], maxs[filled]
+        mins[~np.isfinite(mins)] = 0
+        maxs[~np.isfinite(maxs)] = 0
+    return np.stack([mins, maxs])
+
+def find_onset(file_path, threshold_ratio=SILENCE_RATIO, block_frames=BLOCK_FRAMES):
+    """
+    Finds the first frame louder than a fraction of the peak amplitude, streaming the file twice:
+    once for the peak, then until the first frame above the threshold.
+
+    Args:
+        file_path (str): The path to the audio file.
+        threshold_ratio (float): The fraction of the peak amplitude treated as silence.
+        block_frames (int): The number of frames read at once.
+
+    Returns:
+        int: The onset frame, or 0 for a silent file.
+    """
+    peak = 0.0
+    for block in sf.blocks(file_path, blocksize=block_frames, dtype='float32', always_2d=True):
+        peak = max(peak, float(np.abs(block).max(initial=0.0)))
+    if peak == 0:
+        return 0
+
+    start = 0
+    for block in sf.blocks(file_path, blocksize=block_frames, dtype='float32', always_2d=True):
+        loud = np.abs(block).max(axis=1) > peak * threshold_ratio
+        if loud.any():
+            return start + int(np.argmax(loud))
+        start += len(block)
+    return 0
+
+def load_waveform(file_path, columns=DEFAULT_COLUMNS, cache_folder=DEFAULT_WAVEFORM_FOLDER):
+    """
+    Returns the waveform thumbnail of an audio file, using the disk cache when possible.
+
+    Args:
+        file_path (str): The path to the audio file.
+        columns (int): The number of pixel columns.
+        cache_folder (str): The folder holding the cached thumbnails.
+
+    Returns:
+        dict: The (2, columns) thumbnail, the duration (seconds), the sample rate, the channel
+              count and the time of the first non-silent column (seconds).
+    """
+    info = sf.info(file_path)
+    cache_path = os.path.join(cache_folder, f"{content_hash(file_path)}_{columns}.npy")
+    try:
+        thumbnail = np.load(cache_path)
+    except (OSError, ValueError):
+        thumbnail = compute_waveform(file_path, columns)
+        os.makedirs(cache_folder, exist_ok=True)
+        # Write to a temporary file first so a partial write is never loaded
+        temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as f:
+            np.save(f, thumbnail)
+        os.replace(temporary_path, cache_path)
+
+    # Locate the first column louder than the silence threshold
+    amplitude = np.maximum(np.abs(thumbnail[0]), np.abs(thumbnail[1]))
+    peak = amplitude.max() if amplitude.size else 0.0
+    loud = np.flatnonzero(amplitude > peak * SILENCE_RATIO) if peak > 0 else np.array([], dtype=np.int64)
+    onset = loud[0] * info.duration / columns if loud.size else 0.0
+
+    return {
+        "thumbnail": thumbnail,
+        "duration": info.duration,
+        "samplerate": info.samplerate,
+        "channels": info.channels,
+        "onset": onset
+    }